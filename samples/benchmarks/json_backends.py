@@ -0,0 +1,34 @@
+import time
+from vibora.responses import JsonResponse
+from vibora.serializers import BACKENDS
+
+
+rounds = 10000
+payloads = {
+    'small': {'hello': 'world'},
+    'object': {
+        'id': 1234, 'name': 'Vibora', 'active': True, 'score': 98.7, 'tags': ['fast', 'async', 'http'],
+        'owner': {'id': 1, 'email': 'owner@vibora.io', 'roles': ['admin', 'user']}
+    },
+    'list': [{'id': x, 'name': f'item-{x}', 'price': x * 1.5, 'available': x % 2 == 0} for x in range(0, 100)],
+    'unicode': {'text': 'Olá, 世界! ' * 50}
+}
+
+
+def benchmark(name: str, payload, backend) -> None:
+    t1 = time.perf_counter()
+    for _ in range(0, rounds):
+        JsonResponse(payload, backend=backend)
+    dumps_rate = rounds / (time.perf_counter() - t1)
+    content = backend.dumps(payload)
+    t1 = time.perf_counter()
+    for _ in range(0, rounds):
+        backend.loads(content)
+    loads_rate = rounds / (time.perf_counter() - t1)
+    print(f'{backend.name:>8} {name:>8}: {dumps_rate:>10.0f} responses/s {loads_rate:>10.0f} loads/s')
+
+
+if __name__ == '__main__':
+    for payload_name, value in payloads.items():
+        for json_backend in BACKENDS.values():
+            benchmark(payload_name, value, json_backend)
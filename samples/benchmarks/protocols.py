@@ -0,0 +1,74 @@
+import socket
+import time
+from vibora import Vibora
+from vibora.limits import RouteLimits
+from vibora.protocol import Connection, BufferedConnection
+from vibora.request import Request
+from vibora.responses import Response
+from vibora.utils import get_free_port
+
+
+rounds = 10
+pipelined_requests = 5000
+uploads = 200
+upload_size = 1024 * 1024
+
+
+def build_app(handler) -> Vibora:
+    app = Vibora(handler=handler)
+
+    @app.route('/')
+    async def home():
+        return Response(b'Hello World')
+
+    @app.route('/upload', methods=['POST'], limits=RouteLimits(max_body_size=upload_size))
+    async def upload(request: Request):
+        size = 0
+        async for chunk in request.stream:
+            size += len(chunk)
+        return Response(str(size).encode())
+
+    return app
+
+
+def count_responses(sock, expected: int):
+    received, buffer = 0, b''
+    while received < expected:
+        buffer += sock.recv(1024 * 1024)
+        received += buffer.count(b'HTTP/1.1 200')
+        # Keeping the tail in case a status line was split between two reads.
+        buffer = buffer[-11:]
+
+
+def small_gets(address: str, port: int) -> float:
+    request = b'GET / HTTP/1.1\r\nHost: localhost\r\n\r\n'
+    sock = socket.create_connection((address, port))
+    t1 = time.time()
+    for _ in range(0, rounds):
+        sock.sendall(request * pipelined_requests)
+        count_responses(sock, pipelined_requests)
+    sock.close()
+    return (rounds * pipelined_requests) / (time.time() - t1)
+
+
+def big_posts(address: str, port: int) -> float:
+    request = b'POST /upload HTTP/1.1\r\nHost: localhost\r\nContent-Length: %d\r\n\r\n' % upload_size
+    body = b'1' * upload_size
+    sock = socket.create_connection((address, port))
+    t1 = time.time()
+    for _ in range(0, uploads):
+        sock.sendall(request + body)
+        count_responses(sock, 1)
+    sock.close()
+    return (uploads * upload_size / 1024 / 1024) / (time.time() - t1)
+
+
+if __name__ == '__main__':
+    for protocol in (Connection, BufferedConnection):
+        app = build_app(protocol)
+        s, host, free_port = get_free_port()
+        s.close()
+        app.run(host=host, port=free_port, workers=1, block=False, debug=False, startup_message=False)
+        print(f'{protocol.__name__}: small GET {small_gets(host, free_port):.0f} req/s, '
+              f'big POST {big_posts(host, free_port):.0f} MB/s')
+        app.clean_up()
@@ -0,0 +1,58 @@
+import socket
+import time
+from itertools import count
+from vibora import Vibora
+from vibora.responses import Response, JsonResponse
+from vibora.utils import get_free_port
+
+
+rounds = 20
+pipelined_requests = 5000
+app = Vibora()
+headers = {'Content-Type': 'text/plain', 'Cache-Control': 'no-cache', 'X-Frame-Options': 'DENY'}
+request_ids = count()
+
+
+@app.route('/plain')
+async def plain():
+    return Response(b'Hello World')
+
+
+@app.route('/headers')
+async def with_headers():
+    return Response(b'Hello World', headers=headers)
+
+
+@app.route('/request-id')
+async def with_request_id():
+    return Response(b'Hello World', headers={**headers, 'X-Request-Id': str(next(request_ids))})
+
+
+@app.route('/json')
+async def json():
+    return JsonResponse({'hello': 'world'})
+
+
+def benchmark(address: str, port: int, path: bytes):
+    request = b'GET ' + path + b' HTTP/1.1\r\nHost: localhost\r\n\r\n'
+    sock = socket.create_connection((address, port))
+    t1 = time.time()
+    for _ in range(0, rounds):
+        sock.sendall(request * pipelined_requests)
+        received, buffer = 0, b''
+        while received < pipelined_requests:
+            buffer += sock.recv(1024 * 1024)
+            received += buffer.count(b'HTTP/1.1 200')
+            # Keeping the tail in case a status line was split between two reads.
+            buffer = buffer[-11:]
+    sock.close()
+    print(f'{path.decode()}: {(rounds * pipelined_requests) / (time.time() - t1):.0f} req/s')
+
+
+if __name__ == '__main__':
+    s, host, free_port = get_free_port()
+    s.close()
+    app.run(host=host, port=free_port, workers=1, block=False, debug=False, startup_message=False)
+    for url in (b'/plain', b'/headers', b'/request-id', b'/json'):
+        benchmark(host, free_port, url)
+    app.clean_up()
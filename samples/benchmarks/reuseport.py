@@ -0,0 +1,67 @@
+import os
+import re
+import socket
+import statistics
+import time
+from collections import Counter
+from vibora import Vibora
+from vibora.responses import Response
+from vibora.utils import get_free_port, allowed_cpus
+from vibora.workers.sockets import ListenMode
+
+
+# A few clients keep their connections alive and send most of the requests,
+# a lot of others only send a couple of requests each.
+heavy_clients = 4
+heavy_requests = 5000
+light_clients = 200
+light_requests = 5
+workers = len(allowed_cpus())
+pid_pattern = re.compile(rb'<(\d+)>')
+app = Vibora()
+
+
+@app.route('/')
+async def home():
+    return Response(b'<%d>' % os.getpid())
+
+
+def send_requests(sock, count: int, served: Counter) -> None:
+    sock.sendall(b'GET / HTTP/1.1\r\nHost: localhost\r\n\r\n' * count)
+    received, buffer = 0, b''
+    while received < count:
+        buffer += sock.recv(1024 * 1024)
+        matches = pid_pattern.findall(buffer)
+        received += len(matches)
+        for pid in matches:
+            served[int(pid)] += 1
+        # Keeping the tail in case a body was split between two reads.
+        buffer = buffer[buffer.rfind(b'>') + 1:]
+
+
+def benchmark(name: str, mode: int) -> None:
+    s, host, port = get_free_port()
+    s.close()
+    app.run(host=host, port=port, workers=workers, block=False, debug=False, startup_message=False,
+            listen_mode=mode)
+    time.sleep(1)
+    served = Counter({worker.pid: 0 for worker in app.workers[-workers:]})
+    connections = [(socket.create_connection((host, port)), heavy_requests) for _ in range(0, heavy_clients)]
+    connections += [(socket.create_connection((host, port)), light_requests) for _ in range(0, light_clients)]
+    t1 = time.time()
+    for sock, count in connections:
+        send_requests(sock, count, served)
+        sock.close()
+    elapsed = time.time() - t1
+    app.clean_up()
+    counts = sorted(served.values())
+    total = sum(counts)
+    print(f'{name:>13}: {total / elapsed:>8.0f} req/s, requests per worker {counts}, '
+          f'max/mean {max(counts) / statistics.mean(counts):.2f}, stdev {statistics.pstdev(counts):.0f}')
+
+
+if __name__ == '__main__':
+    for mode_name, listen_mode in (('reuseport', ListenMode.REUSEPORT),
+                                   ('reuseport-cpu', ListenMode.REUSEPORT_CPU),
+                                   ('shared', ListenMode.SHARED)):
+        benchmark(mode_name, listen_mode)
@@ -0,0 +1,49 @@
+import time
+from vibora.router import Route, RouteTree
+
+
+rounds = 10000
+
+
+async def handler():
+    pass
+
+
+def build_routes(count: int) -> list:
+    routes = []
+    for index in range(0, count):
+        routes.append(Route(f'/api/v1/resource{index}/<id>/items/<item>'.encode(), handler))
+    return routes
+
+
+def linear_find(routes: list, url: bytes):
+    for route in routes:
+        if route.regex.fullmatch(url):
+            return route
+
+
+def benchmark(count: int):
+    routes = build_routes(count)
+    tree = RouteTree()
+    for route in routes:
+        tree.add(route)
+    cases = {
+        'hit (last route)': f'/api/v1/resource{count - 1}/123/items/456'.encode(),
+        'miss': b'/api/v1/unknown/123/items/456'
+    }
+    for name, url in cases.items():
+        assert linear_find(routes, url) is tree.find(url)
+        t1 = time.time()
+        for _ in range(0, rounds):
+            linear_find(routes, url)
+        linear = time.time() - t1
+        t1 = time.time()
+        for _ in range(0, rounds):
+            tree.find(url)
+        compiled = time.time() - t1
+        print(f'{count} routes, {name}: Linear: {linear:.4f}s / Tree: {compiled:.4f}s')
+
+
+if __name__ == '__main__':
+    for total in (10, 100, 1000):
+        benchmark(total)
@@ -47,12 +47,24 @@ setup(
             extra_compile_args=['-O3'],
             include_dirs=['.', '/git/vibora/vibora']
         ),
+        Extension(
+            "vibora.parsers.jsonstream",
+            ["vibora/parsers/jsonstream.c"],
+            extra_compile_args=['-O3'],
+            include_dirs=['.']
+        ),
         Extension(
             "vibora.router.router",
             ["vibora/router/router.c"],
             extra_compile_args=['-O3'],
             include_dirs=['.']
         ),
+        Extension(
+            "vibora.router.tree",
+            ["vibora/router/tree.c"],
+            extra_compile_args=['-O3'],
+            include_dirs=['.']
+        ),
         Extension(
             "vibora.responses.responses",
             ["vibora/responses/responses.c"],
@@ -0,0 +1,51 @@
+import asyncio
+from vibora.utils import get_free_port
+
+
+def run_server(app, workers: int = 1, **options) -> tuple:
+    """
+    Runs the app on a free port, for tests talking to it with raw sockets instead of the test client.
+    The caller stops it with app.clean_up().
+
+    :param app:
+    :param workers:
+    :param options: Extra app.run() arguments.
+    :return: (address, port)
+    """
+    sock, address, port = get_free_port()
+    sock.close()
+    app.run(host=address, port=port, block=False, workers=workers, startup_message=False, **options)
+    return address, port
+
+
+async def send_raw(address: str, port: int, *payloads: bytes, responses: int = 1, end: bytes = b'!',
+                   timeout: int = 5) -> bytes:
+    """
+    Writes the payloads to a new connection, one write each, and reads until the server
+    closes it or the given number of responses arrived (the last one ending with `end`).
+
+    :param address:
+    :param port:
+    :param payloads:
+    :param responses:
+    :param end:
+    :param timeout: Seconds to wait for each read.
+    :return: Everything received.
+    """
+    reader, writer = await asyncio.open_connection(address, port)
+    try:
+        for payload in payloads:
+            writer.write(payload)
+            await writer.drain()
+            if len(payloads) > 1:
+                # Separate reads on the server side.
+                await asyncio.sleep(0.05)
+        data = b''
+        while data.count(b'HTTP/1.1 ') < responses or not data.endswith(end):
+            chunk = await asyncio.wait_for(reader.read(64 * 1024), timeout)
+            if not chunk:
+                break
+            data += chunk
+        return data
+    finally:
+        writer.close()
@@ -3,9 +3,11 @@ import uuid
 import json
 from vibora import Vibora
 from vibora.headers import Headers
-from vibora.responses import JsonResponse
+from vibora.headers.headers import normalize_name, INTERNED_NAMES
+from vibora.responses import JsonResponse, Response
 from vibora.request import Request
 from vibora.tests import TestSuite
+from tests import run_server, send_raw
 
 
 class HeadersTestCase(unittest.TestCase):
@@ -17,6 +19,32 @@ class HeadersTestCase(unittest.TestCase):
         headers['a'] = '3'
         self.assertEqual({'test': '2', 'a': '3'}, headers.dump())
 
+    def test_case_insensitive_lookup_expects_found(self):
+        headers = Headers([(b'Content-Type', b'text/html'), (b'X-TOKEN', b'1')])
+        self.assertEqual(headers.get('content-type'), 'text/html')
+        self.assertEqual(headers['X-Token'], '1')
+        self.assertIsNone(headers.get('missing'))
+        with self.assertRaises(KeyError):
+            headers['missing']
+
+    def test_repeated_header_expects_all_values(self):
+        headers = Headers([(b'Accept', b'a'), (b'Host', b'h'), (b'accept', b'b')])
+        self.assertEqual(headers.get('accept'), 'a')
+        self.assertEqual(headers.get_list('Accept'), ['a', 'b'])
+        self.assertEqual(headers.get_list('missing'), [])
+        self.assertEqual(headers.dump(), {'accept': 'a', 'host': 'h'})
+
+    def test_set_item_expects_raw_values_replaced(self):
+        headers = Headers([(b'Accept', b'a'), (b'accept', b'b')])
+        headers['ACCEPT'] = 'c'
+        self.assertEqual(headers.get('accept'), 'c')
+        self.assertEqual(headers.get_list('accept'), ['c'])
+
+    def test_empty_value_expects_default(self):
+        headers = Headers([(b'X-Empty', b'')])
+        self.assertEqual(headers.get('x-empty', 'default'), 'default')
+        self.assertEqual(headers['x-empty'], '')
+
 
 class IntegrationHeadersTestCase(TestSuite):
 
@@ -32,3 +60,45 @@ class IntegrationHeadersTestCase(TestSuite):
         response = await client.get('/', headers={'x-access-token': token})
         response = json.loads(response.content)
         self.assertEqual(response.get('x-access-token'), token)
+
+    async def send_request(self, app: Vibora, *payloads: bytes) -> bytes:
+        address, port = run_server(app)
+        try:
+            data = await send_raw(address, port, *payloads)
+            return data[data.find(b'\r\n\r\n') + 4:]
+        finally:
+            app.clean_up()
+
+    async def test_repeated_headers_expects_all_values(self):
+        app = Vibora()
+
+        @app.route('/')
+        async def get_headers(request: Request):
+            return Response(','.join(request.headers.get_list('x-value')).encode() + b'!')
+
+        content = await self.send_request(app, b'GET / HTTP/1.1\r\nHost: localhost\r\nX-Value: 1\r\nx-value: 2\r\n\r\n')
+        self.assertEqual(content, b'1,2!')
+
+    async def test_header_name_split_between_reads_expects_found(self):
+        app = Vibora()
+
+        @app.route('/')
+        async def get_headers(request: Request):
+            return Response(request.headers.get('User-Agent', '').encode() + b'!')
+
+        content = await self.send_request(app, b'GET / HTTP/1.1\r\nHost: localhost\r\nUSER-Ag', b'ent: test\r\n\r\n')
+        self.assertEqual(content, b'test!')
+
+
+class InternedNamesTestCase(unittest.TestCase):
+
+    def test_common_names_expects_interned_lookup_keys(self):
+        for name in ('Host', 'content-type', 'ACCEPT-ENCODING'):
+            self.assertIs(normalize_name(name)[1], INTERNED_NAMES[name.lower().encode()])
+
+    def test_interned_name_expects_found(self):
+        headers = Headers()
+        headers.append(INTERNED_NAMES[b'host'], b'localhost')
+        headers.append(b'X-Custom', b'1')
+        self.assertEqual(headers.get('HOST'), 'localhost')
+        self.assertEqual(headers.get('x-custom'), '1')
@@ -0,0 +1,130 @@
+import json
+from unittest import TestCase
+from vibora import Vibora
+from vibora.exceptions import InvalidJSON
+from vibora.parsers.jsonstream import JsonStreamParser
+from vibora.request import Request
+from vibora.responses import JsonResponse, Response
+from vibora.tests import TestSuite
+
+
+class JsonStreamParserTestCase(TestCase):
+
+    @staticmethod
+    def feed(parser: JsonStreamParser, data: bytes, chunk_size: int) -> list:
+        items = []
+        for index in range(0, len(data), chunk_size):
+            items.extend(parser.feed(data[index:index + chunk_size]))
+        items.extend(parser.end())
+        return items
+
+    def test_array_expects_every_item(self):
+        content = [{'a': [1, 2, {'b': None}]}, [], 'text', 10, 1.5, True, None]
+        data = json.dumps(content).encode()
+        for chunk_size in (1, 3, 7, len(data)):
+            self.assertEqual(self.feed(JsonStreamParser(json.loads), data, chunk_size), content)
+
+    def test_strings_with_delimiters_expects_untouched(self):
+        content = ['a,b', '[', ']', '{"x": 1}', 'quote " and \\ slash', '\\']
+        data = json.dumps(content).encode()
+        for chunk_size in (1, 2, len(data)):
+            self.assertEqual(self.feed(JsonStreamParser(json.loads), data, chunk_size), content)
+
+    def test_empty_array_expects_no_items(self):
+        self.assertEqual(self.feed(JsonStreamParser(json.loads), b' [ ] \n', 1), [])
+
+    def test_ndjson_expects_every_line(self):
+        content = [{'a': 1}, [1, 2], 'b']
+        data = b'\n'.join(json.dumps(x).encode() for x in content)
+        for body in (data, data + b'\n', data + b'\r\n\n'):
+            for chunk_size in (1, 5, len(body)):
+                self.assertEqual(self.feed(JsonStreamParser(json.loads, ndjson=True), body, chunk_size), content)
+
+    def test_ndjson_starting_with_array_expects_every_line(self):
+        body = b'[1, 2]\n[3]\n{"a": 4}\n'
+        for chunk_size in (1, 4, len(body)):
+            self.assertEqual(self.feed(JsonStreamParser(json.loads, ndjson=True), body, chunk_size),
+                             [[1, 2], [3], {'a': 4}])
+
+    def test_items_are_released_while_parsing(self):
+        parser = JsonStreamParser(json.loads)
+        self.assertEqual(parser.feed(b'[1, 2'), [1])
+        self.assertEqual(parser.feed(b', 3]'), [2, 3])
+        self.assertEqual(parser.end(), [])
+
+    def test_invalid_arrays_expects_value_error(self):
+        for body in (b'[1, 2', b'[1, ]', b'[1,, 2]', b'[1] 2', b'[1, {]', b'{"a": 1}\n', b''):
+            with self.subTest(body=body):
+                with self.assertRaises(ValueError):
+                    self.feed(JsonStreamParser(json.loads), body, 1)
+
+    def test_invalid_line_expects_value_error(self):
+        with self.assertRaises(ValueError):
+            self.feed(JsonStreamParser(json.loads, ndjson=True), b'{"a": 1}\n{"a": \n', 4)
+
+
+class RequestJsonTestCase(TestSuite):
+
+    async def test_json_from_bytes_expects_parsed(self):
+        app = Vibora()
+
+        @app.route('/', methods=['POST'])
+        async def home(request: Request):
+            return JsonResponse(await request.json(loads=lambda x: {'type': type(x).__name__, **json.loads(x)}))
+
+        async with app.test_client() as client:
+            response = await client.post('/', json={'a': 'ç'})
+            self.assertEqual(response.status_code, 200)
+            self.assertDictEqual(response.json(), {'type': 'bytes', 'a': 'ç'})
+
+    async def test_json_stream_array_expects_every_item(self):
+        app = Vibora()
+
+        @app.route('/', methods=['POST'])
+        async def home(request: Request):
+            return JsonResponse([item async for item in request.json_stream()])
+
+        content = [{'id': x, 'name': 'a' * x} for x in range(0, 1000)]
+        async with app.test_client() as client:
+            response = await client.post('/', body=json.dumps(content).encode())
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), content)
+
+    async def test_json_stream_ndjson_expects_every_line(self):
+        app = Vibora()
+
+        @app.route('/', methods=['POST'])
+        async def home(request: Request):
+            return JsonResponse([item async for item in request.json_stream()])
+
+        async with app.test_client() as client:
+            response = await client.post('/', body=b'{"a": 1}\n{"a": 2}\n{"a": 3}',
+                                         headers={'Content-Type': 'application/x-ndjson; charset=utf-8'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), [{'a': 1}, {'a': 2}, {'a': 3}])
+
+    async def test_json_stream_ndjson_starting_with_array_expects_every_line(self):
+        app = Vibora()
+
+        @app.route('/', methods=['POST'])
+        async def home(request: Request):
+            return JsonResponse([item async for item in request.json_stream(ndjson=True)])
+
+        async with app.test_client() as client:
+            response = await client.post('/', body=b'[1, 2]\n[3]\n')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), [[1, 2], [3]])
+
+    async def test_json_stream_invalid_body_expects_bad_request(self):
+        app = Vibora()
+
+        @app.route('/', methods=['POST'])
+        async def home(request: Request):
+            try:
+                return JsonResponse([item async for item in request.json_stream()])
+            except InvalidJSON:
+                return Response(b'', status_code=400)
+
+        async with app.test_client() as client:
+            response = await client.post('/', body=b'[1, 2')
+            self.assertEqual(response.status_code, 400)
@@ -0,0 +1,89 @@
+import asyncio
+from vibora import Vibora
+from vibora.responses import Response
+from vibora.request import Request
+from vibora.tests import TestSuite
+from tests import run_server, send_raw
+
+
+class PipeliningTestCase(TestSuite):
+
+    def setUp(self):
+        self.app = Vibora()
+
+    def tearDown(self):
+        self.app.clean_up()
+
+    async def test_pipelined_requests__expects_ordered_responses(self):
+
+        @self.app.route('/slow')
+        async def slow():
+            await asyncio.sleep(0.3)
+            return Response(b'slow!')
+
+        @self.app.route('/fast')
+        async def fast():
+            return Response(b'fast!')
+
+        address, port = run_server(self.app)
+        payload = b'GET /slow HTTP/1.1\r\nHost: localhost\r\n\r\n' \
+                  b'GET /fast HTTP/1.1\r\nHost: localhost\r\n\r\n'
+        data = await send_raw(address, port, payload, responses=2)
+        self.assertEqual(data.count(b'HTTP/1.1 200 OK'), 2)
+        self.assertTrue(data.find(b'slow!') < data.find(b'fast!'))
+
+    async def test_pipelined_requests_with_body__expects_ordered_responses(self):
+
+        @self.app.route('/', methods=['POST'])
+        async def echo(request: Request):
+            return Response(bytes(await request.stream.read()) + b'!')
+
+        address, port = run_server(self.app)
+        payload = b''.join(
+            b'POST / HTTP/1.1\r\nHost: localhost\r\nContent-Length: 1\r\n\r\n' + str(x).encode()
+            for x in range(0, 3)
+        )
+        data = await send_raw(address, port, payload, responses=3)
+        self.assertEqual(data.count(b'HTTP/1.1 200 OK'), 3)
+        self.assertTrue(data.find(b'0!') < data.find(b'1!') < data.find(b'2!'))
+
+    async def test_pipelined_request_received_while_processing_expects_processing_status(self):
+
+        @self.app.route('/status')
+        async def status(request: Request):
+            # Transports may still deliver data after pause_reading() (I.e: TLS records already decrypted).
+            if request.headers.get('X-Pipeline'):
+                request.protocol.data_received(b'GET /status HTTP/1.1\r\nHost: localhost\r\n\r\n')
+            await asyncio.sleep(0.1)
+            return Response(b'%d!' % request.protocol.get_status())
+
+        address, port = run_server(self.app)
+        payload = b'GET /status HTTP/1.1\r\nHost: localhost\r\nX-Pipeline: 1\r\n\r\n'
+        data = await send_raw(address, port, payload, responses=2)
+        self.assertEqual(data.count(b'\r\n\r\n3!'), 2)
+
+    async def test_pipelined_request_on_stopping_connection_expects_dropped(self):
+
+        @self.app.route('/stop')
+        async def stop(request: Request):
+            # Same as a worker shutting down in the middle of the request. The raised high water mark
+            # keeps most of the body buffered (and the connection open) after the response is sent.
+            request.protocol.stop()
+            request.protocol.transport.set_write_buffer_limits(high=128 * 1024 * 1024)
+            return Response(b'.' * 16 * 1024 * 1024 + b'stop!')
+
+        @self.app.route('/fast')
+        async def fast():
+            return Response(b'fast!')
+
+        address, port = run_server(self.app)
+        reader, writer = await asyncio.open_connection(address, port)
+        try:
+            writer.write(b'GET /stop HTTP/1.1\r\nHost: localhost\r\n\r\n'
+                         b'GET /fast HTTP/1.1\r\nHost: localhost\r\n\r\n')
+            # Reading until the server closes the connection.
+            data = await asyncio.wait_for(reader.read(), 5)
+        finally:
+            writer.close()
+        self.assertEqual(data.count(b'HTTP/1.1 200 OK'), 1)
+        self.assertTrue(data.endswith(b'stop!'))
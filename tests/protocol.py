@@ -0,0 +1,55 @@
+import os
+from vibora import Vibora
+from vibora.limits import RouteLimits
+from vibora.protocol import BufferedConnection
+from vibora.request import Request
+from vibora.responses import Response
+from vibora.tests import TestSuite
+from tests import run_server, send_raw
+
+
+class BufferedConnectionTestCase(TestSuite):
+
+    def setUp(self):
+        self.app = Vibora(handler=BufferedConnection)
+
+    async def test_simple_get_expects_response(self):
+        @self.app.route('/')
+        async def home():
+            return Response(b'123')
+
+        async with self.app.test_client() as client:
+            for _ in range(0, 3):
+                response = await client.get('/')
+                self.assertEqual(response.content, b'123')
+
+    async def test_big_upload_expects_full_content(self):
+        content = os.urandom(3 * 1024 * 1024)
+
+        @self.app.route('/', methods=['POST'], limits=RouteLimits(max_body_size=10 * 1024 * 1024))
+        async def home(request: Request):
+            return Response(bytes(await request.stream.read()))
+
+        async with self.app.test_client() as client:
+            response = await client.post('/', body=content)
+            self.assertEqual(response.content, content)
+
+    async def test_pipelined_requests_expects_ordered_responses(self):
+        @self.app.route('/', methods=['POST'])
+        async def echo(request: Request):
+            return Response(bytes(await request.stream.read()) + b'!')
+
+        address, port = run_server(self.app)
+        try:
+            payload = b''.join(
+                b'POST / HTTP/1.1\r\nHost: localhost\r\nContent-Length: 1\r\n\r\n' + str(x).encode()
+                for x in range(0, 3)
+            )
+            data = await send_raw(address, port, payload, responses=3)
+            self.assertTrue(data.find(b'0!') < data.find(b'1!') < data.find(b'2!'))
+        finally:
+            self.app.clean_up()
+
+    def test_invalid_handler_expects_error(self):
+        with self.assertRaises(ValueError):
+            Vibora(handler=object)
@@ -1,6 +1,17 @@
-from unittest import TestCase
-from vibora.responses import JsonResponse, Response
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from unittest import TestCase, skipUnless
+from vibora import Vibora
+from vibora.blueprints import Blueprint
+from vibora.responses import JsonResponse, Response, CachedResponse, StreamingResponse, FileResponse
 from vibora.cookies import Cookie
+from vibora.limits import ServerLimits
+from vibora.request import Request
+from vibora.serializers import JsonBackend, register_json_backend, ContextVar
+from vibora.tests import TestSuite
 from vibora.utils import json
 
 
@@ -31,3 +42,227 @@ class AttributesTestCase(TestCase):
         self.assertEqual(response.headers['server'], headers['server'])
         self.assertEqual(response.status_code, status_code)
         self.assertEqual(response.content, content)
+
+
+class BigResponsesTestCase(TestSuite):
+
+    def setUp(self):
+        self.content = b'1' * 5 * 1024 * 1024
+        self.app = Vibora(server_limits=ServerLimits(write_buffer=1024))
+
+    async def test_big_response_expects_full_content(self):
+
+        @self.app.route('/')
+        async def home():
+            return Response(self.content, headers={'Content-Type': 'text/plain'})
+
+        async with self.app.test_client() as client:
+            for _ in range(0, 2):
+                response = await client.get('/')
+                self.assertEqual(response.content, self.content)
+
+    async def test_big_cached_response_expects_full_content(self):
+        response = CachedResponse(self.content)
+
+        @self.app.route('/')
+        async def home():
+            return response
+
+        async with self.app.test_client() as client:
+            for _ in range(0, 2):
+                response = await client.get('/')
+                self.assertEqual(response.content, self.content)
+
+
+class HeadersCacheTestCase(TestSuite):
+
+    async def test_shared_headers_changed_in_place_expects_new_values(self):
+        app = Vibora()
+        headers = {'X-Value': '1'}
+
+        @app.route('/')
+        async def home():
+            return Response(b'', headers=headers)
+
+        @app.route('/change')
+        async def change():
+            headers['X-Value'] = '2'
+            return Response(b'', headers=headers, status_code=201)
+
+        async with app.test_client() as client:
+            self.assertEqual((await client.get('/')).headers['x-value'], '1')
+            response = await client.get('/change')
+            self.assertEqual((response.status_code, response.headers['x-value']), (201, '2'))
+            self.assertEqual((await client.get('/')).headers['x-value'], '2')
+
+    async def test_equal_values_of_other_types_expects_own_text(self):
+        app = Vibora()
+
+        # Not cached, each request must go through encode_headers().
+        @app.route('/<kind>', cache=False)
+        async def home(kind: str):
+            value = {'int': 1, 'bool': True, 'float': 1.0, 'str': '1'}[kind]
+            return Response(b'', headers={'X-Value': value})
+
+        async with app.test_client() as client:
+            for _ in range(0, 2):
+                for kind, text in (('int', '1'), ('bool', 'True'), ('float', '1.0'), ('str', '1')):
+                    self.assertEqual((await client.get('/' + kind)).headers['x-value'], text)
+
+    async def test_per_request_values_expects_own_text(self):
+        app = Vibora()
+        shared = {'X-Static': 'yes'}
+
+        @app.route('/<value>', cache=False)
+        async def home(value: str):
+            return Response(b'', headers={**shared, 'X-Request-Id': value})
+
+        async with app.test_client() as client:
+            for value in range(0, 1100):
+                response = await client.get(f'/{value}')
+                self.assertEqual(response.headers['x-request-id'], str(value))
+                self.assertEqual(response.headers['x-static'], 'yes')
+
+
+def tagged_backend(name: str) -> JsonBackend:
+    return JsonBackend(name, lambda obj: json.dumps({**obj, 'backend': name}), json.loads)
+
+
+register_json_backend(tagged_backend('tests-app'))
+register_json_backend(tagged_backend('tests-route'))
+
+
+class JsonBackendsTestCase(TestSuite):
+
+    def test_binary_backend_expects_content_untouched(self):
+        backend = JsonBackend('binary', lambda obj: b'{"binary": true}', json.loads, binary=True)
+        self.assertEqual(JsonResponse({}, backend=backend).content, b'{"binary": true}')
+
+    def test_backend_by_name_expects_selected(self):
+        self.assertDictEqual(json.loads(JsonResponse({'a': 1}, backend='tests-app').content),
+                             {'a': 1, 'backend': 'tests-app'})
+
+    def test_unknown_backend_expects_value_error(self):
+        with self.assertRaises(ValueError):
+            JsonResponse({}, backend='unknown')
+        with self.assertRaises(ValueError):
+            Vibora(json_backend='unknown')
+
+    async def test_app_and_route_backends_expects_route_to_win(self):
+        app = Vibora(json_backend='tests-app')
+
+        @app.route('/')
+        async def home():
+            return JsonResponse({})
+
+        @app.route('/route', json_backend='tests-route')
+        async def route():
+            return JsonResponse({})
+
+        @app.route('/explicit', json_backend='tests-route')
+        async def explicit():
+            return JsonResponse({}, backend='json')
+
+        async with app.test_client() as client:
+            self.assertDictEqual((await client.get('/')).json(), {'backend': 'tests-app'})
+            self.assertDictEqual((await client.get('/route')).json(), {'backend': 'tests-route'})
+            self.assertDictEqual((await client.get('/explicit')).json(), {})
+
+    async def test_blueprint_backend_expects_selected(self):
+        app = Vibora()
+        blueprint = Blueprint(json_backend='tests-route')
+
+        @blueprint.route('/')
+        async def home():
+            return JsonResponse({})
+
+        @app.route('/default')
+        async def default():
+            return JsonResponse({})
+
+        app.add_blueprint(blueprint, prefixes={'b': '/b'})
+        async with app.test_client() as client:
+            self.assertDictEqual((await client.get('/b/')).json(), {'backend': 'tests-route'})
+            self.assertDictEqual((await client.get('/default')).json(), {})
+
+    async def test_nested_blueprint_expects_parent_backend(self):
+        app = Vibora(json_backend='tests-app')
+        parent = Blueprint(json_backend='tests-route')
+        child = Blueprint()
+
+        @child.route('/')
+        async def home():
+            return JsonResponse({})
+
+        parent.add_blueprint(child, prefixes={'child': '/child'})
+        app.add_blueprint(parent, prefixes={'parent': '/parent'})
+        async with app.test_client() as client:
+            self.assertDictEqual((await client.get('/parent/child/')).json(), {'backend': 'tests-route'})
+
+    @skipUnless(ContextVar, 'Tasks only share the context since Python 3.7.')
+    async def test_route_backend_expects_inherited_by_child_tasks(self):
+        app = Vibora()
+
+        async def build():
+            return JsonResponse({})
+
+        @app.route('/', json_backend='tests-route')
+        async def home():
+            return await asyncio.ensure_future(build())
+
+        async with app.test_client() as client:
+            self.assertDictEqual((await client.get('/')).json(), {'backend': 'tests-route'})
+
+    async def test_route_backend_expects_used_to_load_requests(self):
+        app = Vibora()
+        loaded = []
+        register_json_backend(JsonBackend('tests-loads', json.dumps, lambda data: loaded.append(data) or {}))
+
+        @app.route('/', methods=['POST'], json_backend='tests-loads')
+        async def home(request: Request):
+            await request.json()
+            return JsonResponse({'loaded': len(loaded)})
+
+        async with app.test_client() as client:
+            response = await client.post('/', json={'a': 1})
+            self.assertDictEqual(response.json(), {'loaded': 1})
+
+
+class DateHeaderTestCase(TestSuite):
+
+    async def test_every_response_type_expects_current_date(self):
+        app = Vibora()
+        cached = CachedResponse(b'cached', headers={'Date': 'overridden'})
+        with tempfile.NamedTemporaryFile(delete=False) as file:
+            file.write(b'file')
+        self.addCleanup(os.remove, file.name)
+
+        @app.route('/plain')
+        async def plain():
+            return Response(b'plain')
+
+        @app.route('/headers')
+        async def headers():
+            return Response(b'headers', headers={'X-Test': '1'})
+
+        @app.route('/cached')
+        async def cached_route():
+            return cached
+
+        @app.route('/streaming')
+        async def streaming():
+            def stream():
+                yield b'streaming'
+            return StreamingResponse(stream)
+
+        @app.route('/file')
+        async def file_route():
+            return FileResponse(file.name)
+
+        async with app.test_client() as client:
+            for path in ('/plain', '/headers', '/cached', '/cached', '/streaming', '/file'):
+                with self.subTest(path=path):
+                    response = await client.get(path)
+                    self.assertEqual(response.status_code, 200)
+                    date = parsedate_to_datetime(response.headers['date'])
+                    self.assertLess(abs((datetime.now(timezone.utc) - date).total_seconds()), 5)
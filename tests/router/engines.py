@@ -0,0 +1,80 @@
+from unittest import TestCase
+from vibora import Vibora, TestSuite
+from vibora.router import Route, RouteTree, RouterEngine
+from vibora.responses import Response
+
+
+async def handler():
+    pass
+
+
+class RouteTreeTestCase(TestCase):
+
+    def setUp(self):
+        self.tree = RouteTree()
+
+    def add(self, pattern: bytes) -> Route:
+        route = Route(pattern, handler)
+        self.tree.add(route)
+        return route
+
+    def test_param_segment_expects_found(self):
+        route = self.add(b'/users/<id>')
+        self.assertIs(self.tree.find(b'/users/1'), route)
+
+    def test_empty_param_segment_expects_not_found(self):
+        self.add(b'/users/<id>')
+        self.assertIsNone(self.tree.find(b'/users/'))
+        self.assertIsNone(self.tree.find(b'/users/1/2'))
+
+    def test_first_registered_route_expects_priority(self):
+        first = self.add(b'/users/<id>')
+        self.add(b'/users/me')
+        self.assertIs(self.tree.find(b'/users/me'), first)
+
+    def test_regex_leaf_expects_priority_order(self):
+        first = self.add(b'/files/.*')
+        self.add(b'/files/<name>')
+        self.assertIs(self.tree.find(b'/files/a'), first)
+        self.assertIs(self.tree.find(b'/files/a/b'), first)
+
+    def test_regex_quantifier_over_slash_expects_found(self):
+        route = self.add(b'/a/?b')
+        self.assertIs(self.tree.find(b'/ab'), route)
+        self.assertIs(self.tree.find(b'/a/b'), route)
+
+    def test_alternation_expects_found(self):
+        route = self.add(b'/x/a|/y')
+        self.assertIs(self.tree.find(b'/y'), route)
+
+    def test_tree_matches_linear_scan(self):
+        patterns = [b'/<a>/b', b'/a/<b>', b'/a/.*', b'/<a>/<b>/c', b'/a/b/(c|d)', b'/static/\\w+\\.js']
+        routes = [self.add(pattern) for pattern in patterns]
+        urls = [b'/a/b', b'/x/b', b'/a/x', b'/a/x/y', b'/x/y/c', b'/a/b/d', b'/static/app.js', b'/static/app.css']
+        for url in urls:
+            expected = next((route for route in routes if route.regex.fullmatch(url)), None)
+            self.assertIs(self.tree.find(url), expected, url)
+
+
+class TreeEngineTestCase(TestSuite):
+
+    def setUp(self):
+        self.app = Vibora(router_engine=RouterEngine.TREE)
+
+    async def test_route_with_params_expects_found(self):
+        @self.app.route('/<name>/<id>')
+        async def home(name: str, id: int):
+            return Response(name.encode() + str(id).encode())
+
+        async with self.app.test_client() as client:
+            response = await client.request('/abc/1')
+            self.assertEqual(response.content, b'abc1')
+
+    async def test_wrong_method_expects_not_allowed(self):
+        @self.app.route('/<name>', methods=['POST'])
+        async def home(name: str):
+            return Response(name.encode())
+
+        async with self.app.test_client() as client:
+            self.assertEqual((await client.request('/abc')).status_code, 405)
+            self.assertEqual((await client.request('/abc/def')).status_code, 404)
@@ -0,0 +1,65 @@
+import asyncio
+from unittest import TestCase
+from vibora import Vibora, TestSuite
+from vibora.router import Route, LRUCache
+from vibora.responses import Response, JsonResponse
+from tests import run_server
+
+
+async def handler():
+    pass
+
+
+class LRUCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.cache = LRUCache(max_size=2)
+        self.routes = [Route(f'/{x}'.encode(), handler) for x in range(0, 3)]
+
+    def test_capacity_expects_least_recently_used_evicted(self):
+        self.cache.set((b'/0', b'GET'), self.routes[0])
+        self.cache.set((b'/1', b'GET'), self.routes[1])
+        self.assertIs(self.cache.get((b'/0', b'GET')), self.routes[0])
+        self.cache.set((b'/2', b'GET'), self.routes[2])
+        self.assertEqual(len(self.cache.values), 2)
+        self.assertIsNone(self.cache.get((b'/1', b'GET')))
+        self.assertIs(self.cache.get((b'/0', b'GET')), self.routes[0])
+        self.assertEqual((self.cache.hits, self.cache.misses, self.cache.evictions), (2, 1, 1))
+
+    def test_zero_capacity_expects_nothing_cached(self):
+        cache = LRUCache(max_size=0)
+        cache.set((b'/0', b'GET'), self.routes[0])
+        self.assertIsNone(cache.get((b'/0', b'GET')))
+
+
+class RouterCacheTestCase(TestSuite):
+
+    async def test_query_string_expects_route_found(self):
+        app = Vibora()
+
+        @app.route('/<name>')
+        async def home(name: str):
+            return Response(name.encode())
+
+        address, port = run_server(app)
+        try:
+            reader, writer = await asyncio.open_connection(address, port)
+            for url in (b'/abc?a=1', b'/abc?a=2'):
+                writer.write(b'GET ' + url + b' HTTP/1.1\r\n\r\n')
+                response = await asyncio.wait_for(reader.readuntil(b'abc'), 5)
+                self.assertTrue(response.startswith(b'HTTP/1.1 200 OK'))
+            writer.close()
+        finally:
+            app.clean_up()
+
+    async def test_not_found_expects_not_cached(self):
+        app = Vibora()
+
+        @app.route('/cache/stats')
+        async def stats(app: Vibora):
+            return JsonResponse({'size': len(app.router.cache.values)})
+
+        async with app.test_client() as client:
+            for x in range(0, 10):
+                self.assertEqual((await client.get(f'/missing/{x}')).status_code, 404)
+            self.assertEqual((await client.get('/cache/stats')).json(), {'size': 1})
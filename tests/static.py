@@ -0,0 +1,402 @@
+import os
+import asyncio
+import gzip
+import importlib.util
+import subprocess
+import sys
+import tempfile
+import threading
+import multiprocessing
+from unittest import TestCase
+import vibora
+from vibora import Vibora, TestSuite
+from vibora.headers import Headers
+from vibora.request import Request
+from vibora.static import StaticHandler, SharedStaticCache
+from vibora.responses import FileResponse
+from tests import run_server, send_raw
+
+
+class FileResponseTestCase(TestSuite):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.content = os.urandom(3 * 1024 * 1024 + 7)
+        self.path = os.path.join(self.directory.name, 'data.bin')
+        with open(self.path, 'wb') as f:
+            f.write(self.content)
+        self.app = Vibora(static=StaticHandler([self.directory.name]))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    async def test_file_response_expects_full_content(self):
+        @self.app.route('/')
+        async def home():
+            return FileResponse(self.path, headers={'Content-Type': 'application/octet-stream'})
+
+        async with self.app.test_client() as client:
+            for _ in range(0, 2):
+                response = await client.get('/')
+                self.assertEqual(response.headers['Content-Length'], str(len(self.content)))
+                self.assertEqual(response.content, self.content)
+
+    async def test_file_response_with_offset_expects_partial_content(self):
+        @self.app.route('/')
+        async def home():
+            return FileResponse(self.path, offset=10, length=100)
+
+        async with self.app.test_client() as client:
+            response = await client.get('/')
+            self.assertEqual(response.content, self.content[10:110])
+
+    async def test_slow_client_expects_full_content_on_keep_alive(self):
+        @self.app.route('/')
+        async def home():
+            return FileResponse(self.path)
+
+        address, port = run_server(self.app)
+        reader, writer = await asyncio.open_connection(address, port)
+        try:
+            for _ in range(0, 2):
+                writer.write(b'GET / HTTP/1.1\r\nHost: localhost\r\n\r\n')
+                head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 5)
+                self.assertIn(f'Content-Length: {len(self.content)}'.encode(), head)
+                # Reading slowly, the socket buffer fills up and the server must wait for us.
+                body = b''
+                while len(body) < len(self.content):
+                    body += await asyncio.wait_for(reader.read(512 * 1024), 5)
+                    await asyncio.sleep(0.01)
+                self.assertEqual(body, self.content)
+        finally:
+            writer.close()
+            self.app.clean_up()
+
+    async def test_static_file_expects_full_content(self):
+        async with self.app.test_client() as client:
+            for _ in range(0, 2):
+                response = await client.get('/static/data.bin')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, self.content)
+
+    async def test_static_file_range_expects_partial_content(self):
+        async with self.app.test_client() as client:
+            response = await client.get('/static/data.bin', headers={'Range': 'bytes=100-200'})
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response.content, self.content[100:201])
+
+    async def test_head_expects_full_length_without_body(self):
+        address, port = run_server(self.app)
+        try:
+            data = await send_raw(address, port,
+                                  b'HEAD /static/data.bin HTTP/1.1\r\nHost: localhost\r\n\r\n'
+                                  b'HEAD /static/data.bin HTTP/1.1\r\nHost: localhost\r\nRange: bytes=100-200\r\n\r\n'
+                                  b'GET /static/data.bin HTTP/1.1\r\nHost: localhost\r\nRange: bytes=0-9\r\n\r\n',
+                                  responses=3, end=self.content[:10])
+        finally:
+            self.app.clean_up()
+        full, single, rest = data.split(b'\r\n\r\n', 2)
+        self.assertIn(f'Content-Length: {len(self.content)}\r\n'.encode(), full)
+        self.assertTrue(single.startswith(b'HTTP/1.1 206'))
+        self.assertIn(b'Content-Length: 101\r\n', single)
+        self.assertIn(f'Content-Range: bytes 100-200/{len(self.content)}'.encode(), single)
+        # Nothing but the next response comes after the headers.
+        self.assertTrue(rest.startswith(b'HTTP/1.1 206'))
+
+    async def test_multi_range_head_expects_full_length_without_body(self):
+        ranges = b'Range: bytes=0-9,100-109\r\n'
+        address, port = run_server(self.app)
+        try:
+            data = await send_raw(address, port,
+                                  b'HEAD /static/data.bin HTTP/1.1\r\nHost: localhost\r\n' + ranges + b'\r\n'
+                                  b'GET /static/data.bin HTTP/1.1\r\nHost: localhost\r\n' + ranges + b'\r\n',
+                                  responses=2, end=b'--\r\n')
+        finally:
+            self.app.clean_up()
+        head, get, body = data.split(b'\r\n\r\n', 2)
+        self.assertTrue(head.startswith(b'HTTP/1.1 206'))
+        self.assertIn(b'Content-Type: multipart/byteranges', head)
+        self.assertTrue(get.startswith(b'HTTP/1.1 206'))
+        self.assertIn(f'Content-Length: {len(body)}\r\n'.encode(), head)
+
+
+class CompressionTestCase(TestSuite):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.content = b'body { color: red; }\n' * 1024
+        self.path = os.path.join(self.directory.name, 'style.css')
+        with open(self.path, 'wb') as f:
+            f.write(self.content)
+        self.handler = StaticHandler([self.directory.name])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def build_request(self, url: bytes, accept_encoding: bytes = None) -> Request:
+        headers = [(b'Accept-Encoding', accept_encoding)] if accept_encoding else []
+        return Request(url, Headers(headers), b'GET', None, None)
+
+    async def test_accepted_encoding_expects_compressed_once(self):
+        response = await self.handler.handle(self.build_request(b'/static/style.css', b'deflate, gzip'))
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.content), self.content)
+        self.assertEqual(self.handler.current_cache_size, len(self.content) + len(response.content))
+        second = await self.handler.handle(self.build_request(b'/static/style.css', b'gzip'))
+        self.assertIs(second, response)
+
+    async def test_full_cache_expects_decision_remembered(self):
+        self.handler.max_cache_size = len(self.content) + 1
+        calls = []
+        compressor = self.handler.compressors['gzip']
+        self.handler.compressors['gzip'] = lambda content: calls.append(1) or compressor(content)
+        await self.handler.handle(self.build_request(b'/static/style.css'))
+        for _ in range(0, 2):
+            response = await self.handler.handle(self.build_request(b'/static/style.css', b'gzip'))
+            self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(calls, [])
+        self.assertIsNone(list(self.handler.cache.values())[0].encodings['gzip'])
+
+    async def test_entry_refreshed_while_compressing_expects_result_not_cached(self):
+        started, release = threading.Event(), threading.Event()
+        compressor = self.handler.compressors['gzip']
+
+        def slow_compressor(content):
+            started.set()
+            release.wait(5)
+            return compressor(content)
+
+        self.handler.compressors['gzip'] = slow_compressor
+        task = asyncio.ensure_future(self.handler.handle(self.build_request(b'/static/style.css', b'gzip')))
+        await asyncio.get_event_loop().run_in_executor(None, started.wait, 5)
+        await self.handler.refresh_entry('/style.css')
+        release.set()
+        response = await task
+        self.assertEqual(gzip.decompress(response.content), self.content)
+        self.assertNotIn('gzip', self.handler.cache['/style.css'].encodings)
+        self.assertEqual(self.handler.current_cache_size, len(self.content))
+
+    async def test_no_accept_encoding_expects_identity_with_vary(self):
+        response = await self.handler.handle(self.build_request(b'/static/style.css'))
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.content, self.content)
+
+    async def test_rejected_encoding_expects_identity(self):
+        response = await self.handler.handle(self.build_request(b'/static/style.css', b'gzip;q=0, identity'))
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    async def test_not_compressible_type_expects_identity_without_vary(self):
+        with open(os.path.join(self.directory.name, 'image.png'), 'wb') as f:
+            f.write(b'\x89PNG' * 1024)
+        response = await self.handler.handle(self.build_request(b'/static/image.png', b'gzip'))
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertNotIn('Vary', response.headers)
+
+    async def test_precompressed_sibling_expects_served(self):
+        with open(self.path + '.gz', 'wb') as f:
+            f.write(gzip.compress(self.content))
+        app = Vibora(static=StaticHandler([self.directory.name]))
+        async with app.test_client() as client:
+            response = await client.get('/static/style.css', headers={'Accept-Encoding': 'gzip'})
+            self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+            self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+            self.assertEqual(response.content, self.content)
+
+
+class FreshnessTestCase(TestSuite):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'data.txt')
+        self.write(b'first')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, content: bytes):
+        with open(self.path, 'wb') as f:
+            f.write(content)
+
+    @staticmethod
+    def build_request(url: bytes) -> Request:
+        return Request(url, Headers([]), b'GET', None, None)
+
+    async def test_fast_etags_expects_stat_based_tag(self):
+        handler = StaticHandler([self.directory.name], fast_etags=True)
+        response = await handler.handle(self.build_request(b'/static/data.txt'))
+        stat = os.stat(self.path)
+        self.assertEqual(response.headers['ETag'], f'{int(stat.st_mtime * 1000):x}-{stat.st_size:x}')
+
+    async def test_changes_within_check_interval_expects_cached_content(self):
+        handler = StaticHandler([self.directory.name], check_interval=60)
+        response = await handler.handle(self.build_request(b'/static/data.txt'))
+        self.assertEqual(response.content, b'first')
+        self.write(b'second file')
+        response = await handler.handle(self.build_request(b'/static/data.txt'))
+        self.assertEqual(response.content, b'first')
+
+    async def test_changes_after_check_interval_expects_new_content(self):
+        handler = StaticHandler([self.directory.name], check_interval=0)
+        await handler.handle(self.build_request(b'/static/data.txt'))
+        self.write(b'second file')
+        response = await handler.handle(self.build_request(b'/static/data.txt'))
+        self.assertEqual(response.content, b'second file')
+        self.assertEqual(handler.current_cache_size, len(b'second file'))
+
+    async def test_concurrent_cold_requests_expects_single_load(self):
+        handler = StaticHandler([self.directory.name])
+        responses = await asyncio.gather(*[handler.handle(self.build_request(b'/static/data.txt')) for _ in range(5)])
+        self.assertTrue(all(response is responses[0] for response in responses))
+        self.assertEqual(handler.current_cache_size, len(b'first'))
+        self.assertEqual(handler.pending, {})
+
+
+class RangeTestCase(TestSuite):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.content = os.urandom(10000)
+        with open(os.path.join(self.directory.name, 'data.bin'), 'wb') as f:
+            f.write(self.content)
+        self.app = Vibora(static=StaticHandler([self.directory.name]))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_parse_ranges(self):
+        cases = {
+            'bytes=0-99': [(0, 99)],
+            'bytes=9000-': [(9000, 9999)],
+            'bytes=-500': [(9500, 9999)],
+            'bytes=-20000': [(0, 9999)],
+            'bytes=9990-20000': [(9990, 9999)],
+            'bytes=500-600, 0-10, 550-700, 701-710': [(0, 10), (500, 710)],
+            'bytes=10000-': [],
+            'bytes=-0': [],
+            'bytes=10-5': None,
+            'bytes=a-5': None,
+            'items=0-5': None
+        }
+        for header, expected in cases.items():
+            self.assertEqual(StaticHandler.parse_ranges(header, 10000), expected, header)
+
+    async def request(self, headers: dict):
+        async with self.app.test_client() as client:
+            return await client.get('/static/data.bin', headers=headers)
+
+    async def test_open_ended_range_expects_file_tail(self):
+        response = await self.request({'Range': 'bytes=9000-'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], 'bytes 9000-9999/10000')
+        self.assertEqual(response.content, self.content[9000:])
+
+    async def test_suffix_range_expects_last_bytes(self):
+        response = await self.request({'Range': 'bytes=-100'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.content[-100:])
+
+    async def test_unsatisfiable_range_expects_416(self):
+        response = await self.request({'Range': 'bytes=20000-30000'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers['Content-Range'], 'bytes */10000')
+
+    async def test_multiple_ranges_expects_multipart(self):
+        response = await self.request({'Range': 'bytes=0-9, 100-199'})
+        self.assertEqual(response.status_code, 206)
+        content_type = response.headers['Content-Type']
+        self.assertTrue(content_type.startswith('multipart/byteranges; boundary='))
+        boundary = content_type.split('=')[1].encode()
+        expected = b'--' + boundary + b'\r\nContent-Type: application/octet-stream\r\n' \
+                   b'Content-Range: bytes 0-9/10000\r\n\r\n' + self.content[0:10] + \
+                   b'\r\n--' + boundary + b'\r\nContent-Type: application/octet-stream\r\n' \
+                   b'Content-Range: bytes 100-199/10000\r\n\r\n' + self.content[100:200] + \
+                   b'\r\n--' + boundary + b'--\r\n'
+        self.assertEqual(response.content, expected)
+
+    async def test_if_range_with_old_etag_expects_full_content(self):
+        response = await self.request({'Range': 'bytes=0-9', 'If-Range': '"outdated"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.content)
+
+    async def test_if_range_with_current_etag_expects_range(self):
+        etag = (await self.request({})).headers['ETag']
+        response = await self.request({'Range': 'bytes=0-9', 'If-Range': etag})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.content[0:10])
+
+
+class SharedCacheTestCase(TestSuite):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.content = os.urandom(64 * 1024)
+        self.path = os.path.join(self.directory.name, 'data.bin')
+        with open(self.path, 'wb') as f:
+            f.write(self.content)
+        self.cache = SharedStaticCache(1024 * 1024, directory=self.directory.name)
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_record_stored_by_other_process_expects_shared(self):
+        process = multiprocessing.get_context('fork').Process(
+            target=self.cache.store, args=(self.path, os.stat(self.path), lambda: 'etag')
+        )
+        process.start()
+        process.join()
+        self.assertEqual(self.cache.index, {})
+        etag, offset = self.cache.store(self.path, os.stat(self.path), lambda: self.fail('Hashed twice'))
+        self.assertEqual(etag, 'etag')
+        self.assertEqual(self.cache.map[offset:offset + len(self.content)], self.content)
+
+    def test_file_bigger_than_region_expects_not_stored(self):
+        cache = SharedStaticCache(32 * 1024, directory=self.directory.name)
+        self.assertIsNone(cache.store(self.path, os.stat(self.path), lambda: 'etag'))
+        cache.close()
+
+    def test_renew_expects_empty_region(self):
+        self.cache.store(self.path, os.stat(self.path), lambda: 'etag')
+        cache = self.cache.renew()
+        try:
+            self.assertNotEqual(cache.path, self.cache.path)
+            self.assertTrue(os.path.exists(self.cache.path))
+            self.assertEqual(cache.used, cache.HEADER.size)
+            self.assertEqual(cache.index, {})
+        finally:
+            cache.close()
+
+    async def test_static_file_expects_served_from_shared_cache(self):
+        app = Vibora(static=StaticHandler([self.directory.name], shared_cache_size=1024 * 1024))
+        async with app.test_client() as client:
+            for _ in range(0, 2):
+                response = await client.get('/static/data.bin')
+                self.assertEqual(response.content, self.content)
+                response = await client.get('/static/data.bin', headers={'Range': 'bytes=10-19'})
+                self.assertEqual(response.content, self.content[10:20])
+        self.assertGreater(app.static.shared_cache.used, len(self.content))
+
+
+class EventLoopsTestCase(TestCase):
+
+    def test_static_suite_expects_success_with_every_loop(self):
+        # Workers pick their loop when vibora is imported (uvloop whenever it's installed),
+        # so each loop needs a fresh interpreter.
+        root = os.path.dirname(os.path.abspath(__file__))
+        for _ in range(0, __name__.count('.')):
+            root = os.path.dirname(root)
+        python_path = os.pathsep.join([os.path.dirname(os.path.dirname(vibora.__file__)), root])
+        cases = [f'{__name__}.{case.__name__}' for case in
+                 (FileResponseTestCase, CompressionTestCase, FreshnessTestCase, RangeTestCase, SharedCacheTestCase)]
+        for uvloop in ('1', '0'):
+            with self.subTest(uvloop=uvloop):
+                if uvloop == '1' and importlib.util.find_spec('uvloop') is None:
+                    self.skipTest('uvloop is not installed.')
+                result = subprocess.run(
+                    [sys.executable, '-m', 'unittest', *cases], cwd=root, stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT, timeout=600,
+                    env=dict(os.environ, VIBORA_UVLOOP=uvloop, PYTHONPATH=python_path)
+                )
+                self.assertEqual(result.returncode, 0, result.stdout.decode()[-3000:])
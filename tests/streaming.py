@@ -1,8 +1,12 @@
+import os
 import asyncio
+import hashlib
+import json
 from asyncio import futures
 from vibora import Vibora
-from vibora.limits import ServerLimits
-from vibora.responses import StreamingResponse
+from vibora.limits import ServerLimits, RouteLimits
+from vibora.request import Request
+from vibora.responses import StreamingResponse, JsonStreamResponse, Response
 from vibora.tests import TestSuite
 
 
@@ -26,6 +30,26 @@ class StreamingTestSuite(TestSuite):
             self.assertEqual(response.status_code, 200)
             self.assertEqual(response.content, b'1' * 100)
 
+    async def test_big_chunks_streaming_expects_successful(self):
+
+        app = Vibora()
+
+        async def stream():
+            for _ in range(0, 5):
+                yield b'1' * 1024 * 1024
+
+        @app.route('/')
+        async def home():
+            return StreamingResponse(stream)
+
+        async with app.test_client() as client:
+            response = await client.get('/', stream=True)
+            self.assertEqual(response.status_code, 200)
+            content = b''
+            async for chunk in response.stream():
+                content += chunk
+            self.assertEqual(content, b'1' * 5 * 1024 * 1024)
+
     async def test_streaming_with_timeout__expects_timeout(self):
 
         app = Vibora()
@@ -74,3 +98,89 @@ class StreamingTestSuite(TestSuite):
                 self.fail('Vibora should have closed the connection because of a chunk timeout.')
             except asyncio.IncompleteReadError:
                 pass
+
+    async def test_big_upload_expects_full_content(self):
+
+        app = Vibora()
+        content = os.urandom(5 * 1024 * 1024)
+
+        @app.route('/', methods=['POST'], limits=RouteLimits(max_body_size=10 * 1024 * 1024))
+        async def home(request: Request):
+            chunks = []
+            async for chunk in request.stream:
+                self.assertIsInstance(chunk, bytes)
+                chunks.append(chunk)
+            return Response(hashlib.md5(b''.join(chunks)).hexdigest().encode())
+
+        async with app.test_client() as client:
+            response = await client.post('/', body=content)
+            self.assertEqual(response.content, hashlib.md5(content).hexdigest().encode())
+
+    async def test_upload_with_small_watermarks_expects_full_content(self):
+
+        app = Vibora(server_limits=ServerLimits(stream_high_watermark=8 * 1024, stream_low_watermark=2 * 1024))
+        content = os.urandom(2 * 1024 * 1024)
+
+        @app.route('/', methods=['POST'], limits=RouteLimits(max_body_size=10 * 1024 * 1024))
+        async def home(request: Request):
+            # Giving the connection time to fill the queue up to the high watermark.
+            await asyncio.sleep(0.2)
+            return Response(bytes(await request.stream.read()))
+
+        async with app.test_client() as client:
+            for _ in range(0, 2):
+                response = await client.post('/', body=content)
+                self.assertEqual(response.content, content)
+
+    def test_inverted_watermarks_expects_error(self):
+        with self.assertRaises(ValueError):
+            ServerLimits(stream_high_watermark=1024, stream_low_watermark=2048)
+
+
+class JsonStreamResponseTestCase(TestSuite):
+
+    async def test_json_array_expects_every_item(self):
+        app = Vibora()
+        items = [{'id': x, 'name': 'a' * (x % 50)} for x in range(0, 10000)]
+
+        @app.route('/')
+        async def home():
+            return JsonStreamResponse(iter(items), batch_size=1024)
+
+        async with app.test_client() as client:
+            response = await client.get('/')
+            self.assertEqual(response.headers['Content-Type'], 'application/json')
+            self.assertEqual(response.json(), items)
+
+    async def test_async_ndjson_expects_one_item_per_line(self):
+        app = Vibora()
+
+        async def items():
+            for x in range(0, 100):
+                await asyncio.sleep(0)
+                yield {'id': x}
+
+        @app.route('/')
+        async def home():
+            return JsonStreamResponse(items(), ndjson=True)
+
+        async with app.test_client() as client:
+            response = await client.get('/')
+            self.assertEqual(response.headers['Content-Type'], 'application/x-ndjson')
+            lines = response.content.splitlines()
+            self.assertEqual([json.loads(line) for line in lines], [{'id': x} for x in range(0, 100)])
+
+    async def test_empty_items_expects_empty_array(self):
+        app = Vibora()
+
+        @app.route('/')
+        async def home():
+            return JsonStreamResponse([])
+
+        async with app.test_client() as client:
+            response = await client.get('/')
+            self.assertEqual(response.content, b'[]')
+
+    def test_not_iterable_expects_error(self):
+        with self.assertRaises(ValueError):
+            JsonStreamResponse(1)
@@ -1,8 +1,10 @@
 import asyncio
+import time
 from vibora import Vibora
-from vibora.limits import RouteLimits
+from vibora.limits import RouteLimits, ServerLimits
 from vibora.tests import TestSuite
 from vibora.responses import Response, StreamingResponse
+from tests import run_server
 
 
 class TimeoutsTestCase(TestSuite):
@@ -91,3 +93,40 @@ class TimeoutsTestCase(TestSuite):
         async with app.test_client() as client:
             response = await client.get('/')
             self.assertEqual(response.content, b'123')
+
+
+class KeepAliveTimeoutTestCase(TestSuite):
+
+    def setUp(self):
+        self.app = Vibora(server_limits=ServerLimits(keep_alive_timeout=1))
+
+        @self.app.route('/')
+        async def home():
+            return Response(b'Correct.')
+
+        self.address, self.port = run_server(self.app)
+
+    def tearDown(self):
+        self.app.clean_up()
+
+    async def test_idle_connection_expects_closed(self):
+        reader, writer = await asyncio.open_connection(self.address, self.port)
+        writer.write(b'GET / HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        self.assertIn(b'Correct.', await asyncio.wait_for(reader.read(1024), 5))
+        started = time.time()
+        self.assertEqual(await asyncio.wait_for(reader.read(), 5), b'')
+        self.assertGreaterEqual(time.time() - started, 0.9)
+        writer.close()
+
+    async def test_silent_connection_expects_closed(self):
+        reader, writer = await asyncio.open_connection(self.address, self.port)
+        self.assertEqual(await asyncio.wait_for(reader.read(), 5), b'')
+        writer.close()
+
+    async def test_active_connection_expects_kept_alive(self):
+        reader, writer = await asyncio.open_connection(self.address, self.port)
+        for _ in range(0, 6):
+            writer.write(b'GET / HTTP/1.1\r\nHost: localhost\r\n\r\n')
+            self.assertIn(b'Correct.', await asyncio.wait_for(reader.read(1024), 5))
+            await asyncio.sleep(0.5)
+        writer.close()
@@ -0,0 +1,459 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from unittest import TestCase, skipUnless
+from vibora import Vibora
+from vibora.client import Session
+from vibora.hooks import Events
+from vibora.limits import ServerLimits
+from vibora.responses import JsonResponse
+from vibora.static import StaticHandler
+from vibora.tests import TestSuite
+from vibora.workers.sockets import ListenMode, create_listeners, cpu_steering_map
+from vibora.utils import parse_cpu_list, allowed_cpus, numa_nodes, distribute_cpus, get_free_port
+from tests import run_server
+
+
+class CpuHelpersTestCase(TestCase):
+
+    def test_parse_cpu_list_expects_every_cpu(self):
+        self.assertEqual(parse_cpu_list('0-3,8,10-11\n'), {0, 1, 2, 3, 8, 10, 11})
+        self.assertEqual(parse_cpu_list(''), set())
+
+    def test_numa_nodes_expects_only_allowed_cpus(self):
+        nodes = numa_nodes()
+        self.assertTrue(nodes)
+        self.assertEqual(set().union(*nodes), set(allowed_cpus()))
+
+    def test_distribute_without_affinity_expects_no_pinning(self):
+        self.assertEqual(distribute_cpus(None, 3), [None, None, None])
+
+    @skipUnless(hasattr(os, 'sched_setaffinity'), 'CPU affinity is not supported in this platform.')
+    def test_distribute_expects_round_robin(self):
+        cpus = allowed_cpus()
+        self.assertEqual(distribute_cpus(True, len(cpus) * 2), [{cpu} for cpu in cpus] * 2)
+        self.assertEqual(distribute_cpus([{0, 1}, {2, 3}], 3), [{0, 1}, {2, 3}, {0, 1}])
+
+    @skipUnless(hasattr(os, 'sched_setaffinity'), 'CPU affinity is not supported in this platform.')
+    def test_distribute_empty_sets_expects_error(self):
+        with self.assertRaises(ValueError):
+            distribute_cpus([{0}, set()], 1)
+
+
+@skipUnless(hasattr(os, 'sched_setaffinity'), 'CPU affinity is not supported in this platform.')
+class WorkersAffinityTestCase(TestSuite):
+
+    def setUp(self):
+        self.app = Vibora()
+
+        @self.app.route('/')
+        async def home():
+            return JsonResponse(sorted(os.sched_getaffinity(0)))
+
+    async def test_pinned_worker_expects_single_cpu(self):
+        address, port = run_server(self.app, cpu_affinity=True)
+        try:
+            async with Session(prefix=f'http://{address}:{port}', keep_alive=False) as client:
+                response = await client.get('/')
+                self.assertEqual(response.json(), [allowed_cpus()[0]])
+        finally:
+            self.app.clean_up()
+
+    async def test_worker_pinned_to_cpu_set_expects_set(self):
+        cpus = set(allowed_cpus())
+        address, port = run_server(self.app, cpu_affinity=[cpus])
+        try:
+            async with Session(prefix=f'http://{address}:{port}', keep_alive=False) as client:
+                response = await client.get('/')
+                self.assertEqual(response.json(), sorted(cpus))
+        finally:
+            self.app.clean_up()
+
+
+class ListenModesTestCase(TestSuite):
+
+    def setUp(self):
+        self.app = Vibora()
+
+        @self.app.route('/')
+        async def home():
+            return JsonResponse({'pid': os.getpid()})
+
+    async def assert_served_by_workers(self, listen_mode: int, workers: int):
+        address, port = run_server(self.app, workers=workers, listen_mode=listen_mode)
+        try:
+            pids = {worker.pid for worker in self.app.workers}
+            async with Session(prefix=f'http://{address}:{port}', keep_alive=False) as client:
+                for _ in range(0, 10):
+                    response = await client.get('/')
+                    self.assertIn(response.json()['pid'], pids)
+        finally:
+            self.app.clean_up()
+        self.assertEqual(self.app.listeners, [])
+
+    async def test_shared_socket_expects_served(self):
+        await self.assert_served_by_workers(ListenMode.SHARED, 2)
+
+    async def test_shared_socket_with_stopped_worker_expects_served(self):
+        address, port = run_server(self.app, workers=2, listen_mode=ListenMode.SHARED)
+        try:
+            stopped, running = self.app.workers
+            stopped.terminate()
+            await asyncio.get_event_loop().run_in_executor(None, stopped.join, 5)
+            self.assertEqual(stopped.exitcode, 0)
+            async with Session(prefix=f'http://{address}:{port}', keep_alive=False) as client:
+                for _ in range(0, 10):
+                    response = await asyncio.wait_for(client.get('/'), 2)
+                    self.assertEqual(response.json()['pid'], running.pid)
+        finally:
+            self.app.clean_up()
+
+    @skipUnless(sys.platform.startswith('linux'), 'CBPF steering is only available on Linux.')
+    async def test_cpu_steering_expects_served(self):
+        await self.assert_served_by_workers(ListenMode.REUSEPORT_CPU, len(allowed_cpus()))
+
+    @skipUnless(sys.platform.startswith('linux'), 'CBPF steering is only available on Linux.')
+    def test_cpu_steering_expects_socket_of_pinned_worker(self):
+        cpu = min(allowed_cpus())
+        # The worker pinned to our CPU owns the last socket, the others are pinned to CPUs that don't exist.
+        cpu_sets = [{4096}, {4097}, {cpu}]
+        sock, address, port = get_free_port()
+        sock.close()
+        listeners = create_listeners(ListenMode.REUSEPORT_CPU, address, port, len(cpu_sets), cpu_sets)
+        original_affinity = os.sched_getaffinity(0)
+        clients = []
+        try:
+            # Loopback connections are received by the CPU that opens them.
+            os.sched_setaffinity(0, {cpu})
+            for _ in range(0, 5):
+                clients.append(socket.create_connection((address, port)))
+            for listener in listeners:
+                listener.setblocking(False)
+            accepted = []
+            for listener in listeners:
+                count = 0
+                while True:
+                    try:
+                        connection, _ = listener.accept()
+                    except BlockingIOError:
+                        break
+                    connection.close()
+                    count += 1
+                accepted.append(count)
+            self.assertEqual(accepted, [0, 0, 5])
+        finally:
+            os.sched_setaffinity(0, original_affinity)
+            for client in clients:
+                client.close()
+            for listener in listeners:
+                listener.close()
+
+    def test_cpu_steering_with_shared_cpus_expects_error(self):
+        with self.assertRaises(ValueError):
+            cpu_steering_map([{0}, {1}, {0}])
+        with self.assertRaises(ValueError):
+            cpu_steering_map([None, None])
+        self.assertEqual(cpu_steering_map([{4, 5}, {6, 7}]), {4: 0, 5: 0, 6: 1, 7: 1})
+
+    @skipUnless(sys.platform.startswith('linux'), 'CBPF steering is only available on Linux.')
+    def test_cpu_steering_default_workers_expects_one_per_cpu(self):
+        run_server(self.app, workers=None, listen_mode=ListenMode.REUSEPORT_CPU)
+        try:
+            self.assertEqual(len(self.app.workers), len(allowed_cpus()))
+        finally:
+            self.app.clean_up()
+
+    def test_unknown_mode_expects_error(self):
+        with self.assertRaises(ValueError):
+            create_listeners(99, '127.0.0.1', 0, 1)
+
+
+class DeadWorkerTestCase(TestSuite):
+
+    def setUp(self):
+        self.app = Vibora()
+
+        @self.app.route('/')
+        async def home():
+            return JsonResponse({'pid': os.getpid()})
+
+    async def assert_served_after_kill(self, listen_mode: int, workers: int):
+        address, port = run_server(self.app, workers=workers, listen_mode=listen_mode)
+        try:
+            dead_worker = self.app.workers[0]
+            os.kill(dead_worker.pid, signal.SIGKILL)
+            await asyncio.get_event_loop().run_in_executor(None, dead_worker.join, 5)
+            for _ in range(0, 50):
+                if len(self.app.listeners) == workers - 1:
+                    break
+                await asyncio.sleep(0.1)
+            self.assertEqual(len(self.app.listeners), workers - 1)
+            pids = {worker.pid for worker in self.app.workers}
+            self.assertNotIn(dead_worker.pid, pids)
+            async with Session(prefix=f'http://{address}:{port}', keep_alive=False) as client:
+                for _ in range(0, 40):
+                    response = await asyncio.wait_for(client.get('/'), 2)
+                    self.assertIn(response.json()['pid'], pids)
+        finally:
+            self.app.clean_up()
+
+    async def test_killed_worker_expects_every_connection_served(self):
+        await self.assert_served_after_kill(ListenMode.REUSEPORT, 4)
+
+    @skipUnless(sys.platform.startswith('linux') and len(allowed_cpus()) > 1,
+                'CBPF steering is only available on Linux, killing the only worker leaves nobody to steer to.')
+    async def test_killed_steered_worker_expects_every_connection_served(self):
+        await self.assert_served_after_kill(ListenMode.REUSEPORT_CPU, len(allowed_cpus()))
+
+
+class RollingReloadTestCase(TestSuite):
+
+    def test_reload_expects_no_failed_requests(self):
+        app = Vibora()
+
+        @app.route('/')
+        async def home():
+            return JsonResponse({'pid': os.getpid()})
+
+        @app.route('/slow')
+        async def slow():
+            await asyncio.sleep(1)
+            return JsonResponse({'pid': os.getpid()})
+
+        address, port = run_server(app, workers=2)
+        sending, reloaded = threading.Event(), threading.Event()
+        statuses, errors, last_pid = [], [], []
+
+        async def send_requests():
+            async with Session(prefix=f'http://{address}:{port}', keep_alive=False) as client:
+                slow_request = asyncio.ensure_future(client.get('/slow'))
+                while not reloaded.is_set():
+                    statuses.append((await client.get('/')).status_code)
+                    sending.set()
+                statuses.append((await slow_request).status_code)
+                last_pid.append((await client.get('/')).json()['pid'])
+
+        def client_thread():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(send_requests())
+            except Exception as error:
+                errors.append(error)
+            finally:
+                sending.set()
+                loop.close()
+
+        try:
+            old_pids = {worker.pid for worker in app.workers}
+            client = threading.Thread(target=client_thread)
+            client.start()
+            self.assertTrue(sending.wait(5))
+            # Reloads run in the main thread of the master, like the SIGHUP handler does.
+            try:
+                self.assertTrue(app.reload())
+            finally:
+                reloaded.set()
+                client.join(10)
+            self.assertEqual(errors, [])
+            self.assertTrue(statuses)
+            self.assertEqual(set(statuses), {200})
+            new_pids = {worker.pid for worker in app.workers}
+            self.assertEqual(len(new_pids), 2)
+            self.assertFalse(old_pids & new_pids)
+            self.assertIn(last_pid[0], new_pids)
+        finally:
+            app.clean_up()
+
+    def test_reload_from_thread_expects_graceful_stop(self):
+        app = Vibora()
+        address, port = run_server(app)
+        try:
+            results = []
+            thread = threading.Thread(target=lambda: results.append(app.reload()))
+            thread.start()
+            thread.join(30)
+            self.assertEqual(results, [True])
+            worker = app.workers[0]
+            worker.terminate()
+            worker.join(5)
+            self.assertEqual(worker.exitcode, 0)
+        finally:
+            app.clean_up()
+
+    async def test_reload_expects_empty_shared_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            content = os.urandom(64 * 1024)
+            with open(os.path.join(directory, 'data.bin'), 'wb') as f:
+                f.write(content)
+            app = Vibora(static=StaticHandler([directory], shared_cache_size=1024 * 1024))
+            address, port = run_server(app, workers=2)
+            try:
+                old_cache = app.static.shared_cache
+                async with Session(prefix=f'http://{address}:{port}', keep_alive=False) as client:
+                    self.assertEqual((await client.get('/static/data.bin')).content, content)
+                    self.assertTrue(app.reload())
+                    self.assertFalse(os.path.exists(old_cache.path))
+                    self.assertEqual(app.static.shared_cache.used, old_cache.HEADER.size)
+                    self.assertEqual((await client.get('/static/data.bin')).content, content)
+                    self.assertGreater(app.static.shared_cache.used, len(content))
+            finally:
+                app.clean_up()
+
+    def test_failed_reload_expects_shared_caches_kept_until_replaced(self):
+        app = Vibora(static=StaticHandler([], shared_cache_size=1024 * 1024))
+        # Workers beyond this number (started ones are counted across processes) fail to start.
+        started, limit = multiprocessing.Value('i', 0), multiprocessing.Value('i', 2)
+
+        @app.handle(Events.BEFORE_SERVER_START)
+        async def fail_over_limit():
+            with started.get_lock():
+                started.value += 1
+                count = started.value
+            if count > limit.value:
+                os._exit(1)
+
+        run_server(app, workers=2)
+        try:
+            first = app.static.shared_cache
+            directory = os.path.dirname(first.path)
+            backing_files = set(os.listdir(directory))
+            self.assertFalse(app.reload(timeout=5))
+            # Nothing was replaced, the current region is kept and the new one dropped.
+            self.assertIs(app.static.shared_cache, first)
+            self.assertEqual(set(os.listdir(directory)), backing_files)
+            self.assertEqual(app.retired_caches, [])
+            # Only the first worker gets replaced.
+            limit.value = started.value + 1
+            self.assertFalse(app.reload(timeout=5))
+            second = app.static.shared_cache
+            self.assertIsNot(second, first)
+            self.assertEqual(app.retired_caches, [first])
+            self.assertTrue(os.path.exists(first.path))
+            limit.value = started.value + 2
+            self.assertTrue(app.reload(timeout=5))
+            self.assertEqual(app.retired_caches, [])
+            self.assertFalse(os.path.exists(first.path))
+            self.assertFalse(os.path.exists(second.path))
+            self.assertTrue(os.path.exists(app.static.shared_cache.path))
+        finally:
+            app.clean_up()
+
+
+class StartUpTestCase(TestSuite):
+
+    def setUp(self):
+        self.app = Vibora()
+        run_server(self.app, workers=2)
+
+    def tearDown(self):
+        self.app.clean_up()
+
+    def test_run_expects_every_worker_ready(self):
+        self.assertTrue(all(worker.ready.is_set() for worker in self.app.workers))
+
+    def test_terminate_right_after_run_expects_graceful_exit(self):
+        for worker in self.app.workers:
+            worker.terminate()
+        for worker in self.app.workers:
+            worker.join(5)
+            self.assertEqual(worker.exitcode, 0)
+
+
+class DrainTestCase(TestSuite):
+
+    def setUp(self):
+        self.app = Vibora()
+        self.in_flight = multiprocessing.Event()
+
+        @self.app.route('/slow')
+        async def slow():
+            self.in_flight.set()
+            await asyncio.sleep(0.5)
+            return JsonResponse({'pid': os.getpid()})
+
+        self.address, self.port = run_server(self.app)
+
+    def tearDown(self):
+        self.app.clean_up()
+
+    async def test_idle_worker_expects_immediate_stop(self):
+        reader, writer = await asyncio.open_connection(self.address, self.port)
+        writer.write(b'GET /slow HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        self.assertIn(b'pid', await asyncio.wait_for(reader.read(1024), 5))
+        # Only an idle keep-alive connection is left now.
+        worker = self.app.workers[0]
+        started = time.time()
+        worker.terminate()
+        await asyncio.get_event_loop().run_in_executor(None, worker.join, 5)
+        self.assertFalse(worker.is_alive())
+        self.assertLess(time.time() - started, 0.9)
+        self.assertEqual(await asyncio.wait_for(reader.read(), 1), b'')
+        writer.close()
+
+    async def test_fresh_connection_expects_closed_after_grace_period(self):
+        reader, writer = await asyncio.open_connection(self.address, self.port)
+        worker = self.app.workers[0]
+        started = time.time()
+        worker.terminate()
+        await asyncio.get_event_loop().run_in_executor(None, worker.join, 5)
+        self.assertFalse(worker.is_alive())
+        self.assertLess(time.time() - started, 3)
+        self.assertEqual(await asyncio.wait_for(reader.read(), 1), b'')
+        writer.close()
+
+    async def test_in_flight_request_expects_response_before_stop(self):
+        worker = self.app.workers[0]
+        async with Session(prefix=f'http://{self.address}:{self.port}', keep_alive=True) as client:
+            request = asyncio.ensure_future(client.get('/slow'))
+            await asyncio.get_event_loop().run_in_executor(None, self.in_flight.wait, 5)
+            started = time.time()
+            worker.terminate()
+            response = await asyncio.wait_for(request, 5)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), {'pid': worker.pid})
+        await asyncio.get_event_loop().run_in_executor(None, worker.join, 5)
+        self.assertFalse(worker.is_alive())
+        self.assertLess(time.time() - started, 0.9)
+
+
+class WatchdogTestCase(TestSuite):
+
+    def setUp(self):
+        self.app = Vibora(server_limits=ServerLimits(worker_timeout=1))
+
+        @self.app.route('/')
+        async def home():
+            return JsonResponse({'pid': os.getpid()})
+
+        @self.app.route('/block')
+        async def block():
+            time.sleep(10)
+            return JsonResponse({'pid': os.getpid()})
+
+        self.address, self.port = run_server(self.app)
+
+    def tearDown(self):
+        self.app.clean_up()
+
+    async def test_blocked_worker_expects_killed(self):
+        worker = self.app.workers[0]
+        reader, writer = await asyncio.open_connection(self.address, self.port)
+        writer.write(b'GET /block HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        await asyncio.get_event_loop().run_in_executor(None, worker.join, 5)
+        self.assertEqual(worker.exitcode, -signal.SIGKILL)
+        self.assertEqual(await asyncio.wait_for(reader.read(), 1), b'')
+        writer.close()
+
+    async def test_idle_worker_expects_alive(self):
+        worker = self.app.workers[0]
+        await asyncio.sleep(3)
+        self.assertTrue(worker.is_alive())
+        async with Session(prefix=f'http://{self.address}:{self.port}', keep_alive=False) as client:
+            self.assertEqual((await client.get('/')).json(), {'pid': worker.pid})
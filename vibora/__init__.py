@@ -1,9 +1,12 @@
 import asyncio
-try:
-    import uvloop
-    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
-except ImportError:
-    pass
+import os
+# Same switch as vibora.utils.asynclib, otherwise new_event_loop() would still return uvloop loops.
+if os.environ.get('VIBORA_UVLOOP', 1) != '0':
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
 from .server import *
 from .tests import *
 from .responses import *
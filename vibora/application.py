@@ -1,9 +1,10 @@
 from itertools import chain
-from typing import Callable, Type, List, Optional
+from threading import Lock
+from typing import Callable, Type, List, Optional, Union
 from .request import Request
 from .blueprints import Blueprint
 from .sessions import SessionEngine
-from .router import Router, RouterStrategy, RouteLimits
+from .router import Router, RouterStrategy, RouterEngine, RouteLimits
 from .protocol import Connection
 from .responses import Response
 from .components import ComponentsEngine
@@ -12,6 +13,7 @@ from .templates.engine import TemplateEngine
 from .templates.extensions import ViboraNodes
 from .static import StaticHandler
 from .limits import ServerLimits
+from .serializers import JsonBackend, scope_json_backend
 
 
 class Application(Blueprint):
@@ -22,7 +24,9 @@ class Application(Blueprint):
                  sessions_engine: SessionEngine=None, server_name: str = None, url_scheme: str = 'http',
                  static: StaticHandler=None, log_handler: Callable=None, access_logs: bool=None,
                  server_limits: ServerLimits=None, route_limits: RouteLimits=None,
-                 request_class: Type[Request]=Request):
+                 request_class: Type[Request]=Request, router_engine: int=RouterEngine.LINEAR,
+                 router_cache_size: int=4096, handler: Type[Connection]=Connection,
+                 json_backend: Union[str, JsonBackend]=None):
         """
 
         :param template_dirs:
@@ -34,18 +38,36 @@ class Application(Blueprint):
         :param log_handler:
         :param server_limits:
         :param route_limits:
+        :param router_engine:
+        :param router_cache_size: How many resolved routes are kept in memory (LRU, keyed by path and method).
+        :param handler: Protocol class used for each connection,
+        BufferedConnection receives data into pooled buffers instead of new bytes objects.
+        :param json_backend: JSON backend (name or instance) used by JsonResponse and Request.json,
+        routes and blueprints can choose their own.
         """
         super().__init__(template_dirs=template_dirs, limits=route_limits)
         self.debug_mode = False
         self.test_mode = False
         self.server_name = server_name
         self.url_scheme = url_scheme
-        self.handler = Connection
-        self.router = Router(strategy=router_strategy)
+        self.router = Router(strategy=router_strategy, engine=router_engine, cache_size=router_cache_size)
         self.template_engine = TemplateEngine(extensions=[ViboraNodes(self)])
         self.static = static or StaticHandler([])
         self.connections = set()
+        # Event set when the last connection is closed, only while the worker is stopping.
+        self.connections_drained = None
+        # Timer wheel of the worker event loop (keep-alive and request deadlines).
+        self.timers = None
+        # Master thread that kills workers with a blocked event loop.
+        self.watchdog = None
         self.workers = []
+        self.workers_lock = Lock()
+        self.reload_requested = False
+        # Listening sockets owned by the master (in reuseport group order) and how they were created.
+        self.listeners = []
+        self.listen_mode = None
+        # Shared static caches still used by workers that a failed reload could not replace.
+        self.retired_caches = []
         self.components = ComponentsEngine()
         self.loop = None
         self.access_logs = access_logs
@@ -57,6 +79,11 @@ class Application(Blueprint):
             raise ValueError('class_obj must be a child of the Vibora Request class. '
                              '(from vibora.request import Request)')
         self.request_class = request_class
+        if not issubclass(handler, Connection):
+            raise ValueError('handler must be a child of the Vibora Connection class. '
+                             '(from vibora.protocol import Connection)')
+        self.handler = handler
+        self.json_backend = scope_json_backend(json_backend) if json_backend else None
         self.session_engine = sessions_engine
         self._test_client = None
 
@@ -109,9 +136,14 @@ class Application(Blueprint):
                         merged_prefixes = {name or nested_name: pattern + nested_pattern}
                     self.__register_blueprint_routes(nested_blueprint, prefixes=merged_prefixes)
         blueprint.app = self
+        # Nested blueprints inherit the backend of the closest parent that picked one, the app included.
+        json_backend, parent = blueprint.json_backend, blueprint.parent
+        while json_backend is None and parent is not None:
+            json_backend, parent = parent.json_backend, parent.parent
         for route in blueprint.routes:
             route.app = self.app
             route.limits = route.limits or self.limits
+            route.json_backend = route.json_backend or json_backend
             self.router.add_route(route, prefixes=prefixes)
 
     def add_blueprint(self, blueprint, prefixes: dict = None):
@@ -151,8 +183,17 @@ class Application(Blueprint):
 
         :return:
         """
+        if self.watchdog:
+            self.watchdog.stop()
+            self.watchdog = None
         for process in self.workers:
             process.terminate()
+        for sock in self.listeners:
+            sock.close()
+        self.listeners.clear()
+        for cache in self.retired_caches:
+            cache.close()
+        self.retired_caches.clear()
         self.running = False
 
     def url_for(self, _name: str, _external=False, *args, **kwargs) -> str:
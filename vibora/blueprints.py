@@ -1,4 +1,5 @@
 from inspect import isclass, iscoroutinefunction
+from typing import Union
 from .cache import Static
 from .optimizer import is_static
 from .exceptions import ExceptionHandler, DuplicatedBlueprint, ConflictingPrefixes
@@ -6,10 +7,12 @@ from .router import Route, WebsocketRoute, websocket_handshake_handler
 from .hooks import Hook, Events
 from .responses import Response, StreamingResponse
 from .limits import RouteLimits
+from .serializers import JsonBackend, scope_json_backend
 
 
 class Blueprint:
-    def __init__(self, template_dirs=None, hosts: list=None, limits: RouteLimits=None):
+    def __init__(self, template_dirs=None, hosts: list=None, limits: RouteLimits=None,
+                 json_backend: Union[str, JsonBackend]=None):
         self.default_routes = {}
         self.routes = []
         self.hooks = {}
@@ -19,6 +22,7 @@ class Blueprint:
         self.blueprints = {}
         self.hosts = hosts
         self.limits = limits or RouteLimits()
+        self.json_backend = scope_json_backend(json_backend) if json_backend else None
 
         # Initializing cached events.
         for key in Events.ALL:
@@ -49,7 +53,10 @@ class Blueprint:
                     raise SyntaxError('{0} is not allowed at @handle.'.format(v))
         return wrapper
 
-    def route(self, pattern, methods=None, cache=None, name=None, hosts: list=None, limits: RouteLimits=None):
+    def route(self, pattern, methods=None, cache=None, name=None, hosts: list=None, limits: RouteLimits=None,
+              json_backend: Union[str, JsonBackend]=None):
+        chosen_backend = scope_json_backend(json_backend) if json_backend else self.json_backend
+
         def register(handler):
             # Checking if handler is co-routine.
             if not iscoroutinefunction(handler):
@@ -74,7 +81,8 @@ class Blueprint:
 
             new_route = Route(encoded_pattern, handler, tuple(methods or (b'GET',)),
                               parent=self, name=route_name, cache=chosen_cache,
-                              hosts=hosts or self.hosts, limits=limits or self.limits)
+                              hosts=hosts or self.hosts, limits=limits or self.limits,
+                              json_backend=chosen_backend)
             self.add_route(new_route)
             return handler
 
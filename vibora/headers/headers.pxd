@@ -1,6 +1,12 @@
 # cython: language_level=3, boundscheck=False, wraparound=False, annotation_typing=False
 import cython
 
+cdef dict NAMES
+
+@cython.locals(normalized=tuple, lowered=str, raw=bytes)
+cpdef tuple normalize_name(str name)
+
+
 @cython.freelist(1024)
 cdef class Headers:
 
@@ -8,7 +14,12 @@ cdef class Headers:
     cdef list raw
     cdef bint evaluated
 
+    cpdef append(self, bytes name, bytes value)
+    @cython.locals(index=Py_ssize_t, total=Py_ssize_t, length=Py_ssize_t, current=bytes)
+    cpdef Py_ssize_t find(self, bytes name, Py_ssize_t start)
+    cpdef lookup(self, str key)
     cpdef get(self, str key, object default=*)
+    cpdef list get_list(self, str key)
     cpdef eval(self)
     cpdef dump(self)
 
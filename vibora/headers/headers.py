@@ -1,22 +1,108 @@
+# The request parser hands out these exact objects when it sees one of these names (in any case),
+# so lookups for common headers are identity checks.
+COMMON_HEADER_NAMES = (
+    b'host', b'user-agent', b'accept', b'accept-encoding', b'accept-language', b'accept-charset', b'connection',
+    b'keep-alive', b'content-type', b'content-length', b'content-encoding', b'transfer-encoding', b'cookie',
+    b'cache-control', b'pragma', b'referer', b'origin', b'authorization', b'expect', b'range', b'if-range',
+    b'if-match', b'if-none-match', b'if-modified-since', b'if-unmodified-since', b'upgrade',
+    b'upgrade-insecure-requests', b'dnt', b'te', b'via', b'forwarded', b'x-forwarded-for', b'x-forwarded-proto',
+    b'x-forwarded-host', b'x-real-ip', b'x-requested-with', b'sec-websocket-key', b'sec-websocket-version',
+    b'sec-websocket-extensions', b'sec-websocket-protocol', b'sec-fetch-site', b'sec-fetch-mode',
+    b'sec-fetch-dest', b'sec-fetch-user'
+)
+INTERNED_NAMES = {name: name for name in COMMON_HEADER_NAMES}
+
+# Lowercase str/bytes versions of the names used in lookups, so they are built only once.
+NAMES = {}
+
+
+def normalize_name(name: str) -> tuple:
+    normalized = NAMES.get(name)
+    if normalized is None:
+        if len(NAMES) > 1024:
+            NAMES.clear()
+        lowered = name.lower()
+        raw = lowered.encode('utf-8')
+        normalized = NAMES[name] = (lowered, INTERNED_NAMES.get(raw, raw))
+    return normalized
 
 
 class Headers:
+    """
+    Keeps the raw header names/values exactly as they came from the parser (flat list of bytes,
+    name followed by value) and only decodes the values that are asked for.
+    """
 
     def __init__(self, raw=None):
-        self.raw = raw or []
-        self.values = None
+        self.raw = []
+        self.values = {}
         self.evaluated = False
+        if raw:
+            for name, value in raw:
+                self.raw.append(name)
+                self.raw.append(value)
 
-    def get(self, key, default=None):
-        if not self.evaluated:
-            self.eval()
-        return self.values.get(key.lower()) or default
+    def append(self, name: bytes, value: bytes):
+        self.raw.append(name)
+        self.raw.append(value)
+
+    def find(self, name: bytes, start):
+        """
+        Case-insensitive search without decoding anything.
+
+        :param name: Lowercase header name.
+        :param start: Position in the raw list to start from.
+        :return: The position of the first value with this name after start or -1.
+        """
+        length = len(name)
+        total = len(self.raw)
+        index = start
+        while index < total:
+            current = self.raw[index]
+            if current is name or (len(current) == length and current.lower() == name):
+                return index + 1
+            index += 2
+        return -1
+
+    def lookup(self, key: str):
+        """
+
+        :param key:
+        :return: The decoded value of the first header with this name or None.
+        """
+        name, raw_name = normalize_name(key)
+        value = self.values.get(name)
+        if value is None:
+            index = self.find(raw_name, 0)
+            if index != -1:
+                value = self.values[name] = self.raw[index].decode('utf-8')
+        return value
+
+    def get(self, key: str, default=None):
+        return self.lookup(key) or default
+
+    def get_list(self, key: str) -> list:
+        """
+        All the values sent with this header name, in the order they came.
+
+        :param key:
+        :return:
+        """
+        name, raw_name = normalize_name(key)
+        values = []
+        index = self.find(raw_name, 0)
+        while index != -1:
+            values.append(self.raw[index].decode('utf-8'))
+            index = self.find(raw_name, index + 1)
+        if not values and name in self.values:
+            values.append(self.values[name])
+        return values
 
     def eval(self):
-        self.values = {}
-        while self.raw:
-            header = self.raw.pop()
-            self.values[header[0].decode('utf-8').lower()] = header[1].decode('utf-8')
+        for index in range(0, len(self.raw), 2):
+            name = self.raw[index].decode('utf-8').lower()
+            if name not in self.values:
+                self.values[name] = self.raw[index + 1].decode('utf-8')
         self.evaluated = True
 
     def dump(self):
@@ -36,14 +122,18 @@ class Headers:
         return cookies
 
     def __getitem__(self, item: str):
-        if not self.evaluated:
-            self.eval()
-        return self.values[item.lower()]
+        value = self.lookup(item)
+        if value is None:
+            raise KeyError(item)
+        return value
 
     def __setitem__(self, key: str, value: str):
-        if not self.evaluated:
-            self.eval()
-        self.values[key.lower()] = value
+        name, raw_name = normalize_name(key)
+        index = self.find(raw_name, 0)
+        while index != -1:
+            del self.raw[index - 1:index + 1]
+            index = self.find(raw_name, index - 1)
+        self.values[name] = value
 
     def __repr__(self):
         return f'<Headers {self.dump()}>'
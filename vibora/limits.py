@@ -3,20 +3,27 @@
 class ServerLimits:
 
     __slots__ = ('worker_timeout', 'keep_alive_timeout', 'response_timeout', 'max_body_size',
-                 'max_headers_size', 'write_buffer')
+                 'max_headers_size', 'write_buffer', 'stream_high_watermark', 'stream_low_watermark')
 
     def __init__(self, worker_timeout: int=60, keep_alive_timeout: int=30,
-                 max_headers_size: int=1024 * 10, write_buffer: int=419430):
+                 max_headers_size: int=1024 * 10, write_buffer: int=419430,
+                 stream_high_watermark: int=512 * 1024, stream_low_watermark: int=128 * 1024):
         """
 
         :param worker_timeout:
         :param keep_alive_timeout:
         :param max_headers_size:
+        :param stream_high_watermark: Request body bytes buffered in memory before the server stops reading.
+        :param stream_low_watermark: Reading resumes once the handler consumes the body below this mark.
         """
+        if stream_low_watermark > stream_high_watermark:
+            raise ValueError('stream_low_watermark cannot be bigger than stream_high_watermark.')
         self.worker_timeout = worker_timeout
         self.keep_alive_timeout = keep_alive_timeout
         self.max_headers_size = max_headers_size
         self.write_buffer = write_buffer
+        self.stream_high_watermark = stream_high_watermark
+        self.stream_low_watermark = stream_low_watermark
 
 
 class RouteLimits:
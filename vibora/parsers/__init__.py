@@ -1,4 +1,4 @@
-from . import parser, response, errors
+from . import parser, response, errors, jsonstream
 from .parser import parse_url
 
-__all__ = parser.__all__ + errors.__all__ + response.__all__
+__all__ = parser.__all__ + errors.__all__ + response.__all__ + jsonstream.__all__
@@ -104,6 +104,8 @@ cdef extern from "../../vendor/http-parser-2.8.1/http_parser.h":
 
     int http_should_keep_alive(const http_parser *parser)
 
+    void http_parser_pause(http_parser *parser, int paused)
+
     void http_parser_settings_init(http_parser_settings *settings)
 
     const char *http_errno_name(http_errno err)
@@ -0,0 +1,21 @@
+#!python
+#cython: language_level=3, boundscheck=False, wraparound=False
+
+
+cdef class JsonStreamParser:
+    cdef:
+        object loads
+        bytearray buffer
+        Py_ssize_t position
+        Py_ssize_t start
+        int mode
+        int depth
+        bint in_string
+        bint escaped
+        bint expecting_item
+
+    cdef bint decode(self, Py_ssize_t end, list items) except -1
+    cdef void scan_array(self, list items) except *
+    cdef void scan_lines(self, list items) except *
+    cpdef list feed(self, data)
+    cpdef list end(self)
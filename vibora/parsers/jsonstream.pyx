@@ -0,0 +1,138 @@
+#!python
+#cython: language_level=3, boundscheck=False, wraparound=False
+
+__all__ = ('JsonStreamParser',)
+
+DEF OPENING = 0
+DEF ARRAY = 1
+DEF LINES = 2
+DEF DONE = 3
+
+
+cdef inline bint is_blank(char c):
+    return c == b' ' or c == b'\n' or c == b'\r' or c == b'\t'
+
+
+cdef class JsonStreamParser:
+    """
+    Splits a JSON body into its top level items while it arrives: the items of a top level array
+    or the lines of a NDJSON body. Only the bytes of the item being received are kept around,
+    decoding each item is up to the given loads function.
+    """
+
+    def __init__(self, loads, bint ndjson=False):
+        """
+
+        :param loads: Function that decodes a single JSON document from bytes.
+        :param ndjson: Whether the body is NDJSON instead of a top level array.
+        """
+        self.loads = loads
+        self.buffer = bytearray()
+        self.position = 0
+        self.start = 0
+        self.mode = LINES if ndjson else OPENING
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.expecting_item = False
+
+    cdef bint decode(self, Py_ssize_t end, list items) except -1:
+        cdef char *data = self.buffer
+        cdef Py_ssize_t start = self.start
+        while start < end and is_blank(data[start]):
+            start += 1
+        while end > start and is_blank(data[end - 1]):
+            end -= 1
+        if start == end:
+            return False
+        items.append(self.loads(data[start:end]))
+        return True
+
+    cdef void scan_array(self, list items) except *:
+        cdef char *data = self.buffer
+        cdef Py_ssize_t total = len(self.buffer)
+        cdef Py_ssize_t index = self.position
+        cdef char c
+        while index < total:
+            c = data[index]
+            if self.mode == DONE:
+                if not is_blank(c):
+                    raise ValueError('Unexpected data after the JSON array.')
+            elif self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif c == b'\\':
+                    self.escaped = True
+                elif c == b'"':
+                    self.in_string = False
+            elif c == b'"':
+                self.in_string = True
+            elif c == b'[' or c == b'{':
+                self.depth += 1
+            elif (c == b']' or c == b'}') and self.depth > 0:
+                self.depth -= 1
+            elif c == b']':
+                if not self.decode(index, items) and self.expecting_item:
+                    raise ValueError('Trailing comma in JSON array.')
+                self.mode = DONE
+            elif c == b',' and self.depth == 0:
+                if not self.decode(index, items):
+                    raise ValueError('Empty item in JSON array.')
+                self.start = index + 1
+                self.expecting_item = True
+            index += 1
+        self.position = index
+
+    cdef void scan_lines(self, list items) except *:
+        cdef Py_ssize_t index = self.buffer.find(b'\n', self.position)
+        while index != -1:
+            self.decode(index, items)
+            self.start = index + 1
+            index = self.buffer.find(b'\n', self.start)
+        self.position = len(self.buffer)
+
+    cpdef list feed(self, data):
+        """
+
+        :param data: Next piece of the body.
+        :return: Items completed by this piece.
+        """
+        cdef list items = []
+        cdef char *buffer
+        self.buffer.extend(data)
+        if self.mode == OPENING:
+            buffer = self.buffer
+            while self.position < len(self.buffer) and is_blank(buffer[self.position]):
+                self.position += 1
+            if self.position == len(self.buffer):
+                return items
+            if buffer[self.position] != b'[':
+                raise ValueError('JSON body is not an array.')
+            self.mode = ARRAY
+            self.position += 1
+            self.start = self.position
+        if self.mode == LINES:
+            self.scan_lines(items)
+        else:
+            self.scan_array(items)
+
+        # Dropping whatever was already decoded so memory is bounded by the biggest item.
+        if self.start > 0:
+            del self.buffer[:self.start]
+            self.position -= self.start
+            self.start = 0
+        return items
+
+    cpdef list end(self):
+        """
+        Must be called once the body is over.
+
+        :return: The last item, in case the body does not end with a new line.
+        """
+        cdef list items = []
+        if self.mode == LINES:
+            self.decode(len(self.buffer), items)
+        elif self.mode == ARRAY or self.mode == OPENING:
+            raise ValueError('Incomplete JSON array.')
+        self.buffer = bytearray()
+        return items
@@ -35,11 +35,16 @@ cdef class HttpParser:
         _proto_on_chunk_complete, _proto_on_message_begin
 
         object _last_error
-        list _headers
+        Headers _headers
         bytes _url
+        bytes _data
 
         Py_buffer py_buf
 
+        # Pipelining
+        bint paused
+        list pending_data
+
         # Security Limits
         int headers_limit
         int body_limit
@@ -54,4 +59,6 @@ cdef class HttpParser:
     cdef _on_headers_complete(self)
     cdef _on_chunk_header(self)
     cdef _on_chunk_complete(self)
-    cdef int feed_data(self, bytes data) except -1
+    cdef int feed_data(self, object data) except -1
+    cdef void pause(self)
+    cdef bytes resume(self)
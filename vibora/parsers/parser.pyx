@@ -7,16 +7,39 @@
 ########################################################################
 ########################################################################
 from cpython.mem cimport PyMem_Malloc, PyMem_Free
-from cpython cimport PyObject_GetBuffer, PyBuffer_Release, PyBUF_SIMPLE, Py_buffer
+from cpython cimport PyObject_GetBuffer, PyBuffer_Release, PyBUF_SIMPLE, Py_buffer, PyBytes_CheckExact, \
+    PyBytes_FromStringAndSize
 from .errors import HttpParserError, HttpParserCallbackError, HttpParserInvalidStatusError, \
     HttpParserInvalidMethodError, HttpParserInvalidURLError, BodyLimitError, HeadersLimitError
 cimport cython
 from . cimport cparser
 from ..protocol.cprotocol cimport Connection
 from ..headers.headers cimport Headers
+from ..headers.headers import COMMON_HEADER_NAMES
+
+cdef extern from "strings.h":
+    int strncasecmp(const char *s1, const char *s2, size_t n)
 
 __all__ = ('parse_url', 'HttpParser', 'HttpResponseParser')
 
+DEF MAX_INTERNED_NAME_SIZE = 32
+
+# Common header names bucketed by size, so matching a name against the table
+# costs a couple of strncasecmp calls on the raw buffer and no allocations.
+cdef list INTERNED_NAMES_BY_SIZE = [[] for _ in range(0, MAX_INTERNED_NAME_SIZE + 1)]
+for name in COMMON_HEADER_NAMES:
+    INTERNED_NAMES_BY_SIZE[len(name)].append(name)
+
+
+cdef inline bytes intern_header_name(const char *at, size_t length):
+    cdef bytes name
+    if length <= MAX_INTERNED_NAME_SIZE:
+        for name in <list> INTERNED_NAMES_BY_SIZE[length]:
+            if strncasecmp(at, <const char*> name, length) == 0:
+                return name
+    return at[:length]
+
+
 cdef class HttpParser:
     def __init__(self, Connection protocol, max_headers_size: int, max_body_size: int):
 
@@ -61,8 +84,13 @@ cdef class HttpParser:
         self._proto_on_url = getattr(protocol, 'on_url', None)
         self._csettings.on_url = cb_on_url
 
-        self._headers = []
+        self._headers = Headers()
         self._last_error = None
+        self._data = None
+
+        # Pipelining
+        self.paused = False
+        self.pending_data = None
 
         # Security Limits
         self.headers_limit = max_headers_size
@@ -79,12 +107,17 @@ cdef class HttpParser:
     cdef _maybe_call_on_header(self):
         if self._current_header_name:
             # Storing current headers
-            self._headers.append((self._current_header_name, self._current_header_value))
+            self._headers.append(self._current_header_name, self._current_header_value)
 
             # Reset State.
             self._current_header_name = self._current_header_value = None
 
     cdef _on_header_field(self, bytes field):
+        if self._current_header_name is not None and self._current_header_value is None:
+            # The name was split between two reads.
+            field = self._current_header_name + field
+            self._current_header_name = intern_header_name(field, len(field))
+            return
         self._maybe_call_on_header()
         self._current_header_name = field
 
@@ -99,8 +132,8 @@ cdef class HttpParser:
         self._maybe_call_on_header()
         cdef cparser.http_parser*parser = self._cparser
         method = cparser.http_method_str(<cparser.http_method> parser.method)
-        self.protocol.on_headers_complete(Headers(self._headers), self._url, method, parser.upgrade)
-        self._headers = []
+        self.protocol.on_headers_complete(self._headers, self._url, method, parser.upgrade)
+        self._headers = Headers()
 
     cdef _on_chunk_header(self):
         if (self._current_header_value is not None or
@@ -119,21 +152,73 @@ cdef class HttpParser:
     def should_keep_alive(self):
         return bool(cparser.http_should_keep_alive(self._cparser))
 
-    cdef int feed_data(self, bytes data) except -1:
-
+    cdef void pause(self):
+        """
+        Stops the parser right after the current message.
+        Everything fed until resume() is called is kept aside so pipelined requests are parsed in order.
+        :return: None
+        """
+        if not self.paused:
+            cparser.http_parser_pause(self._cparser, 1)
+            self.paused = True
+
+    cdef bytes resume(self):
+        """
+        Unpauses the parser.
+        :return: The data received while the parser was paused (or None), it must be fed again by the caller.
+        """
+        cdef list pending = self.pending_data
+        if self.paused:
+            cparser.http_parser_pause(self._cparser, 0)
+            self.paused = False
+        self.pending_data = None
+        if pending:
+            return b''.join(pending)
+
+    cdef int feed_data(self, object data) except -1:
+        """
+        Parses any object supporting the buffer protocol (bytes, bytearray, memoryview...).
+        Mutable buffers may be reused by the caller right after this call so nothing points to them afterwards.
+        :param data:
+        :return:
+        """
         cdef size_t data_length
         cdef size_t consumed_bytes
 
+        # A pipelined request arrived before the response of the previous one was sent.
+        if self.paused:
+            if not PyBytes_CheckExact(data):
+                data = bytes(data)
+            # Chunks are only joined on resume(), appending to bytes would copy everything received so far.
+            if self.pending_data is None:
+                self.pending_data = [data]
+            else:
+                self.pending_data.append(data)
+            return 0
+
         # Getting the buffer size.
         PyObject_GetBuffer(data, &self.py_buf, PyBUF_SIMPLE)
         data_length = <size_t> self.py_buf.len
 
-        # Calling the C http parser.
-        consumed_bytes = cparser.http_parser_execute(self._cparser,
-                                                     self._csettings, <char*> self.py_buf.buf, data_length)
-
-        # Releasing the buffer.
-        PyBuffer_Release(&self.py_buf)
+        # Immutable buffers can be handed over as they are to the body callback.
+        if PyBytes_CheckExact(data):
+            self._data = data
+
+        try:
+            # Calling the C http parser.
+            consumed_bytes = cparser.http_parser_execute(self._cparser,
+                                                         self._csettings, <char*> self.py_buf.buf, data_length)
+
+            # The parser was paused at the end of a message, the remaining bytes belong to the next ones.
+            if self._cparser.http_errno == cparser.HPE_PAUSED:
+                if consumed_bytes < data_length:
+                    self.pending_data = [PyBytes_FromStringAndSize(<char*> self.py_buf.buf + consumed_bytes,
+                                                                   data_length - consumed_bytes)]
+                return 0
+        finally:
+            # Releasing the buffer.
+            self._data = None
+            PyBuffer_Release(&self.py_buf)
 
         if self._cparser.http_errno != cparser.HPE_OK:
             ex = parser_error_from_errno(
@@ -176,7 +261,7 @@ cdef int cb_on_header_field(cparser.http_parser*parser, const char *at, size_t l
         return -1
 
     try:
-        wrapper._on_header_field(at[:length])
+        wrapper._on_header_field(intern_header_name(at, length))
     except BaseException as ex:
         wrapper._last_error = ex
         return -1
@@ -223,7 +308,11 @@ cdef int cb_on_body(cparser.http_parser*parser,
             wrapper._last_error = BodyLimitError()
             return -1
     try:
-        wrapper.protocol.on_body(at[:length])
+        if wrapper._data is not None and <void*> at == wrapper.py_buf.buf and <Py_ssize_t> length == wrapper.py_buf.len:
+            # The whole read is body (common case for big uploads), no need to copy it.
+            wrapper.protocol.on_body(wrapper._data)
+        else:
+            wrapper.protocol.on_body(at[:length])
     except BaseException as ex:
         wrapper._last_error = ex
         return -1
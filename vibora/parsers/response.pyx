@@ -65,7 +65,7 @@ cdef class HttpResponseParser:
     cdef _maybe_call_on_header(self):
         if self.current_header_name is not None:
             # Storing current headers
-            self.headers.raw.append((self.current_header_name, self.current_header_value))
+            self.headers.append(self.current_header_name, self.current_header_value)
 
             # Reset State.
             self.current_header_name = self.current_header_value = None
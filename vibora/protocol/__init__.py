@@ -2,4 +2,6 @@ from .definitions import *
 from . import cprotocol
 
 locals()['Connection'] = cprotocol.Connection
+locals()['BufferedConnection'] = cprotocol.BufferedConnection
+locals()['TimerWheel'] = cprotocol.TimerWheel
 locals()['update_current_time'] = cprotocol.update_current_time
@@ -17,13 +17,18 @@ from ..responses.responses cimport Response, CachedResponse
 from ..components.components cimport ComponentsEngine
 ###############################################
 
+cdef class TimerWheel
+
+
 cdef class Connection:
     cdef:
         public object app
         int status
         bint keep_alive
+        int keep_alive_timeout
         bint closed
         bint _stopped
+        bint _served
         int write_buffer
         object worker
         public object loop
@@ -38,7 +43,10 @@ cdef class Connection:
         Stream stream
         StreamQueue queue
         object current_task
-        object timeout_task
+        TimerWheel timers
+        int deadline
+        int timer_kind
+        object streaming_task
         ComponentsEngine components
         int last_task_time
 
@@ -54,6 +62,7 @@ cdef class Connection:
     # Asyncio Callbacks (Network Flow)
     cpdef void connection_made(self, transport)
     cpdef void data_received(self, bytes data)
+    cdef void parse(self, object data)
     cpdef void connection_lost(self, exc)
     cpdef void pause_writing(self)
     cpdef void resume_writing(self)
@@ -64,12 +73,15 @@ cdef class Connection:
     cpdef void resume_reading(self)
     cpdef void pause_reading(self)
     cpdef void cancel_request(self)
+    cdef void expire(self, int kind)
+    cdef void set_streaming_deadline(self, object task, int timeout)
+    cpdef void resume_pipeline(self)
     cpdef void close(self)
     cpdef void stop(self)
     cpdef bint is_closed(self)
     cpdef str client_ip(self)
 
-    # Reaper related.
+    # Status inspection.
     cpdef int get_status(self)
     cpdef int get_last_task_time(self)
 
@@ -77,3 +89,34 @@ cdef class Connection:
     cdef void on_headers_complete(self, Headers headers, bytes url, bytes method, bint upgrade)
     cdef void on_body(self, bytes body)
     cdef void on_message_complete(self)
+
+
+cdef class TimerWheel:
+    cdef:
+        object loop
+        list slots
+        int size
+        int now
+
+    cdef void schedule(self, Connection connection, int kind, int timeout)
+    cdef void cancel(self, Connection connection)
+    cdef void expire(self, set slot)
+    cpdef void tick(self)
+
+
+cdef class BufferPool:
+    cdef:
+        int buffer_size
+        int max_size
+        list buffers
+
+    cdef object acquire(self)
+    cdef void release(self, object buffer)
+
+
+cdef class BufferedConnectionBase(Connection):
+    cdef object buffer
+
+    cpdef object get_buffer(self, Py_ssize_t size_hint)
+    cpdef void buffer_updated(self, Py_ssize_t size)
+    cpdef void connection_lost(self, exc)
@@ -1,8 +1,14 @@
 #!python
 #cython: language_level=3, boundscheck=False, wraparound=False
 from time import time
-from asyncio import Transport, Event, sleep, Task, CancelledError
+from asyncio import Transport, Event, Task, CancelledError, wait_for, TimeoutError as AsyncTimeoutError
+try:
+    from asyncio import BufferedProtocol
+except ImportError:
+    # Python 3.6, transports will simply call data_received().
+    BufferedProtocol = object
 from ..parsers.errors import HttpParserError
+from ..serializers import create_scoped_task
 
 ############################################
 # C IMPORTS
@@ -30,6 +36,14 @@ DEF PROCESSING_STATUS = 3
 DEF EVENTS_BEFORE_ENDPOINT = 3
 DEF EVENTS_AFTER_ENDPOINT  = 4
 DEF EVENTS_AFTER_RESPONSE_SENT  = 5
+DEF RECEIVE_BUFFER_SIZE = 256 * 1024
+DEF MAX_POOLED_BUFFERS = 256
+DEF TIMER_WHEEL_SLOTS = 64
+DEF NO_TIMER = 0
+DEF KEEP_ALIVE_TIMER = 1
+DEF REQUEST_TIMER = 2
+DEF STREAMING_TIMER = 3
+DEF FRESH_CONNECTION_GRACE = 1
 
 
 cdef class Connection:
@@ -44,7 +58,7 @@ cdef class Connection:
         self.components = app.components.clone()
         self.components.index[Connection] = self
         self.parser = HttpParser(self, app.server_limits.max_headers_size, app.limits.max_body_size)
-        self.stream = Stream(self)
+        self.stream = Stream(self, app.server_limits.stream_high_watermark, app.server_limits.stream_low_watermark)
 
         ###########################
         ## State Machine
@@ -54,14 +68,19 @@ cdef class Connection:
         self.readable = True
         self.write_permission = Event()
         self.current_task = None
-        self.timeout_task = None
+        self.timers = app.timers
+        self.deadline = 0
+        self.timer_kind = NO_TIMER
+        self.streaming_task = None
         self.closed = False
         self.last_task_time = time()
         self._stopped = False
+        self._served = False
 
         ##################################
         ## Early bindings for performance.
-        self.keep_alive = app.server_limits.keep_alive_timeout > 0
+        self.keep_alive_timeout = app.server_limits.keep_alive_timeout
+        self.keep_alive = self.keep_alive_timeout > 0
         self.request_class = self.app.request_class
         self.router = self.app.router
         self.log = self.app.log_handler
@@ -97,25 +116,31 @@ cdef class Connection:
         :return: None.
         """
         self.status = PENDING_STATUS
+        self._served = True
         if not self.keep_alive:
             self.close()
         elif self._stopped:
+            self.timers.cancel(self)
             self.loop.create_task(self.scheduled_close(timeout=30))
         else:
+            # The request deadline is replaced by the keep-alive one.
+            self.timers.schedule(self, KEEP_ALIVE_TIMER, self.keep_alive_timeout)
             self.resume_reading()
 
         # Resetting the stream status.
         self.stream.clear()
-
-        # Handling timeouts.
-        if self.timeout_task:
-            self.timeout_task.cancel()
-            self.timeout_task = None
+        self.streaming_task = None
 
         # Components like request and route objects are tied to the request flow so
         # after the response they are removed from this component engine.
         self.components.reset()
 
+        # Pipelined requests were held by the parser until this response was sent,
+        # they are handled in order once the current call stack is done with this one.
+        # A stopping connection does not take new requests, the held ones are dropped with it.
+        if self.parser.paused and not self.closed and not self._stopped:
+            self.loop.call_soon(self.resume_pipeline)
+
     async def write(self, bytes data):
         """
 
@@ -131,6 +156,16 @@ cdef class Connection:
         if not self.writable:
             await self.write_permission.wait()
 
+    async def writelines(self, data):
+        """
+        Same as write() but for a sequence of buffers, they are not joined so big chunks are not copied.
+        :param data:
+        :return:
+        """
+        self.transport.writelines(data)
+        if not self.writable:
+            await self.write_permission.wait()
+
     async def handle_request(self, Request request, Route route):
         """
 
@@ -239,12 +274,17 @@ cdef class Connection:
                     response.send(self)
                     return
 
-            self.current_task = Task(self.handle_request(request, route), loop=self.loop)
+            if route.json_backend is None:
+                self.current_task = Task(self.handle_request(request, route), loop=self.loop)
+            else:
+                self.current_task = create_scoped_task(self.handle_request(request, route), self.loop,
+                                                       route.json_backend)
             self.current_task.components = self.components
 
-            # Creating the timeout watcher.
-            self.timeout_task = self.loop.call_later(route.limits.timeout, self.cancel_request)
+            # Request deadline, the timer wheel cancels the task once it's over.
+            self.timers.schedule(self, REQUEST_TIMER, route.limits.timeout)
         else:
+            self.timers.cancel(self)
             self.handle_upgrade()
 
     cdef void on_body(self, bytes body):
@@ -255,11 +295,12 @@ cdef class Connection:
         """
         self.queue.put(body)
 
-        # Stop reading from the socket while processing the response.
-        # We only start reading again if the user explicitly tries to consume the stream.
+        # Stop reading from the socket once enough of the body is buffered.
+        # We only start reading again when the user consumes the stream below the low watermark.
         # This helps to prevent DoS and give the user a chance to choose what's
         # best for him in this situation.
-        self.pause_reading()
+        if self.queue.size > self.queue.high_watermark:
+            self.pause_reading()
 
     cdef void on_message_complete(self):
         """
@@ -269,10 +310,17 @@ cdef class Connection:
         # This is a signal to show the Stream consumer that the stream ended.
         self.queue.end()
 
-        # Updating the status so the watcher thread can monitor this process and
-        # kill the process itself if it gets stuck.
+        # Responses already sent (cached responses) are done at this point.
+        if self.status == PENDING_STATUS:
+            return
+
+        # The request is fully received, keep-alive deadlines ignore the connection until it's answered.
         self.status = PROCESSING_STATUS
 
+        # HTTP/1.1 pipelining: clients may send the next requests before this response is out,
+        # the parser holds them until after_response() so responses are written in the same order.
+        self.parser.pause()
+
     #######################################################################
     # Network Flow Callbacks
     # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -286,6 +334,8 @@ cdef class Connection:
         transport.set_write_buffer_limits(self.write_buffer)
         self.transport = transport # type: Transport
         self.app.connections.add(self)
+        if self.keep_alive:
+            self.timers.schedule(self, KEEP_ALIVE_TIMER, self.keep_alive_timeout)
 
     cpdef void data_received(self, bytes data):
         """
@@ -293,9 +343,23 @@ cdef class Connection:
         :param data: 
         :return: 
         """
-        self.status = RECEIVING_STATUS
+        self.parse(data)
+
+    cdef void parse(self, object data):
+        """
+
+        :param data: Any object supporting the buffer protocol.
+        :return: None
+        """
+        # Pipelined requests received while one is being handled are only stored by the paused parser.
+        if not self.parser.paused:
+            self.status = RECEIVING_STATUS
         try:
             self.parser.feed_data(data)
+
+            # There is no reason to keep reading while pipelined requests are waiting their turn.
+            if self.parser.paused:
+                self.pause_reading()
         except HttpParserError as error:
             self.pause_reading()
             self.components.ephemeral_index[type(error)] = error
@@ -303,6 +367,17 @@ cdef class Connection:
             self.loop.create_task(task)
             # self.close()
 
+    cpdef void resume_pipeline(self):
+        """
+        Feeds the parser with the pipelined requests received while the previous one was being handled.
+        :return: None
+        """
+        cdef bytes pending
+        if self.parser.paused and not self.closed and not self._stopped:
+            pending = self.parser.resume()
+            if pending:
+                self.parse(pending)
+
     cpdef void connection_lost(self, exc):
         """
         
@@ -335,6 +410,7 @@ cdef class Connection:
         :return: 
         """
         self.writable = False
+        self.write_permission.clear()
 
     cpdef void resume_writing(self):
         """
@@ -353,8 +429,13 @@ cdef class Connection:
         if not self.closed:
             self.transport.close()
             self.app.connections.discard(self)
+            self.timers.cancel(self)
             self.closed = True
 
+            # A draining worker (stop_server) is waiting for the last connection to go away.
+            if not self.app.connections and self.app.connections_drained is not None:
+                self.app.connections_drained.set()
+
     cpdef void cancel_request(self):
         """
 
@@ -366,6 +447,37 @@ cdef class Connection:
         task = self.handle_exception(error, self.components)
         self.loop.create_task(task)
 
+    cdef void expire(self, int kind):
+        """
+        Called by the timer wheel once the deadline of this connection is over.
+        :param kind: Which deadline expired.
+        :return:
+        """
+        if kind == KEEP_ALIVE_TIMER:
+            # Only idle connections are closed, a request may be arriving right now.
+            if self.status == PENDING_STATUS:
+                self.close()
+        elif kind == REQUEST_TIMER:
+            self.cancel_request()
+        elif kind == STREAMING_TIMER:
+            # Half a response was already sent, there is no way to tell the client about it.
+            self.streaming_task.cancel()
+            self.close()
+
+    cdef void set_streaming_deadline(self, object task, int timeout):
+        """
+        Streaming responses replace the request deadline by their own because a timeout
+        response can't be sent in the middle of the stream.
+        :param task: Task sending the response.
+        :param timeout: Seconds, zero disables the deadline.
+        :return:
+        """
+        self.streaming_task = task
+        if timeout > 0:
+            self.timers.schedule(self, STREAMING_TIMER, timeout)
+        else:
+            self.timers.cancel(self)
+
     cpdef void stop(self):
         """
         
@@ -373,7 +485,12 @@ cdef class Connection:
         """
         self._stopped = True
         if self.status == PENDING_STATUS:
-            self.close()
+            if self._served:
+                self.close()
+            else:
+                # Fresh connections may have their first request still in flight (I.e: accepted right
+                # before a rolling reload), they get a short grace period instead of the whole drain timeout.
+                self.timers.schedule(self, KEEP_ALIVE_TIMER, FRESH_CONNECTION_GRACE)
 
     cpdef bint is_closed(self):
         """
@@ -411,15 +528,37 @@ cdef class Connection:
         """
         return self.transport.get_extra_info('peername')[0]
 
+    async def flush(self):
+        """
+        Waits until the transport buffer is empty, everything written so far reached the socket.
+        Needed before writing to the socket behind the transport back (I.e: os.sendfile).
+        :return:
+        """
+        if self.transport.get_write_buffer_size() > 0:
+            # Same trick as scheduled_close(), we are only resumed once the buffer is empty.
+            self.transport.set_write_buffer_limits(high=0)
+            try:
+                if not self.writable:
+                    await self.write_permission.wait()
+            finally:
+                self.transport.set_write_buffer_limits(self.write_buffer)
+
     async def scheduled_close(self, int timeout=30):
         """
+        Closes the connection once the client consumed everything that was written.
 
-        :param timeout:
+        :param timeout: Seconds to wait for the write buffer to be flushed.
         :return:
         """
-        buffer_size = self.transport.get_write_buffer_size
-        while buffer_size() > 0:
-            await sleep(0.5)
+        if self.transport.get_write_buffer_size() > 0:
+            # Dropping the high water mark to zero means the transport pauses us right away
+            # and only resumes us (resume_writing) once the buffer is completely empty.
+            self.transport.set_write_buffer_limits(high=0)
+            if not self.writable:
+                try:
+                    await wait_for(self.write_permission.wait(), timeout)
+                except AsyncTimeoutError:
+                    pass
         self.close()
 
     async def handle_exception(self, object exception, object components, Route route = None):
@@ -438,6 +577,150 @@ cdef class Connection:
         response.send(self)
 
 
+cdef class TimerWheel:
+    """
+    Hashed timing wheel with one second slots, it expires idle connections and slow requests of a worker.
+    A connection has a single deadline at a time and changing it only moves the connection between two slots,
+    so requests do not allocate timer handles. The worker housekeeper ticks it once a second no matter
+    how many connections are open, deadlines never expire early and at most one second late.
+    """
+
+    def __init__(self, loop, int slots=TIMER_WHEEL_SLOTS):
+        self.loop = loop
+        self.size = slots
+        self.slots = [set() for _ in range(0, slots)]
+        self.now = int(loop.time())
+
+    cdef void schedule(self, Connection connection, int kind, int timeout):
+        """
+
+        :param connection:
+        :param kind: KEEP_ALIVE_TIMER or REQUEST_TIMER.
+        :param timeout: Seconds.
+        :return:
+        """
+        if connection.timer_kind != NO_TIMER:
+            self.slots[connection.deadline % self.size].discard(connection)
+        # The current second may be almost over, the extra one keeps the deadline from expiring early.
+        connection.deadline = self.now + timeout + 1
+        connection.timer_kind = kind
+        self.slots[connection.deadline % self.size].add(connection)
+
+    cdef void cancel(self, Connection connection):
+        """
+
+        :param connection:
+        :return:
+        """
+        if connection.timer_kind != NO_TIMER:
+            self.slots[connection.deadline % self.size].discard(connection)
+            connection.timer_kind = NO_TIMER
+
+    cdef void expire(self, set slot):
+        """
+
+        :param slot:
+        :return:
+        """
+        cdef Connection connection
+        cdef int kind
+        cdef list expired = None
+        # Deadlines further than the wheel size share the slot and wait for their round.
+        for connection in slot:
+            if connection.deadline <= self.now:
+                if expired is None:
+                    expired = []
+                expired.append(connection)
+        if expired is not None:
+            for connection in expired:
+                kind = connection.timer_kind
+                self.cancel(connection)
+                connection.expire(kind)
+
+    cpdef void tick(self):
+        """
+
+        :return:
+        """
+        cdef int now = int(self.loop.time())
+        # A blocked loop has to catch up, but there is no reason to walk the wheel more than once.
+        if now - self.now > self.size:
+            self.now = now - self.size
+        while self.now < now:
+            self.now += 1
+            self.expire(self.slots[self.now % self.size])
+
+
+cdef class BufferPool:
+    """
+    Receive buffers shared by all the connections of a worker.
+    Transports fill a buffer and hand it back within the same callback, so a handful of
+    buffers are enough no matter how many connections are open.
+    """
+
+    def __init__(self, int buffer_size=RECEIVE_BUFFER_SIZE, int max_size=MAX_POOLED_BUFFERS):
+        self.buffer_size = buffer_size
+        self.max_size = max_size
+        self.buffers = []
+
+    cdef object acquire(self):
+        if self.buffers:
+            return self.buffers.pop()
+        return memoryview(bytearray(self.buffer_size))
+
+    cdef void release(self, object buffer):
+        if len(self.buffers) < self.max_size:
+            self.buffers.append(buffer)
+
+
+cdef BufferPool buffer_pool = BufferPool()
+
+
+cdef class BufferedConnectionBase(Connection):
+    """
+    Connection fed through the BufferedProtocol interface: transports receive straight into
+    pooled buffers and the parser reads them in place instead of getting a new bytes object per read.
+    """
+
+    cpdef object get_buffer(self, Py_ssize_t size_hint):
+        """
+
+        :param size_hint:
+        :return:
+        """
+        if self.buffer is None:
+            self.buffer = buffer_pool.acquire()
+        return self.buffer
+
+    cpdef void buffer_updated(self, Py_ssize_t size):
+        """
+
+        :param size: How many bytes were written to the buffer.
+        :return:
+        """
+        buffer = self.buffer
+        self.buffer = None
+        # The parser copies anything it keeps, so the buffer is free to be reused right after.
+        self.parse(buffer[:size])
+        buffer_pool.release(buffer)
+
+    cpdef void connection_lost(self, exc):
+        """
+
+        :param exc:
+        :return:
+        """
+        if self.buffer is not None:
+            buffer_pool.release(self.buffer)
+            self.buffer = None
+        Connection.connection_lost(self, exc)
+
+
+class BufferedConnection(BufferedConnectionBase, BufferedProtocol):
+    # Asyncio/uvloop only use get_buffer() when the protocol is an instance of BufferedProtocol.
+    __slots__ = ()
+
+
 def update_current_time() -> None:
     """
     current_time cannot be access from outside this module so we call this function periodically to update this.
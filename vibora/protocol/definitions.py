@@ -35,5 +35,19 @@ class Connection:
     def on_message_complete(self): pass
 
 
+class TimerWheel:
+
+    def __init__(self, loop, slots: int = 64): pass
+
+    def tick(self): pass
+
+
 def update_current_time() -> None:
     pass
+
+
+class BufferedConnection(Connection):
+
+    def get_buffer(self, size_hint: int) -> memoryview: pass
+
+    def buffer_updated(self, size: int): pass
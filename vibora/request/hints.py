@@ -6,7 +6,7 @@
 from ..headers import Headers
 from ..multipart import UploadedFile
 from ..sessions import Session
-from typing import List, Callable
+from typing import List, Callable, AsyncIterator
 
 
 class Request:
@@ -65,6 +65,17 @@ class Request:
         """
         pass
 
+    async def json_stream(self, loads: Callable=None, ndjson: bool=None) -> AsyncIterator:
+        """
+        Decodes the body while it arrives, yielding each item of a top level JSON array
+        or each line of a NDJSON body.
+
+        :param loads:
+        :param ndjson: Whether the body is NDJSON, by default only when the Content-Type says so.
+        :return:
+        """
+        pass
+
     async def session(self) -> Session:
         """
 
@@ -14,6 +14,9 @@ cdef class StreamQueue:
         bint waiting
         bint dirty
         bint finished
+        readonly Py_ssize_t size
+        readonly int high_watermark
+        readonly int low_watermark
 
     cdef void put(self, bytes item)
     cdef void clear(self)
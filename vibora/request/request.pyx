@@ -6,7 +6,7 @@ from ..multipart import DiskFile, MemoryFile, UploadedFile
 from ..exceptions import InvalidJSON, StreamAlreadyConsumed
 from ..sessions import Session
 from ..utils import RequestParams
-from ..utils import json
+from ..serializers import current_json_backend
 
 # noinspection PyUnresolvedReferences
 from ..headers.headers cimport Headers
@@ -14,20 +14,34 @@ from ..headers.headers cimport Headers
 from ..protocol.cprotocol cimport Connection
 # noinspection PyUnresolvedReferences
 from ..multipart.parser cimport MultipartParser
+# noinspection PyUnresolvedReferences
+from ..parsers.jsonstream cimport JsonStreamParser
+
+
+DEF HIGH_WATERMARK = 512 * 1024
+DEF LOW_WATERMARK = 128 * 1024
 
 
 cdef class StreamQueue:
 
-    def __init__(self):
+    def __init__(self, int high_watermark=HIGH_WATERMARK, int low_watermark=LOW_WATERMARK):
+        """
+
+        :param high_watermark: Buffered bytes above which the connection stops reading from the socket.
+        :param low_watermark: Buffered bytes below which a consumer resumes reading from the socket.
+        """
         self.items = deque()
         self.event = Event()
         self.waiting = False
         self.dirty = False
         self.finished = False
+        self.size = 0
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
 
     async def get(self) -> bytes:
         try:
-            return self.items.popleft()
+            item = self.items.popleft()
         except IndexError:
             if self.finished is True:
                 return b''
@@ -37,11 +51,16 @@ cdef class StreamQueue:
                 await self.event.wait()
                 self.event.clear()
                 self.waiting = False
-                return self.items.popleft()
+                item = self.items.popleft()
+        if item:
+            self.size -= len(item)
+        return item
 
     cdef void put(self, bytes item):
         self.dirty = True
         self.items.append(item)
+        if item:
+            self.size += len(item)
         if self.waiting is True:
             self.event.set()
 
@@ -50,6 +69,7 @@ cdef class StreamQueue:
             self.items.clear()
             self.event.clear()
             self.dirty = False
+            self.size = 0
         self.finished = False
 
     cdef void end(self):
@@ -60,9 +80,9 @@ cdef class StreamQueue:
 
 cdef class Stream:
 
-    def __init__(self, connection):
+    def __init__(self, connection, int high_watermark=HIGH_WATERMARK, int low_watermark=LOW_WATERMARK):
         self.consumed = False
-        self.queue = StreamQueue()
+        self.queue = StreamQueue(high_watermark, low_watermark)
         self.connection = connection
 
     async def read(self) -> bytearray:
@@ -77,12 +97,14 @@ cdef class Stream:
         if self.consumed:
             raise StreamAlreadyConsumed()
         while True:
-            self.connection.resume_reading()
+            # The connection stops reading once too much is buffered (see Connection.on_body),
+            # it's only resumed when the consumer drains the queue enough.
+            if self.queue.size <= self.queue.low_watermark:
+                self.connection.resume_reading()
             data = await self.queue.get()
             if not data:
                 self.consumed = True
                 break
-            self.connection.pause_reading()
             yield data
 
     cdef void clear(self):
@@ -179,12 +201,52 @@ cdef class Request:
             if not any(conditions):
                 raise InvalidJSON('JSON strict mode is enabled '
                                   'and HTTP header does not match the required format.')
-        loads = loads or json.loads
+        loads = loads or current_json_backend().loads
         try:
-            return loads((await self.stream.read()).decode())
+            # Parsing straight from the received bytes, there is no need to build a str first.
+            return loads(await self._read_body())
         except ValueError:
             raise InvalidJSON('HTTP request body is not a valid JSON.', 400)
 
+    async def json_stream(self, loads=None, ndjson: bool=None):
+        """
+        Decodes the body while it arrives, yielding each item of a top level JSON array
+        or each line of a NDJSON body. Only the item being received is kept in memory.
+
+        :param loads:
+        :param ndjson: Whether the body is NDJSON, by default only when the Content-Type says so.
+        :return:
+        """
+        if ndjson is None:
+            ndjson = (self.headers.get('Content-Type') or '').split(';')[0].strip() == 'application/x-ndjson'
+        cdef JsonStreamParser parser = JsonStreamParser(loads or current_json_backend().loads, ndjson)
+        cdef list items
+        async for chunk in self.stream:
+            try:
+                items = parser.feed(chunk)
+            except ValueError:
+                raise InvalidJSON('HTTP request body is not a valid JSON stream.', 400)
+            for item in items:
+                yield item
+        try:
+            items = parser.end()
+        except ValueError:
+            raise InvalidJSON('HTTP request body is not a valid JSON stream.', 400)
+        for item in items:
+            yield item
+
+    async def _read_body(self) -> bytes:
+        """
+
+        :return: The whole body, without copying it when it came in a single chunk.
+        """
+        cdef list chunks = []
+        async for chunk in self.stream:
+            chunks.append(chunk)
+        if len(chunks) == 1:
+            return chunks[0]
+        return b''.join(chunks)
+
     async def _load_form(self):
         """
 
@@ -3,9 +3,10 @@
 | This is a stub file to provide type hints because this module is fully implemented in Cython |
 |==============================================================================================|
 """
-from typing import Callable
+import os
+from typing import Callable, Union, Iterable, AsyncIterable
 from inspect import isasyncgenfunction
-from ..utils import json
+from ..serializers import JsonBackend, current_json_backend, get_json_backend
 
 
 class Response:
@@ -27,9 +28,18 @@ class CachedResponse(Response):
 
 class JsonResponse(Response):
 
-    def __init__(self, content: object, status_code: int = 200, headers: dict = None, cookies: list = None):
-        super().__init__(content=json.dumps(content).encode(), status_code=status_code,
-                         headers=headers, cookies=cookies)
+    def __init__(self, content: object, status_code: int = 200, headers: dict = None, cookies: list = None,
+                 backend: Union[str, JsonBackend] = None):
+        """
+
+        :param content:
+        :param status_code:
+        :param headers:
+        :param cookies:
+        :param backend: JSON backend (name or instance), defaults to the one chosen by the route/app.
+        """
+        backend = get_json_backend(backend) if backend else current_json_backend()
+        super().__init__(content=backend.dumps(content), status_code=status_code, headers=headers, cookies=cookies)
 
 
 class RedirectResponse(Response):
@@ -55,3 +65,52 @@ class StreamingResponse(Response):
             self.headers['Transfer-Encoding'] = 'chunked'
         self.complete_timeout = complete_timeout
         self.chunk_timeout = chunk_timeout
+
+
+class JsonStreamResponse(StreamingResponse):
+
+    def __init__(self, items: Union[Iterable, AsyncIterable], status_code: int = 200, headers: dict = None,
+                 cookies: list = None, complete_timeout: int = 30, chunk_timeout: int = 10, ndjson: bool = False,
+                 batch_size: int = 64 * 1024, backend: Union[str, JsonBackend] = None):
+        """
+        Serializes the items as they are consumed, sending them in chunks of about batch_size bytes.
+
+        :param items: Iterable or async iterable of JSON serializable objects.
+        :param status_code:
+        :param headers:
+        :param cookies:
+        :param complete_timeout:
+        :param chunk_timeout:
+        :param ndjson: Sends one item per line (application/x-ndjson) instead of a JSON array.
+        :param batch_size:
+        :param backend: JSON backend (name or instance), defaults to the one chosen by the route/app.
+        """
+        Response.__init__(self, b'', status_code=status_code, headers=headers, cookies=cookies)
+        self.is_async: bool = hasattr(items, '__aiter__')
+        if not self.is_async and not hasattr(items, '__iter__'):
+            raise ValueError('JsonStreamResponse "items" must be an iterable or an async iterable.')
+        self.headers['Content-Type'] = 'application/x-ndjson' if ndjson else 'application/json'
+        self.headers['Transfer-Encoding'] = 'chunked'
+        self.chunked: bool = True
+        self.complete_timeout: int = complete_timeout
+        self.chunk_timeout: int = chunk_timeout
+
+
+class FileResponse(Response):
+
+    def __init__(self, path: str, status_code: int = 200, headers: dict = None, cookies: list = None,
+                 offset: int = 0, length: int = None, complete_timeout: int = 30, chunk_size: int = 1 * 1024 * 1024,
+                 parts: list = None, headers_only: bool = False):
+        super().__init__(b'', status_code=status_code, headers=headers, cookies=cookies)
+        self.path = path
+        self.offset = offset
+        self.parts = parts
+        if parts is not None:
+            self.length = sum(len(part) if isinstance(part, bytes) else part[1] for part in parts)
+        elif length is not None:
+            self.length = length
+        else:
+            self.length = os.path.getsize(path) - offset
+        self.complete_timeout = complete_timeout
+        self.chunk_size = chunk_size
+        self.headers_only = headers_only
@@ -6,7 +6,7 @@ import cython
 from ..protocol.cprotocol cimport Connection
 ###############################################
 
-cdef str current_time
+cdef bytes date_header
 
 
 @cython.freelist(409600)
@@ -41,6 +41,21 @@ cdef class RedirectResponse(Response):
     pass
 
 
+cdef class FileResponse(Response):
+    cdef:
+        public str path
+        public long long offset
+        public long long length
+        public int complete_timeout
+        public int chunk_size
+        public list parts
+        public bint headers_only
+
+    cdef bytes encode(self)
+
+    cdef void send(self, Connection protocol)
+
+
 cdef class StreamingResponse(Response):
     cdef:
         public bytes content_type
@@ -53,3 +68,7 @@ cdef class StreamingResponse(Response):
     cdef bytes encode(self)
 
     cdef void send(self, Connection protocol)
+
+
+cdef class JsonStreamResponse(StreamingResponse):
+    pass
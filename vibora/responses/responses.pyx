@@ -6,21 +6,95 @@
 # Raw ** performance ** is our ** main goal ** here.
 #######################################################
 import asyncio
+import os
+from collections import OrderedDict
 from typing import Callable
 from inspect import isasyncgenfunction
 from email.utils import formatdate
 from functools import partial
 from concurrent.futures import TimeoutError
 from .. import constants
-from ..utils import json
+from ..serializers import current_json_backend, get_json_backend
 
 # C IMPORTS
 # noinspection PyUnresolvedReferences
 from ..protocol.cprotocol cimport Connection
 ###############################################
 
-cdef str current_time = formatdate(timeval=None, localtime=False, usegmt=True)
+# The whole Date header line, ready to be spliced into any response.
+# It's refreshed once a second by the worker (update_current_time) so responses never format or encode it.
+cdef bytes date_header = b'Date: ' + formatdate(timeval=None, localtime=False, usegmt=True).encode() + b'\r\n'
 cdef dict ALL_STATUS_CODES = constants.ALL_STATUS_CODES
+cdef dict STATUS_LINES = {
+    code: f'HTTP/1.1 {code} {phrase}\r\n'.encode() for code, phrase in ALL_STATUS_CODES.items()
+}
+
+# Bodies bigger than this are not copied to be glued to the headers,
+# they are handed to the transport as a separate buffer (vectored write) instead.
+DEF SCATTER_WRITE_THRESHOLD = 16 * 1024
+
+# Cleared once the event loop tells us it can't sendfile(), every worker runs a single kind of loop.
+cdef bint loop_sendfile = True
+# Otherwise files are sent straight to the socket by os.sendfile() (not available in every platform).
+cdef bint os_sendfile = hasattr(os, 'sendfile')
+
+# Serialized items are grouped until a batch reaches this size, each batch becomes a single chunk.
+DEF JSON_STREAM_BATCH_SIZE = 64 * 1024
+
+
+# Encoded status line + headers, so handlers returning the same headers over and over
+# don't pay for the formatting/encoding every time. Blocks are keyed by value: (status code, header items),
+# so dicts created on each request (JsonResponse, RedirectResponse...) hit the cache and dicts changed
+# in place (i.e. by hooks) miss it. Only str names and values are cached, other types may compare equal
+# and still render differently (1, 1.0 and True). Least recently used blocks are evicted first
+# so stable headers survive the per-request ones (request ids, ETags).
+cdef object HEADERS_CACHE = OrderedDict()
+DEF HEADERS_CACHE_SIZE = 1024
+
+
+cdef bytes encode_headers(int status_code, dict headers):
+    """
+    Status line and headers (except Content-Length and Date, which are spliced by each response) as bytes.
+    """
+    cdef bytes block
+    cdef str content
+    cdef bint cacheable = True
+    cdef tuple key = (status_code, tuple(headers.items()))
+
+    try:
+        block = HEADERS_CACHE.get(key)
+    except TypeError:
+        # Unhashable header values (lists, dicts...).
+        block = None
+        cacheable = False
+    if block is not None:
+        HEADERS_CACHE.move_to_end(key)
+        return block
+
+    content = ''
+    for header, value in headers.items():
+        if type(header) is not str or type(value) is not str:
+            cacheable = False
+        if header != 'Content-Length' and header != 'Date':
+            content += f'{header}: {value}\r\n'
+    block = STATUS_LINES[status_code] + content.encode()
+
+    if cacheable:
+        HEADERS_CACHE[key] = block
+        if len(HEADERS_CACHE) > HEADERS_CACHE_SIZE:
+            HEADERS_CACHE.popitem(last=False)
+    return block
+
+
+cdef inline bytes encode_cookies(list cookies):
+    return b''.join([cookie.header + b'\r\n' for cookie in cookies])
+
+
+cdef inline void write_response(object transport, bytes headers, bytes content):
+    if len(content) > SCATTER_WRITE_THRESHOLD:
+        transport.writelines((headers, content))
+    else:
+        transport.write(headers + content)
 
 
 async def stream_response(response: 'StreamingResponse', protocol, chunk_timeout):
@@ -55,22 +129,136 @@ async def stream_chunked_response(response: 'StreamingResponse', protocol, chunk
     """
     try:
         write = protocol.write
+        writelines = protocol.writelines
         await write(response.encode())
         if not response.is_async:
             for chunk in response.stream():
-                content = b''.join([('%X\r\n' % len(chunk)).encode(), chunk, b'\r\n'])
-                await asyncio.wait_for(write(content), chunk_timeout)
+                if len(chunk) > SCATTER_WRITE_THRESHOLD:
+                    await asyncio.wait_for(writelines((b'%X\r\n' % len(chunk), chunk, b'\r\n')), chunk_timeout)
+                else:
+                    await asyncio.wait_for(write(b'%X\r\n%b\r\n' % (len(chunk), chunk)), chunk_timeout)
         else:
             async for chunk in response.stream():
-                await asyncio.wait_for(write(b''.join([('%X\r\n' % len(chunk)).encode(), chunk, b'\r\n'])),
-                                       chunk_timeout)
+                if len(chunk) > SCATTER_WRITE_THRESHOLD:
+                    await asyncio.wait_for(writelines((b'%X\r\n' % len(chunk), chunk, b'\r\n')), chunk_timeout)
+                else:
+                    await asyncio.wait_for(write(b'%X\r\n%b\r\n' % (len(chunk), chunk)), chunk_timeout)
         await write(b'0\r\n\r\n')
         protocol.after_response(response)
     except TimeoutError:
         protocol.close()
 
 
-async def wait_client_consume(response, protocol):
+def wake_up(waiter):
+    """
+    Writer callback of sendfile_socket(), it may fire again before the waiting task runs.
+    :param waiter:
+    :return:
+    """
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+async def sendfile_socket(f, long long offset, long long length, Connection protocol):
+    """
+    Copies the file straight to the socket with os.sendfile(), for loops without loop.sendfile() (I.e: uvloop).
+
+    :param f: Open file object.
+    :param offset:
+    :param length:
+    :param protocol:
+    :return:
+    """
+    cdef long long sent
+    cdef int fd
+    cdef int file_fd = f.fileno()
+    loop = protocol.loop
+
+    # Whatever the transport still holds (the headers) must reach the socket before the file.
+    await protocol.flush()
+
+    # The loop refuses to watch a descriptor owned by a transport, a duplicate is watched instead.
+    fd = os.dup(protocol.transport.get_extra_info('socket').fileno())
+    try:
+        while length > 0:
+            try:
+                sent = os.sendfile(fd, file_fd, offset, length)
+            except BlockingIOError:
+                # The socket buffer is full, waiting for the client to consume it.
+                waiter = loop.create_future()
+                loop.add_writer(fd, wake_up, waiter)
+                try:
+                    await waiter
+                finally:
+                    loop.remove_writer(fd)
+                continue
+            if sent == 0:
+                raise OSError('File is shorter than the response promised.')
+            offset += sent
+            length -= sent
+    finally:
+        os.close(fd)
+
+
+async def send_file_range(f, long long offset, long long length, int chunk_size, protocol):
+    """
+
+    :param f: Open file object.
+    :param offset:
+    :param length:
+    :param chunk_size:
+    :param protocol:
+    :return:
+    """
+    global loop_sendfile
+    transport = protocol.transport
+    # TLS connections must encrypt the file so they are the only ones reading it in chunks.
+    if transport.get_extra_info('sslcontext') is None:
+        if loop_sendfile:
+            try:
+                await protocol.loop.sendfile(transport, f, offset, length)
+                return
+            except (AttributeError, NotImplementedError):
+                # Loops without sendfile support (I.e: uvloop inherits the abstract one)
+                # raise before anything is sent, so it's safe to do it ourselves.
+                loop_sendfile = False
+        if os_sendfile and transport.get_extra_info('socket') is not None:
+            await sendfile_socket(f, offset, length, protocol)
+            return
+    f.seek(offset)
+    while length > 0:
+        chunk = f.read(min(chunk_size, length))
+        if not chunk:
+            break
+        length -= len(chunk)
+        await protocol.write(chunk)
+
+
+async def send_file(response: 'FileResponse', protocol):
+    """
+
+    :param response:
+    :param protocol:
+    :return:
+    """
+    try:
+        protocol.transport.write(response.encode())
+        with open(response.path, 'rb') as f:
+            if response.parts is None:
+                await send_file_range(f, response.offset, response.length, response.chunk_size, protocol)
+            else:
+                for part in response.parts:
+                    if isinstance(part, bytes):
+                        await protocol.write(part)
+                    else:
+                        await send_file_range(f, part[0], part[1], response.chunk_size, protocol)
+        protocol.after_response(response)
+    except (OSError, RuntimeError):
+        # Headers are already gone so there is no way to tell the client something went wrong.
+        protocol.close()
+
+
+async def wait_client_consume(response, Connection protocol):
     """
 
     :param response:
@@ -78,13 +266,68 @@ async def wait_client_consume(response, protocol):
     :return:
     """
     if not protocol.writable:
-        await protocol.write_premission()
+        await protocol.write_permission.wait()
     protocol.after_response(response)
 
 
-def cancel_streaming_task(task, protocol):
-    task.cancel()
-    protocol.close()
+def encode_json_items(items, dumps, bint ndjson, int batch_size):
+    """
+    Serializes items into JSON array (or NDJSON) fragments of at least batch_size bytes.
+
+    :param items:
+    :param dumps:
+    :param ndjson:
+    :param batch_size:
+    :return:
+    """
+    cdef bytearray batch = bytearray(b'' if ndjson else b'[')
+    cdef bint first = True
+    for item in items:
+        if ndjson:
+            batch += dumps(item)
+            batch += b'\n'
+        else:
+            if not first:
+                batch += b','
+            batch += dumps(item)
+            first = False
+        if len(batch) >= batch_size:
+            yield batch
+            batch = bytearray()
+    if not ndjson:
+        batch += b']'
+    if batch:
+        yield batch
+
+
+async def encode_json_items_async(items, dumps, bint ndjson, int batch_size):
+    """
+    Same as encode_json_items() for async iterables.
+
+    :param items:
+    :param dumps:
+    :param ndjson:
+    :param batch_size:
+    :return:
+    """
+    cdef bytearray batch = bytearray(b'' if ndjson else b'[')
+    cdef bint first = True
+    async for item in items:
+        if ndjson:
+            batch += dumps(item)
+            batch += b'\n'
+        else:
+            if not first:
+                batch += b','
+            batch += dumps(item)
+            first = False
+        if len(batch) >= batch_size:
+            yield batch
+            batch = bytearray()
+    if not ndjson:
+        batch += b']'
+    if batch:
+        yield batch
 
 
 cdef class Response:
@@ -96,17 +339,11 @@ cdef class Response:
         self.cookies = cookies or []
 
     cdef bytes encode(self):
-        headers = self.headers
-        headers['Content-Length'] = len(self.content)
-        headers['Date'] = current_time
-        content = f'HTTP/1.1 {self.status_code} {ALL_STATUS_CODES[self.status_code]}\r\n'
-        for header, value in headers.items():
-            content += f'{header}: {value}\r\n'
+        cdef bytes block = encode_headers(self.status_code, self.headers) + \
+            b'Content-Length: %d\r\n' % len(self.content) + date_header
         if self.cookies:
-            for cookie in self.cookies:
-                content += cookie.header + '\r\n'
-        content += '\r\n'
-        return content.encode()
+            block += encode_cookies(self.cookies)
+        return block + b'\r\n'
 
     def clone(self, **kwargs):
         params = {
@@ -127,11 +364,13 @@ cdef class Response:
         # and add it to the buffers anyway. At this moment, protocol is not reading the socket until the write buffer
         # is consumed by the client.
         if self.headers or self.cookies:
-            protocol.transport.write(self.encode() + self.content)
+            write_response(protocol.transport, self.encode(), self.content)
         else:
-            protocol.transport.write(
-                f'HTTP/1.1 {self.status_code} {ALL_STATUS_CODES[self.status_code]}\r\n'
-                f'Content-Length: {len(self.content)}\r\nDate: {current_time}\r\n\r\n'.encode() + self.content
+            write_response(
+                protocol.transport,
+                STATUS_LINES[self.status_code] + b'Content-Length: %d\r\n' % len(self.content) +
+                date_header + b'\r\n',
+                self.content
             )
         if protocol.writable is False:
             protocol.loop.create_task(wait_client_consume(self, protocol))
@@ -156,24 +395,24 @@ cdef class CachedResponse(Response):
         headers = self.headers
         headers['Content-Length'] = len(self.content)
         headers['Date'] = '$date'
-        content = f'HTTP/1.1 {self.status_code} {ALL_STATUS_CODES[self.status_code]}\r\n'
+        content = ''
         for header, value in headers.items():
             content += f'{header}: {value}\r\n'
+        block = STATUS_LINES[self.status_code] + content.encode()
         if self.cookies:
-            for cookie in self.cookies:
-                content += cookie.header + '\r\n'
-        content += '\r\n'
-        return content.encode()
+            block += encode_cookies(self.cookies)
+        return block + b'\r\n'
 
     cdef void send(self, Connection protocol):
+        cdef bytes headers
+        cdef int position
         if self.cache is None:
+            # Everything but the Date line is encoded once, the current one goes in between.
             headers = self.encode()
-            self.cache = (
-                headers[:headers.find(b'$date')],
-                headers[headers.find(b'$date') + 5:]
-            )
+            position = headers.find(b'Date: $date\r\n')
+            self.cache = (headers[:position], headers[position + 13:])
         cache = self.cache
-        protocol.transport.write(cache[0] + current_time.encode() + cache[1] + self.content)
+        write_response(protocol.transport, cache[0] + date_header + cache[1], self.content)
         if protocol.writable:
             protocol.after_response(self)
         else:
@@ -182,9 +421,14 @@ cdef class CachedResponse(Response):
 
 cdef class JsonResponse(Response):
 
-    def __init__(self, content: object, status_code: int = 200, headers: dict = None, cookies: list = None):
+    def __init__(self, content: object, status_code: int = 200, headers: dict = None, cookies: list = None,
+                 backend=None):
         self.status_code = status_code
-        self.content = json.dumps(content).encode()
+        if backend is None:
+            backend = current_json_backend()
+        else:
+            backend = get_json_backend(backend)
+        self.content = backend.dumps(content)
         self.headers = headers or {}
         self.headers['Content-Type'] = 'application/json'
         self.cookies = cookies or []
@@ -224,33 +468,94 @@ cdef class StreamingResponse(Response):
         self.chunk_timeout = chunk_timeout
 
     cdef bytes encode(self):
-        content = f'HTTP/1.1 {self.status_code} {ALL_STATUS_CODES[self.status_code]}\r\n'
-        for header, value in self.headers.items():
-            content += f'{header}: {value}\r\n'
+        cdef bytes block = encode_headers(self.status_code, self.headers)
+        if not self.chunked:
+            block += f'Content-Length: {self.headers["Content-Length"]}\r\n'.encode()
+        block += date_header
         if self.cookies:
-            for cookie in self.cookies:
-                content += cookie.header + '\r\n'
-        content += '\r\n'
-        return content.encode()
+            block += encode_cookies(self.cookies)
+        return block + b'\r\n'
 
     cdef void send(self, Connection protocol):
-        # Streaming responses make use of a custom timeout function because
-        # we don't to send a response in case a timeout.
-        # The client could handle the timeout response as part of the stream and a luck enough
-        # guy could even match the remaining byte count.
-        protocol.timeout_task.cancel()
-
         # Creating the streaming task.
         f = stream_chunked_response if self.chunked else stream_response
         task = partial(f, response=self, protocol=protocol, chunk_timeout=self.chunk_timeout)
         streaming_task = protocol.loop.create_task(task())
 
-        # Creating the timeout task and setting it in the protocol so after_response()
-        # can correctly cancel it if needed.
-        if self.complete_timeout > 0:
-            protocol.timeout_task = protocol.loop.call_later(
-                self.complete_timeout, partial(cancel_streaming_task, streaming_task, protocol)
-            )
+        # Streaming responses make use of a custom timeout because
+        # we don't to send a response in case a timeout.
+        # The client could handle the timeout response as part of the stream and a luck enough
+        # guy could even match the remaining byte count.
+        protocol.set_streaming_deadline(streaming_task, self.complete_timeout)
+
+
+cdef class JsonStreamResponse(StreamingResponse):
+
+    def __init__(self, items, status_code: int = 200, headers: dict = None, cookies: list = None,
+                 complete_timeout: int = 30, chunk_timeout: int = 10, ndjson: bool = False,
+                 batch_size: int = JSON_STREAM_BATCH_SIZE, backend=None):
+        if backend is None:
+            backend = current_json_backend()
+        else:
+            backend = get_json_backend(backend)
+        self.is_async = hasattr(items, '__aiter__')
+        if not self.is_async and not hasattr(items, '__iter__'):
+            raise ValueError('JsonStreamResponse "items" must be an iterable or an async iterable.')
+        encoder = encode_json_items_async if self.is_async else encode_json_items
+        self.stream = partial(encoder, items, backend.dumps, ndjson, batch_size)
+        self.content = b''
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.headers['Content-Type'] = 'application/x-ndjson' if ndjson else 'application/json'
+        self.headers['Transfer-Encoding'] = 'chunked'
+        self.chunked = True
+        self.cookies = cookies or []
+        self.complete_timeout = complete_timeout
+        self.chunk_timeout = chunk_timeout
+
+
+cdef class FileResponse(Response):
+
+    def __init__(self, path: str, status_code: int = 200, headers: dict = None, cookies: list = None,
+                 offset: int = 0, length: int = None, complete_timeout: int = 30, chunk_size: int = 1 * 1024 * 1024,
+                 parts: list = None, headers_only: bool = False):
+        self.path = path
+        self.content = b''
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.cookies = cookies or []
+        self.offset = offset
+        self.parts = parts
+        if parts is not None:
+            # Bytes are sent as they are and (offset, length) tuples are read from the file.
+            self.length = sum(len(part) if isinstance(part, bytes) else part[1] for part in parts)
+        elif length is not None:
+            self.length = length
+        else:
+            self.length = os.path.getsize(path) - offset
+        self.complete_timeout = complete_timeout
+        self.chunk_size = chunk_size
+        self.headers_only = headers_only
+
+    cdef bytes encode(self):
+        cdef bytes block = encode_headers(self.status_code, self.headers) + \
+            b'Content-Length: %d\r\n' % self.length + date_header
+        if self.cookies:
+            block += encode_cookies(self.cookies)
+        return block + b'\r\n'
+
+    cdef void send(self, Connection protocol):
+        if self.headers_only:
+            # HEAD requests, the client is told the length of a body that is never sent.
+            protocol.transport.write(self.encode())
+            if protocol.writable:
+                protocol.after_response(self)
+            else:
+                protocol.loop.create_task(wait_client_consume(self, protocol))
+            return
+        # Same as streaming responses, a timeout response can't be sent in the middle of the file.
+        sending_task = protocol.loop.create_task(send_file(self, protocol))
+        protocol.set_streaming_deadline(sending_task, self.complete_timeout)
 
 
 cdef class WebsocketHandshakeResponse(Response):
@@ -265,6 +570,11 @@ cdef class WebsocketHandshakeResponse(Response):
         }
 
 
-def update_current_time(value):
-    global current_time
-    current_time = value
+def update_current_time(value: str):
+    """
+    Refreshes the Date header of every response.
+    :param value: HTTP date (I.e: 'Wed, 21 Oct 2015 07:28:00 GMT').
+    :return:
+    """
+    global date_header
+    date_header = b'Date: ' + value.encode() + b'\r\n'
@@ -1 +1,2 @@
 from .router import *
+from .tree import RouteTree
@@ -6,6 +6,12 @@ class PatternParser:
 
     PARAM_REGEX = re.compile(b'<.*?>')
     DYNAMIC_CHARS = bytearray(b'*?.[]()')
+    REGEX_CHARS = bytearray(b'*?.[](){}+|^$\\')
+
+    # Segment types used by the route tree.
+    STATIC_SEGMENT = 1
+    PARAM_SEGMENT = 2
+    REGEX_SEGMENT = 3
 
     CAST = {
         str: lambda x: x.decode('utf-8'),
@@ -48,3 +54,30 @@ class PatternParser:
                     continue
                 return True
         return False
+
+    @classmethod
+    def extract_segments(cls, pattern: bytes) -> list:
+        """
+        Splits a pattern by slashes and classifies each piece.
+        Static pieces are matched by equality, a piece that is a single param matches any non-empty
+        piece (the same as its generated regex) and everything else needs the route regex.
+        :param pattern:
+        :return: A list of (segment type, segment) tuples.
+        """
+        # Alternations can make the pattern match anything, so there is no prefix to rely on.
+        if b'|' in pattern:
+            return [(cls.REGEX_SEGMENT, pattern)]
+        segments = []
+        for segment in pattern.split(b'/'):
+            params = cls.PARAM_REGEX.findall(segment)
+            if segment[:1] in (b'?', b'*', b'+', b'{') and segments:
+                # The quantifier applies to the slash itself so the previous piece is not reliable anymore.
+                segments[-1] = (cls.REGEX_SEGMENT, segments[-1][1])
+                segments.append((cls.REGEX_SEGMENT, segment))
+            elif len(params) == 1 and params[0] == segment:
+                segments.append((cls.PARAM_SEGMENT, segment[1:-1]))
+            elif params or any(char in cls.REGEX_CHARS for char in segment):
+                segments.append((cls.REGEX_SEGMENT, segment))
+            else:
+                segments.append((cls.STATIC_SEGMENT, segment))
+        return segments
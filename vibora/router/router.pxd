@@ -11,17 +11,22 @@ from ..cache.cache cimport CacheEngine
 from ..responses.responses cimport Response, RedirectResponse, WebsocketHandshakeResponse
 # noinspection PyUnresolvedReferences
 from ..components.components cimport ComponentsEngine
+# noinspection PyUnresolvedReferences
+from .tree cimport RouteTree
 ############################################
 
 
 cdef class LRUCache:
     cdef:
-        dict values
-        object queue
-        int max_size
-        int current_size
+        readonly object values
+        readonly int max_size
+        readonly long hits
+        readonly long misses
+        readonly long evictions
 
-    cdef set(self, tuple key, Route route)
+    cpdef get(self, tuple key)
+    cpdef set(self, tuple key, Route route)
+    cpdef clear(self)
 
 
 cdef class Route:
@@ -45,6 +50,7 @@ cdef class Route:
         public bint is_dynamic
         CacheEngine cache
         public object limits
+        public object json_backend
 
     cdef inline object call_handler(self, Request request, ComponentsEngine components)
 
@@ -52,19 +58,22 @@ cdef class Route:
 cdef class Router:
     cdef:
         int strategy
+        readonly int engine
         readonly dict reverse_index
         dict routes
         dict dynamic_routes
+        dict trees
         public dict default_handlers
-        LRUCache cache
+        readonly LRUCache cache
         dict hosts
         bint check_host
 
     cdef bint check_not_allowed_method(self, bytes url, bytes method) except -1
 
+    @cython.locals(url=bytes, index=int)
     cdef Route get_route(self, Request request)
 
-    @cython.locals(key=tuple, route=Route)
+    @cython.locals(key=tuple, route=Route, tree=RouteTree)
     cdef Route _find_route(self, bytes url, bytes method)
 
     @cython.locals(key=tuple, route=Route)
@@ -2,10 +2,11 @@ import base64
 import hashlib
 import re
 import uuid
-from collections import deque
+from collections import OrderedDict
 from typing import get_type_hints
 from inspect import iscoroutinefunction, isbuiltin, signature
 from .parser import PatternParser
+from .tree import RouteTree
 from ..limits import RouteLimits
 from ..utils import clean_route_name, clean_methods
 from ..exceptions import ReverseNotFound, NotFound, MethodNotAllowed, MissingComponent
@@ -20,31 +21,65 @@ class RouterStrategy:
     CLONE = 3
 
 
+class RouterEngine:
+    # Dynamic routes are tried one by one, in the order they were added.
+    LINEAR = 1
+    # Dynamic routes are compiled into a prefix tree of URL segments (same priority order).
+    TREE = 2
+
+
 class LRUCache:
 
-    def __init__(self, max_size: int=256):
-        self.values = {}
-        self.queue = deque()
+    def __init__(self, max_size: int=4096):
+        self.values = OrderedDict()
         self.max_size = max_size
-        self.current_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple):
+        """
+
+        :param key:
+        :return: The cached route or None.
+        """
+        route = self.values.get(key)
+        if route is None:
+            self.misses += 1
+            return None
+        self.values.move_to_end(key)
+        self.hits += 1
+        return route
 
     def set(self, key: tuple, route: 'Route'):
-        if self.current_size > self.max_size:
-            key = self.queue.pop()
-            del self.values[key]
-        self.queue.appendleft(key)
+        """
+        Only successful resolutions should be cached, otherwise anyone could fill the cache with garbage urls.
+        :param key:
+        :param route:
+        :return:
+        """
+        if self.max_size <= 0:
+            return
         self.values[key] = route
-        self.current_size += 1
+        if len(self.values) > self.max_size:
+            self.values.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.values.clear()
+        self.hits = self.misses = self.evictions = 0
 
 
 class Router:
-    def __init__(self, strategy: int):
+    def __init__(self, strategy: int, engine: int = RouterEngine.LINEAR, cache_size: int = 4096):
         self.strategy = strategy
+        self.engine = engine
         self.reverse_index = {}
         self.routes = {}
         self.dynamic_routes = {}
+        self.trees = {}
         self.default_handlers = {}
-        self.cache = LRUCache(max_size=1024 * 1024)
+        self.cache = LRUCache(max_size=cache_size)
         self.hosts = {}
         self.check_host = False
 
@@ -67,6 +102,11 @@ class Router:
         elif route.is_dynamic:
             for method in route.methods:
                 self.dynamic_routes.setdefault(method, []).append(route)
+                if self.engine == RouterEngine.TREE:
+                    tree = self.trees.get(method)
+                    if tree is None:
+                        tree = self.trees[method] = RouteTree()
+                    tree.add(route)
         self.reverse_index[route.name] = route
 
     def add_route(self, route: 'Route', prefixes: dict = None, check_slashes: bool = True):
@@ -131,13 +171,21 @@ class Router:
             if url in self.routes[current_method]:
                 allowed_methods.append(allowed_methods)
 
-        for current_method, routes in self.dynamic_routes.items():
-            # We can skip the actual method because we already checked it before.
-            if current_method == method:
-                continue
-            for route in routes:
-                if route.regex.fullmatch(url):
+        if self.trees:
+            for current_method, tree in self.trees.items():
+                # We can skip the actual method because we already checked it before.
+                if current_method == method:
+                    continue
+                if tree.find(url) is not None:
                     allowed_methods.append(current_method)
+        else:
+            for current_method, routes in self.dynamic_routes.items():
+                # We can skip the actual method because we already checked it before.
+                if current_method == method:
+                    continue
+                for route in routes:
+                    if route.regex.fullmatch(url):
+                        allowed_methods.append(current_method)
 
         if allowed_methods:
             raise MethodNotAllowed(allowed_methods=allowed_methods)
@@ -151,7 +199,7 @@ class Router:
         :return:
         """
         key = (url, method, host)
-        route = self.cache.values.get(key)
+        route = self.cache.get(key)
         if route is not None:
             return route
 
@@ -195,8 +243,8 @@ class Router:
         :return:
         """
         key = (url, method)
-        route = self.cache.values.get(key)
-        if route:
+        route = self.cache.get(key)
+        if route is not None:
             return route
 
         try:
@@ -206,7 +254,14 @@ class Router:
         except KeyError:
             pass
 
-        if method in self.dynamic_routes:
+        if self.trees:
+            tree = self.trees.get(method)
+            if tree is not None:
+                route = tree.find(url)
+                if route is not None:
+                    self.cache.set(key, route)
+                    return route
+        elif method in self.dynamic_routes:
             for route in self.dynamic_routes[method]:
                 if route.regex.fullmatch(url):
                     self.cache.set(key, route)
@@ -217,10 +272,16 @@ class Router:
         raise NotFound()
 
     def get_route(self, request: Request) -> 'Route':
+        url = request.url
+
+        # Routes never match the query string so it is not part of the lookup (nor the cache key).
+        index = url.find(b'?')
+        if index != -1:
+            url = url[:index]
         try:
             if not self.check_host:
-                return self._find_route(request.url, request.method)
-            return self._find_route_by_host(request.url, request.method, request.headers.get('host'))
+                return self._find_route(url, request.method)
+            return self._find_route_by_host(url, request.method, request.headers.get('host'))
         except MethodNotAllowed as error:
             request.context['allowed_methods'] = error.allowed_methods
             return self.default_handlers[405]
@@ -237,7 +298,8 @@ class Route:
 
     def __init__(self, pattern: bytes, handler, methods=None,
                  parent=None, app=None, dynamic=None, name: str = None,
-                 cache: CacheEngine = None, websocket=False, hosts=None, limits: RouteLimits=None):
+                 cache: CacheEngine = None, websocket=False, hosts=None, limits: RouteLimits=None,
+                 json_backend=None):
         self.name = name or str(uuid.uuid4())
         self.handler = handler
         self.app = app
@@ -257,6 +319,7 @@ class Route:
             self.is_dynamic = dynamic
         self.cache = cache
         self.limits = limits
+        self.json_backend = json_backend
 
     def extract_components(self, handler):
         if isbuiltin(handler):
@@ -275,7 +338,9 @@ class Route:
             return self.handler()
         else:
             if self.has_parameters:
-                match = self.regex.match(request.url)
+                url = request.url
+                index = url.find(b'?')
+                match = self.regex.match(url if index == -1 else url[:index])
             function_params = {}
             try:
                 for name, type_ in self.components:
@@ -313,7 +378,8 @@ class Route:
         return Route(pattern=pattern or self.pattern, handler=handler or self.handler,
                      methods=methods or self.methods,
                      parent=self.parent, app=self.app, limits=self.limits, hosts=self.hosts,
-                     dynamic=dynamic or self.is_dynamic, name=name or self.name, cache=self.cache)
+                     dynamic=dynamic or self.is_dynamic, name=name or self.name, cache=self.cache,
+                     json_backend=self.json_backend)
 
 
 class WebsocketRoute(Route):
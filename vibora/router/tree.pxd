@@ -0,0 +1,25 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, annotation_typing=False
+import cython
+
+
+cdef class RouteNode:
+    cdef:
+        dict static
+        RouteNode param
+        object route
+        int route_index
+        list leaves
+        int min_index
+
+
+cdef class RouteTree:
+    cdef:
+        readonly RouteNode root
+        readonly int size
+
+    @cython.locals(node=RouteNode, child=RouteNode, index=int)
+    cpdef add(self, route)
+
+    @cython.locals(node=RouteNode, child=RouteNode, segments=list, stack=list, total=int, depth=int,
+                   index=int, best_index=int)
+    cpdef find(self, bytes url)
@@ -0,0 +1,91 @@
+from .parser import PatternParser
+
+
+class RouteNode:
+
+    def __init__(self):
+        self.static = {}
+        self.param = None
+        self.route = None
+        self.route_index = 0
+        self.leaves = []
+        self.min_index = 2 ** 31 - 1
+
+
+class RouteTree:
+    """
+    Prefix tree of URL segments used to find dynamic routes without trying every regex.
+    Static segments are dict lookups, param segments match any non-empty segment and patterns
+    with regex pieces are stored as leaves (verified by their own regex) at the deepest node possible.
+    When multiple routes match the one registered first wins, same as the linear scan.
+    """
+
+    def __init__(self):
+        self.root = RouteNode()
+        self.size = 0
+
+    def add(self, route):
+        """
+
+        :param route:
+        :return:
+        """
+        index = self.size
+        self.size += 1
+        node = self.root
+        node.min_index = min(node.min_index, index)
+        for segment_type, segment in PatternParser.extract_segments(route.pattern):
+            if segment_type == PatternParser.REGEX_SEGMENT:
+                node.leaves.append((index, route))
+                return
+            elif segment_type == PatternParser.PARAM_SEGMENT:
+                if node.param is None:
+                    node.param = RouteNode()
+                node = node.param
+            else:
+                child = node.static.get(segment)
+                if child is None:
+                    child = node.static[segment] = RouteNode()
+                node = child
+            node.min_index = min(node.min_index, index)
+        if node.route is None:
+            node.route = route
+            node.route_index = index
+
+    def find(self, url: bytes):
+        """
+
+        :param url:
+        :return: The first registered route matching the url or None.
+        """
+        segments = url.split(b'/')
+        total = len(segments)
+        best_route = None
+        best_index = self.size
+        stack = [(self.root, 0)]
+        while stack:
+            node, depth = stack.pop()
+
+            # Nothing in this branch was registered before the route we already have.
+            if node.min_index >= best_index:
+                continue
+
+            for index, route in node.leaves:
+                if index >= best_index:
+                    break
+                if route.regex.fullmatch(url):
+                    best_route, best_index = route, index
+                    break
+
+            if depth == total:
+                if node.route is not None and node.route_index < best_index:
+                    best_route, best_index = node.route, node.route_index
+                continue
+
+            segment = segments[depth]
+            if node.param is not None and segment:
+                stack.append((node.param, depth + 1))
+            child = node.static.get(segment)
+            if child is not None:
+                stack.append((child, depth + 1))
+        return best_route
@@ -0,0 +1,141 @@
+import asyncio
+import json as stdlib_json
+from typing import Callable, Union
+from .utils import json
+
+try:
+    from asyncio import current_task
+except ImportError:
+    current_task = asyncio.Task.current_task
+
+try:
+    from contextvars import ContextVar
+except ImportError:
+    # Python 3.6, the backend is attached to the request task itself.
+    ContextVar = None
+
+
+class JsonBackend:
+    __slots__ = ('name', 'dumps', 'loads')
+
+    def __init__(self, name: str, dumps: Callable, loads: Callable, binary: bool = False):
+        """
+
+        :param name: Name used to select this backend (I.e: Vibora(json_backend='orjson')).
+        :param dumps: Serializer, expected to return a str unless binary is set.
+        :param loads: Deserializer, it must accept bytes.
+        :param binary: The serializer already returns UTF-8 bytes (I.e: orjson),
+        so responses skip the intermediary str and the encoding step.
+        """
+        self.name = name
+        self.loads = loads
+        if binary:
+            self.dumps = dumps
+        else:
+            def encoded_dumps(obj) -> bytes:
+                return dumps(obj).encode()
+            self.dumps = encoded_dumps
+
+    def __repr__(self):
+        return f'<JsonBackend ({self.name})>'
+
+
+BACKENDS = {}
+
+# Backends picked by an app or a route are bound to the request task context, so the tasks it spawns
+# inherit them. As long as nobody chooses a custom backend there is no reason to look them up.
+scoped = False
+task_backend = ContextVar('json_backend', default=None) if ContextVar else None
+
+
+def register_json_backend(backend: JsonBackend):
+    """
+
+    :param backend:
+    :return:
+    """
+    BACKENDS[backend.name] = backend
+
+
+def get_json_backend(backend: Union[str, JsonBackend]) -> JsonBackend:
+    """
+
+    :param backend: Backend name or instance.
+    :return:
+    """
+    if isinstance(backend, JsonBackend):
+        return backend
+    try:
+        return BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f'Unknown JSON backend "{backend}". '
+                         f'Available backends: {", ".join(BACKENDS)}.')
+
+
+def scope_json_backend(backend: Union[str, JsonBackend]) -> JsonBackend:
+    """
+    Resolves a backend that will be selected per request (app or route level).
+
+    :param backend: Backend name or instance.
+    :return:
+    """
+    global scoped
+    backend = get_json_backend(backend)
+    if backend is not DEFAULT_BACKEND:
+        scoped = True
+    return backend
+
+
+def create_scoped_task(coroutine, loop, backend: JsonBackend) -> asyncio.Task:
+    """
+    Creates the task handling a request with the backend chosen by its route.
+
+    :param coroutine:
+    :param loop:
+    :param backend:
+    :return:
+    """
+    if task_backend is None:
+        task = asyncio.Task(coroutine, loop=loop)
+        task.json_backend = backend
+        return task
+    # Tasks copy the current context when they are created.
+    token = task_backend.set(backend)
+    try:
+        return asyncio.Task(coroutine, loop=loop)
+    finally:
+        task_backend.reset(token)
+
+
+def current_json_backend() -> JsonBackend:
+    """
+
+    :return: The backend chosen by the route being handled, the default one otherwise.
+    """
+    if not scoped:
+        return DEFAULT_BACKEND
+    if task_backend is not None:
+        return task_backend.get() or DEFAULT_BACKEND
+    try:
+        task = current_task()
+    except RuntimeError:
+        return DEFAULT_BACKEND
+    return getattr(task, 'json_backend', None) or DEFAULT_BACKEND
+
+
+register_json_backend(JsonBackend('json', stdlib_json.dumps, stdlib_json.loads))
+
+try:
+    import ujson
+    register_json_backend(JsonBackend('ujson', ujson.dumps, ujson.loads))
+except ImportError:
+    pass
+
+try:
+    import orjson
+    register_json_backend(JsonBackend('orjson', orjson.dumps, orjson.loads, binary=True))
+except ImportError:
+    pass
+
+# Same choice as vibora.utils.json: ujson unless disabled by VIBORA_UJSON=0.
+DEFAULT_BACKEND = BACKENDS[json.__name__]
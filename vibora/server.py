@@ -1,14 +1,18 @@
 import logging
+import os
+import signal
 import sys
 import traceback
+import time
 from email.utils import formatdate
 from collections import OrderedDict, deque
 from functools import partial
-from multiprocessing import cpu_count
 from .__version__ import __version__
 from .client import Session
 from .workers.handler import RequestHandler
 from .workers.necromancer import Necromancer
+from .workers.watchdog import Watchdog
+from .workers.sockets import ListenMode, create_listeners, remove_listener, attach_cpu_steering, cpu_steering_map
 from .router import Route
 from .request import Request
 from .responses import Response
@@ -17,7 +21,7 @@ from .templates.loader import TemplateLoader
 from .templates.extensions import ViboraNodes
 from .exceptions import NotFound, MethodNotAllowed, MissingComponent
 from .parsers.errors import BodyLimitError, HeadersLimitError
-from .utils import wait_server_available, get_free_port, cprint, pause, format_access_log
+from .utils import get_free_port, cprint, pause, format_access_log, allowed_cpus, distribute_cpus
 from .hooks import Hook, Events
 from .application import Application
 
@@ -262,37 +266,74 @@ class Vibora(Application):
         self.initialized = True
 
     def run(self, host: str='127.0.0.1', port: int=5000, workers: int=None, debug: bool=True,
-            block: bool=True, necromancer: bool=False, sock=None, startup_message: bool=True):
+            block: bool=True, necromancer: bool=False, sock=None, startup_message: bool=True,
+            workers_per_cpu: int=None, cpu_affinity=None, listen_mode: int=ListenMode.REUSEPORT):
         """
 
         :param startup_message:
         :param host:
         :param port:
-        :param workers:
+        :param workers: Defaults to the number of CPUs this process is allowed to use (plus two),
+        so containers limited to a few CPUs don't spawn a worker for each CPU of the host.
         :param debug:
         :param block:
         :param necromancer:
         :param sock:
+        :param workers_per_cpu: When workers is not given, spawns this many workers for each allowed CPU.
+        :param cpu_affinity: True pins each worker to a single CPU, a list of CPU sets
+        (I.e: vibora.utils.numa_nodes()) spreads the workers among them.
+        :param listen_mode: How connections are spread among workers (ListenMode), ignored when sock is given.
+        ListenMode.REUSEPORT_CPU pins each worker to a CPU unless cpu_affinity says otherwise
+        and spawns a worker per allowed CPU unless told otherwise.
         :return:
         """
         self.debug_mode = debug
 
+        if not workers:
+            cpus = len(allowed_cpus())
+            if workers_per_cpu:
+                workers = cpus * workers_per_cpu
+            elif listen_mode == ListenMode.REUSEPORT_CPU:
+                # Connections received by a CPU are handed to a single worker, extra workers would be idle.
+                workers = cpus
+            else:
+                workers = cpus + 2
+        if listen_mode == ListenMode.REUSEPORT_CPU and cpu_affinity is None:
+            cpu_affinity = True
+        cpu_sets = distribute_cpus(cpu_affinity, workers)
+        if sock:
+            sockets = [sock] * workers
+        else:
+            sockets = create_listeners(listen_mode, host, port, workers, cpu_sets)
+            # Kept in group order, the CPU steering program refers to the sockets by their position.
+            self.listeners.extend(OrderedDict.fromkeys(sockets))
+            self.listen_mode = listen_mode
+
         # Starting workers.
-        spawn_function = partial(RequestHandler, self, host, port, sock)
-        for _ in range(0, (workers or cpu_count() + 2)):
-            worker = spawn_function()
+        spawn_function = partial(RequestHandler, self, host, port)
+        started = []
+        for worker_socket, cpu_set in zip(sockets, cpu_sets):
+            worker = spawn_function(sock=worker_socket, cpus=cpu_set)
             worker.start()
-            self.workers.append(worker)
+            started.append(worker)
+        self.workers.extend(started)
+
+        # Workers with a blocked event loop are killed by the master.
+        # Without a necromancer dead workers are reaped, their sockets must not keep getting connections.
+        self.watchdog = Watchdog(self, timeout=self.server_limits.worker_timeout, reap=not necromancer)
+        self.watchdog.start()
 
         # Watch out for dead workers and bring new ones to life as needed.
         if necromancer:
-            necromancer = Necromancer(self.workers, spawn_function=spawn_function,
+            necromancer = Necromancer(self, spawn_function=spawn_function,
                                       interval=self.server_limits.worker_timeout)
             necromancer.start()
 
-        # Wait the server start accepting new connections.
-        if not sock:
-            wait_server_available(host, port)
+        # Wait the server start accepting new connections. The sockets are already listening
+        # (the master owns them) so connecting to them tells nothing about the workers.
+        for worker in started:
+            if not self._wait_worker(worker, timeout=10):
+                raise TimeoutError('Server is taking too long to get online.')
 
         if startup_message:
             cprint('# Vibora ({color_}' + __version__ + '{end_}) # http://' + str(host) + ':' + str(port),
@@ -300,8 +341,108 @@ class Vibora(Application):
 
         self.running = True
         if block:
+            # SIGHUP asks for a rolling reload of the workers.
+            if hasattr(signal, 'SIGHUP'):
+                signal.signal(signal.SIGHUP, self._request_reload)
             try:
-                pause()
+                while True:
+                    if self.reload_requested:
+                        self.reload_requested = False
+                        self.reload()
+                        continue
+                    pause()
+                    if not self.reload_requested:
+                        break
                 self.running = False
             except KeyboardInterrupt:
                 self.clean_up()
+
+    def _request_reload(self, *_):
+        """
+        Signal handler, the reload itself happens in the main loop of run().
+        :return:
+        """
+        self.reload_requested = True
+
+    def reap_workers(self) -> None:
+        """
+        Forgets dead workers and closes the listening sockets no worker accepts from anymore,
+        the kernel would keep handing them new connections that nobody answers.
+        :return:
+        """
+        with self.workers_lock:
+            self.workers[:] = [worker for worker in self.workers if worker.is_alive()]
+            in_use = {id(worker.socket) for worker in self.workers}
+            abandoned = [sock for sock in self.listeners if id(sock) not in in_use]
+            for sock in abandoned:
+                remove_listener(self.listeners, sock)
+            if abandoned and self.listeners and self.listen_mode == ListenMode.REUSEPORT_CPU:
+                # Positions in the group changed. CPUs of dead workers fall back to "cpu % sockets".
+                cpus_by_socket = {id(worker.socket): worker.cpus for worker in self.workers}
+                cpu_sets = [cpus_by_socket[id(sock)] for sock in self.listeners]
+                attach_cpu_steering(self.listeners[0], cpu_steering_map(cpu_sets), len(self.listeners))
+
+    @staticmethod
+    def _wait_worker(worker: RequestHandler, timeout: int) -> bool:
+        """
+        Waits for a worker to start serving requests, giving up early in case it dies.
+        :param worker:
+        :param timeout:
+        :return: True if the worker is ready.
+        """
+        deadline = time.time() + timeout
+        while not worker.ready.wait(0.1):
+            if not worker.is_alive() or time.time() > deadline:
+                return False
+        return True
+
+    def reload(self, timeout: int = 30) -> bool:
+        """
+        Replaces the workers one by one without downtime: a fresh worker takes over the
+        listening socket of the old one, only then the old worker is asked to stop (SIGTERM)
+        so it finishes its requests before exiting. The listening sockets are never closed.
+        :param timeout: Seconds to wait for a new worker to start and for an old one to drain.
+        :return: False in case a new worker failed to start, the remaining old workers are kept.
+        """
+        # The shared static cache is never evicted, new workers start with an empty one.
+        retired_cache = self.static.renew_shared_cache()
+        replaced = 0
+        for old_worker in list(self.workers):
+            new_worker = RequestHandler(self, old_worker.bind, old_worker.port, sock=old_worker.socket,
+                                        cpus=old_worker.cpus)
+            with self.workers_lock:
+                # Died and got reaped meanwhile, its socket is closed.
+                if old_worker not in self.workers:
+                    continue
+                new_worker.start()
+                # Listed right away, the socket is still in use if the old worker dies while we wait.
+                self.workers.insert(self.workers.index(old_worker) + 1, new_worker)
+            if not self._wait_worker(new_worker, timeout):
+                with self.workers_lock:
+                    if new_worker in self.workers:
+                        self.workers.remove(new_worker)
+                new_worker.terminate()
+                new_worker.join(timeout)
+                if retired_cache:
+                    if replaced:
+                        # Both generations keep serving, the old region goes away once a reload completes.
+                        self.retired_caches.append(retired_cache)
+                    else:
+                        self.static.shared_cache.close()
+                        self.static.shared_cache = retired_cache
+                return False
+            with self.workers_lock:
+                if old_worker in self.workers:
+                    self.workers.remove(old_worker)
+            old_worker.terminate()
+            old_worker.join(timeout)
+            if old_worker.is_alive():
+                os.kill(old_worker.pid, signal.SIGKILL)
+                old_worker.join()
+            replaced += 1
+        if retired_cache:
+            self.retired_caches.append(retired_cache)
+        for cache in self.retired_caches:
+            cache.close()
+        self.retired_caches.clear()
+        return True
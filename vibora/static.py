@@ -1,32 +1,176 @@
 import os
+import time
+import gzip
+import mmap
+import atexit
+import struct
+import asyncio
 import hashlib
+import tempfile
+import uuid
+import multiprocessing
 from functools import lru_cache, partial
 from mimetypes import MimeTypes
 from .request import Request
-from .utils import RangeFile
-from .responses import StreamingResponse, Response, CachedResponse
+from .responses import FileResponse, Response, CachedResponse
 from .exceptions import StaticNotFound
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 
-def streaming_file(path: str, chunk_size: int=1 * 1024 * 1024):
-    with open(path, 'rb') as f:
-        while True:
-            data = f.read(chunk_size)
-            if not data:
-                break
-            yield data
+# Sibling files looked up next to every static file, in order of preference.
+PRECOMPRESSED_EXTENSIONS = (('br', '.br'), ('gzip', '.gz'))
+
+# Requests with more ranges than this are answered with the whole file.
+MAX_RANGES = 64
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/xml', 'text/csv', 'text/javascript', 'application/javascript',
+    'application/json', 'application/xml', 'application/rss+xml', 'application/atom+xml', 'image/svg+xml',
+    'application/wasm', 'application/manifest+json'
+}
+
+
+class SharedStaticCache:
+    """
+    Static files cache shared by all worker processes.
+
+    Files are copied once into a memory backed file (/dev/shm when available) that is
+    memory-mapped before the workers are forked. The region is an append-only log of records
+    (file version, ETag and content) guarded by a process lock, each worker keeps a private
+    index of the records it already knows and responses are sent straight from the shared
+    region with sendfile, so the bytes of a hot asset exist only once per host.
+
+    Records are never evicted because any worker may be sending them: once the region is full
+    new files are not shared anymore. Rolling reloads start the new workers with an empty region (renew).
+    """
+
+    HEADER = struct.Struct('<Q')
+    RECORD = struct.Struct('<IIQ')
+
+    def __init__(self, max_size: int, directory: str=None):
+        """
+
+        :param max_size: Size cap (in bytes) of the shared region, for all workers together.
+        :param directory: Where the backing file is created, it should be a memory backed filesystem.
+        """
+        if directory is None:
+            directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        self.directory = directory
+        fd, self.path = tempfile.mkstemp(prefix='vibora-static-', dir=directory)
+        try:
+            os.ftruncate(fd, max_size)
+            self.map = mmap.mmap(fd, max_size)
+        finally:
+            os.close(fd)
+        self.max_size = max_size
+        self.lock = multiprocessing.Lock()
+        self.index = {}
+        self.position = self.HEADER.size
+        self.HEADER.pack_into(self.map, 0, self.position)
+        self.owner = os.getpid()
+        atexit.register(self.close)
+
+    @property
+    def used(self) -> int:
+        return self.HEADER.unpack_from(self.map, 0)[0]
+
+    @staticmethod
+    def get_key(path: str, stat: os.stat_result) -> str:
+        return f'{path}:{stat.st_mtime_ns}:{stat.st_size}'
+
+    def sync(self):
+        """
+        Indexes records appended by other workers since the last call, must be called holding the lock.
+
+        :return:
+        """
+        used = self.used
+        position = self.position
+        while position < used:
+            key_length, etag_length, content_length = self.RECORD.unpack_from(self.map, position)
+            position += self.RECORD.size
+            key = self.map[position:position + key_length].decode()
+            position += key_length
+            etag = self.map[position:position + etag_length].decode()
+            position += etag_length
+            self.index[key] = (etag, position)
+            position += content_length
+        self.position = used
+
+    def store(self, path: str, stat: os.stat_result, get_etag):
+        """
+        Blocking, must run in the executor.
+
+        :param path:
+        :param stat: Stat result of the version to be stored.
+        :param get_etag: Callable that builds the ETag, only called if the file is not shared yet.
+        :return: A tuple (etag, offset of the content in the shared file) or None if there is no space left.
+        """
+        key = self.get_key(path, stat)
+        record = self.index.get(key)
+        if record:
+            return record
+        encoded_key = key.encode()
+        with self.lock:
+            self.sync()
+            record = self.index.get(key)
+            if record:
+                return record
+            start = self.used
+            # Checking before hashing because the ETag size is not known yet, 128 bytes is more than enough.
+            if start + self.RECORD.size + len(encoded_key) + 128 + stat.st_size > self.max_size:
+                return None
+            etag = get_etag()
+            encoded_etag = etag.encode()
+            offset = start + self.RECORD.size + len(encoded_key) + len(encoded_etag)
+            with open(path, 'rb') as f, memoryview(self.map) as view:
+                read = f.readinto(view[offset:offset + stat.st_size])
+            if read != stat.st_size:
+                # The file changed while it was being copied.
+                return None
+            self.RECORD.pack_into(self.map, start, len(encoded_key), len(encoded_etag), stat.st_size)
+            self.map[start + self.RECORD.size:offset] = encoded_key + encoded_etag
+            # Publishing the record only after it's fully written.
+            self.HEADER.pack_into(self.map, 0, offset + stat.st_size)
+            self.sync()
+            return self.index[key]
+
+    def renew(self) -> 'SharedStaticCache':
+        """
+        Empty region with the same settings, this one must be closed once no worker is using it.
+
+        :return:
+        """
+        return SharedStaticCache(self.max_size, directory=self.directory)
+
+    def close(self):
+        """
+        Removes the backing file, only the process that created the region does it.
+
+        :return:
+        """
+        if os.getpid() == self.owner and os.path.exists(self.path):
+            os.remove(self.path)
 
 
 class CacheEntry:
 
     mime = MimeTypes()
 
-    def __init__(self, path: str, available_cache_size: int=0):
+    def __init__(self, path: str, available_cache_size: int=0, compressible: bool=False, fast_etag: bool=False,
+                 shared_cache: SharedStaticCache=None):
+        stat = os.stat(path)
+        get_etag = partial(self.get_stat_etag, stat) if fast_etag else partial(self.get_hash, path)
+        shared = shared_cache.store(path, stat, get_etag) if shared_cache else None
         self.path = path
         self.content_type = self.mime.guess_type(path)
-        self.etag = self.get_hash(path)
-        self.last_modified = os.path.getmtime(path)
-        self.content_length = os.path.getsize(path)
+        self.etag = shared[0] if shared else get_etag()
+        self.last_modified = stat.st_mtime
+        self.content_length = stat.st_size
+        self.checked_at = time.monotonic()
         self.headers = {
             'Last-Modified': str(self.last_modified),
             'ETag': self.etag,
@@ -34,15 +178,79 @@ class CacheEntry:
             'Content-Length': str(self.content_length),
             'Accept-Ranges': 'bytes'
         }
-        if available_cache_size > self.content_length:
+        self.memory_size = 0
+        self.compressible = compressible
+        self.encodings = {}
+        for encoding, extension in PRECOMPRESSED_EXTENSIONS:
+            if os.path.isfile(path + extension):
+                self.encodings[encoding] = FileResponse(
+                    path + extension, headers=self.encoded_headers(encoding, os.path.getsize(path + extension))
+                )
+        if self.encodings or self.compressible:
+            self.headers['Vary'] = 'Accept-Encoding'
+        if shared:
+            self.response = FileResponse(shared_cache.path, offset=shared[1], length=self.content_length,
+                                         headers=self.headers)
+        elif available_cache_size > self.content_length:
             with open(path, 'rb') as f:
                 self.response = CachedResponse(f.read(), headers=self.headers)
+            self.memory_size += self.content_length
         else:
-            self.response = StreamingResponse(partial(streaming_file, path), headers=self.headers)
+            self.response = FileResponse(path, headers=self.headers)
+
+    def encoded_headers(self, encoding: str, content_length: int) -> dict:
+        """
+
+        :param encoding: Content-Encoding of the variant.
+        :param content_length:
+        :return: Headers for the compressed variant of this file.
+        """
+        headers = self.headers.copy()
+        headers.update({
+            'ETag': f'{self.etag}-{encoding}',
+            'Content-Encoding': encoding,
+            'Content-Length': str(content_length),
+            'Vary': 'Accept-Encoding'
+        })
+        return headers
+
+    def compress(self, encoding: str, compressor):
+        """
+        Runs in the executor so it leaves the entry alone, add_encoding() records the result in the event loop.
+
+        :param encoding:
+        :param compressor: Callable that takes the raw bytes and returns the compressed ones.
+        :return: The compressed response or None in case it's not worth to compress this file.
+        """
+        with open(self.path, 'rb') as f:
+            content = compressor(f.read())
+        if len(content) >= self.content_length:
+            return None
+        return CachedResponse(content, headers=self.encoded_headers(encoding, len(content)))
+
+    def add_encoding(self, encoding: str, response):
+        """
+        Remembers the compressed variant, None included, so the file is not compressed again on every request.
+
+        :param encoding:
+        :param response:
+        :return:
+        """
+        self.encodings[encoding] = response
+        if response:
+            self.memory_size += len(response.content)
 
     @property
     def needs_update(self):
-        return os.path.getmtime(self.path) != self.last_modified
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return True
+        return stat.st_mtime != self.last_modified or stat.st_size != self.content_length
+
+    @staticmethod
+    def get_stat_etag(stat: os.stat_result) -> str:
+        return f'{int(stat.st_mtime * 1000):x}-{stat.st_size:x}'
 
     @staticmethod
     def get_hash(path: str, chunk_size=1 * 1024 * 1024):
@@ -58,7 +266,26 @@ class CacheEntry:
 
 class StaticHandler:
     def __init__(self, paths: list, host=None, url_prefix='/static', max_cache_size=10 * 1024 * 1024,
-                 default_responses: dict=None):
+                 default_responses: dict=None, compress_types: set=None, compression_level: int=6,
+                 min_compress_size: int=1024, fast_etags: bool=False, check_interval: float=1.0, executor=None,
+                 shared_cache_size: int=0):
+        """
+
+        :param paths: Directories to look for files.
+        :param host:
+        :param url_prefix:
+        :param max_cache_size: Memory (in bytes) used to keep files and their compressed variants.
+        :param default_responses:
+        :param compress_types: Mime types eligible to be compressed on the fly, an empty set disables it.
+        :param compression_level:
+        :param min_compress_size: Files smaller than this are always sent as they are.
+        :param fast_etags: Build ETags from the modification time and size instead of hashing the whole file.
+        :param check_interval: Minimum amount of seconds between two checks for changes in the same file.
+        :param executor: Executor used for file system calls, hashing and compression.
+        The default executor of the event loop is used in case of None.
+        :param shared_cache_size: Size of a cache shared by all workers, disabled if zero.
+        The handler must be created before the workers are forked (the default).
+        """
         self.paths = paths
         self.host = host
         self.url_prefix = url_prefix
@@ -69,6 +296,27 @@ class StaticHandler:
         self.default_responses.update({
             304: Response(b'', status_code=304)
         })
+        self.compress_types = COMPRESSIBLE_TYPES if compress_types is None else compress_types
+        self.min_compress_size = min_compress_size
+        self.fast_etags = fast_etags
+        self.check_interval = check_interval
+        self.executor = executor
+        self.pending = {}
+        self.shared_cache = SharedStaticCache(shared_cache_size) if shared_cache_size > 0 else None
+        self.compressors = {'gzip': partial(gzip.compress, compresslevel=compression_level)}
+        if brotli:
+            self.compressors['br'] = partial(brotli.compress, quality=min(compression_level + 2, 11))
+
+    def renew_shared_cache(self):
+        """
+        Workers forked from now on share a new empty region (I.e: stale versions of redeployed files are dropped).
+
+        :return: The previous shared cache, to be closed once the workers using it are gone.
+        """
+        previous = self.shared_cache
+        if previous:
+            self.shared_cache = previous.renew()
+        return previous
 
     @property
     def available_cache_size(self):
@@ -79,10 +327,6 @@ class StaticHandler:
         path = url.replace(self.url_prefix, '')
         return path.split('?')[0].split('#')[0]
 
-    @lru_cache(maxsize=128 * 128)
-    def exists(self, path: str):
-        return os.path.isfile(path)
-
     @staticmethod
     def get_last_modified_header(request):
         last_modified_client = request.headers.get('If-Modified-Since')
@@ -92,7 +336,102 @@ class StaticHandler:
             except ValueError:
                 return None
 
-    def parse_response(self, request: Request, cache: CacheEntry):
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def parse_accept_encoding(header: str) -> dict:
+        """
+
+        :param header: Accept-Encoding header value.
+        :return: Quality values by encoding.
+        """
+        values = {}
+        for piece in header.split(','):
+            name, _, params = piece.partition(';')
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            values[name.strip().lower()] = quality
+        return values
+
+    async def run_blocking(self, function, *args):
+        """
+
+        :param function: Blocking callable to be run in the executor.
+        :param args:
+        :return:
+        """
+        return await asyncio.get_event_loop().run_in_executor(self.executor, partial(function, *args))
+
+    def run_once(self, key, coroutine_function):
+        """
+        Concurrent callers with the same key share a single run, so a cold file is
+        hashed/compressed only once no matter how many clients are asking for it.
+
+        :param key:
+        :param coroutine_function:
+        :return: An awaitable with the result, cancelling it does not cancel the shared run.
+        """
+        task = self.pending.get(key)
+        if task is None:
+            task = self.pending[key] = asyncio.ensure_future(coroutine_function())
+            task.add_done_callback(lambda _: self.pending.pop(key, None))
+        return asyncio.shield(task)
+
+    async def compress(self, path: str, cache: CacheEntry, encoding: str):
+        """
+
+        :param path: Cache key of the entry.
+        :param cache:
+        :param encoding:
+        :return:
+        """
+        if cache.content_length > self.available_cache_size:
+            # No room for the compressed variant, not even worth a trip to the executor.
+            cache.add_encoding(encoding, None)
+            return None
+        response = await self.run_blocking(cache.compress, encoding, self.compressors[encoding])
+        if self.cache.get(path) is not cache:
+            # The entry was refreshed (or dropped) meanwhile, its size is no longer accounted for.
+            return response
+        if response and len(response.content) > self.available_cache_size:
+            response = None
+        cache.add_encoding(encoding, response)
+        if response:
+            self.current_cache_size += len(response.content)
+        return response
+
+    async def negotiate_encoding(self, request: Request, cache: CacheEntry):
+        """
+        Picks the best compressed variant the client accepts, compressing the file in case
+        there is no precompressed sibling yet.
+
+        :param request:
+        :param cache:
+        :return: The response of the chosen variant or None to send the file as it is.
+        """
+        header = request.headers.get('Accept-Encoding')
+        if not header:
+            return None
+        accepted = self.parse_accept_encoding(header)
+        default_quality = accepted.get('*', 0.0)
+        for encoding, _ in PRECOMPRESSED_EXTENSIONS:
+            if accepted.get(encoding, default_quality) <= 0:
+                continue
+            if encoding in cache.encodings:
+                response = cache.encodings[encoding]
+            elif cache.compressible and encoding in self.compressors:
+                response = await self.run_once((cache.path, encoding),
+                                               partial(self.compress, self.extract_path(request), cache, encoding))
+            else:
+                continue
+            if response:
+                return response
+
+    async def parse_response(self, request: Request, cache: CacheEntry):
         # Handling Last Modified
         last_modified_client = self.get_last_modified_header(request)
         if last_modified_client:
@@ -106,48 +445,180 @@ class StaticHandler:
 
         # Handling Range-Requests
         range_header = request.headers.get('Range')
-        if range_header:
-            pieces = self.get_range_pieces(range_header)
-            if len(pieces) == 2:
-                start, end = int(pieces[0]), int(pieces[1])
-                headers = {
-                    'Content-Range': 'bytes {0}-{1}/{2}'.format(start, end, cache.content_length),
-                    'Content-Length': str((end - start)),
-                    'Accept-Ranges': 'bytes'
-                }
-                if request.method == 'HEAD':
-                    return Response(b'', headers=headers, status_code=206)
-                else:
-                    return StreamingResponse(RangeFile(cache.path, start, end).stream,
-                                             headers=headers, status_code=206)
+        if range_header and self.if_range_matches(request, cache):
+            ranges = self.parse_ranges(range_header, cache.content_length)
+            if ranges is not None:
+                return self.range_response(request, cache, ranges)
+
+        response = cache.response
+        if 'Vary' in cache.headers:
+            response = await self.negotiate_encoding(request, cache) or response
 
         # Handling HEAD requests
-        if request.method == 'HEAD':
-            return Response(b'', headers=cache.headers)
+        if request.method == b'HEAD':
+            length = response.length if isinstance(response, FileResponse) else len(response.content)
+            return FileResponse(cache.path, status_code=response.status_code, headers=response.headers,
+                                length=length, headers_only=True)
 
-        return cache.response
+        return response
 
     @staticmethod
-    def get_range_pieces(header: str) -> list:
-        header = header[header.find('=')+1:]
-        values = header.strip().split('-')
-        return values
+    def if_range_matches(request: Request, cache: CacheEntry) -> bool:
+        """
+
+        :param request:
+        :param cache:
+        :return: False if the client asked for ranges of a representation that is not the current one.
+        """
+        validator = request.headers.get('If-Range')
+        if not validator:
+            return True
+        validator = validator.strip()
+        return validator.strip('"') == cache.etag or validator == cache.headers['Last-Modified']
+
+    @staticmethod
+    def parse_ranges(header: str, size: int):
+        """
+
+        :param header: Range header value.
+        :param size: File size.
+        :return: Sorted and coalesced list of inclusive (start, end) positions. An empty list means
+        that none of the ranges can be satisfied and None that the header must be ignored.
+        """
+        unit, _, specs = header.partition('=')
+        if unit.strip().lower() != 'bytes':
+            return None
+        ranges = []
+        for spec in specs.split(','):
+            spec = spec.strip()
+            if not spec:
+                continue
+            first, separator, last = spec.partition('-')
+            first, last = first.strip(), last.strip()
+            if not separator or (first and not first.isdigit()) or (last and not last.isdigit()):
+                return None
+            if first:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if last and end < start:
+                    return None
+            elif last:
+                # Suffix range, the last N bytes of the file.
+                start, end = max(size - int(last), 0), size - 1
+                if int(last) == 0:
+                    continue
+            else:
+                return None
+            if start < size:
+                ranges.append((start, min(end, size - 1)))
+        if len(ranges) > MAX_RANGES:
+            return None
+        ranges.sort()
+        coalesced = ranges[:1]
+        for start, end in ranges[1:]:
+            if start <= coalesced[-1][1] + 1:
+                coalesced[-1] = (coalesced[-1][0], max(end, coalesced[-1][1]))
+            else:
+                coalesced.append((start, end))
+        return coalesced
+
+    def range_response(self, request: Request, cache: CacheEntry, ranges: list):
+        """
+
+        :param request:
+        :param cache:
+        :param ranges: Inclusive (start, end) positions.
+        :return:
+        """
+        size = cache.content_length
+        if not ranges:
+            return Response(b'', status_code=416, headers={'Content-Range': f'bytes */{size}'})
+        headers = {'Accept-Ranges': 'bytes', 'ETag': cache.etag, 'Last-Modified': cache.headers['Last-Modified']}
+        if 'Vary' in cache.headers:
+            headers['Vary'] = cache.headers['Vary']
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            headers['Content-Type'] = cache.headers['Content-Type']
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+            return FileResponse(cache.path, offset=start, length=end - start + 1, headers=headers, status_code=206,
+                                headers_only=request.method == b'HEAD')
+        boundary = uuid.uuid4().hex
+        headers['Content-Type'] = f'multipart/byteranges; boundary={boundary}'
+        parts = []
+        content_type = cache.headers['Content-Type'] or 'application/octet-stream'
+        for start, end in ranges:
+            delimiter = f'\r\n--{boundary}' if parts else f'--{boundary}'
+            parts.append(f'{delimiter}\r\nContent-Type: {content_type}\r\n'
+                         f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'.encode())
+            parts.append((start, end - start + 1))
+        parts.append(f'\r\n--{boundary}--\r\n'.encode())
+        return FileResponse(cache.path, headers=headers, status_code=206, parts=parts,
+                            headers_only=request.method == b'HEAD')
+
+    def load_entry(self, path: str, available_cache_size: int):
+        """
+        Blocking, must run in the executor.
+
+        :param path:
+        :param available_cache_size:
+        :return: A new cache entry or None if the file does not exist in any of the paths.
+        """
+        for root_path in self.paths:
+            real_path = root_path + path
+            if os.path.isfile(real_path):
+                return CacheEntry(real_path, available_cache_size, self.is_compressible(real_path), self.fast_etags,
+                                  self.shared_cache)
+
+    async def refresh_entry(self, path: str):
+        """
+
+        :param path:
+        :return:
+        """
+        cached = await self.run_blocking(self.load_entry, path, self.available_cache_size)
+        previous = self.cache.pop(path, None)
+        if previous:
+            self.current_cache_size -= previous.memory_size
+        if cached:
+            self.current_cache_size += cached.memory_size
+            self.cache[path] = cached
+        return cached
+
+    async def get_entry(self, path: str):
+        """
+
+        :param path:
+        :return:
+        """
+        cached = self.cache.get(path)
+        if cached:
+            now = time.monotonic()
+            if now - cached.checked_at < self.check_interval:
+                return cached
+            # Marking it as checked before the stat call so concurrent requests don't pile up behind it.
+            cached.checked_at = now
+            if not await self.run_blocking(getattr, cached, 'needs_update'):
+                return cached
+        return await self.run_once(path, partial(self.refresh_entry, path))
 
     async def handle(self, request: Request):
         path = self.extract_path(request)
         if '../' in path:
             raise StaticNotFound()
-        if path not in self.cache or self.cache[path].needs_update:
-            for root_path in self.paths:
-                real_path = root_path + path
-                if self.exists(real_path):
-                    cached = CacheEntry(real_path, self.available_cache_size)
-                    if isinstance(cached.response, CachedResponse):
-                        self.current_cache_size += cached.content_length
-                    self.cache[path] = cached
-                    return self.parse_response(request, cached)
+        cached = await self.get_entry(path)
+        if not cached:
             raise StaticNotFound()
-        return self.parse_response(request, self.cache[path])
+        return await self.parse_response(request, cached)
+
+    def is_compressible(self, path: str) -> bool:
+        """
+
+        :param path:
+        :return: True if the file should be compressed on the fly.
+        """
+        if os.path.getsize(path) < self.min_compress_size:
+            return False
+        return CacheEntry.mime.guess_type(path)[0] in self.compress_types
 
     def url_for(self, path: str):
         if not path.startswith('/'):
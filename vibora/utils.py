@@ -3,7 +3,8 @@ import sys
 import time
 import os
 import signal
-from typing import Tuple, Iterable, Union
+import glob
+from typing import Tuple, Iterable, Union, List, Set
 
 if os.environ.get('VIBORA_UJSON', 1) == '0':
     # noinspection PyUnresolvedReferences
@@ -65,13 +66,13 @@ class RangeFile:
             yield data
 
     def read(self, count: int):
-        if self.current_pointer == self.end:
+        if self.current_pointer >= self.end:
             return None
-        if (self.current_pointer + count) > self.end:
-            count = self.end
-        with open(self.path, 'rb') as f:
-            f.seek(self.current_pointer)
-            return f.read(count)
+        count = min(count, self.end - self.current_pointer)
+        self._file.seek(self.current_pointer)
+        data = self._file.read(count)
+        self.current_pointer += len(data)
+        return data
 
     def __del__(self):
         self._file.close()
@@ -183,6 +184,71 @@ def cprint(message: str, color: str= '\033[35m', custom: bool=False) -> None:
         print(message.format(color_='', end_=''))
 
 
+def allowed_cpus() -> List[int]:
+    """
+    CPUs this process is allowed to run on. Inside containers (cpusets) or under taskset
+    this is usually way less than cpu_count().
+    :return: Sorted CPU ids.
+    """
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(0, os.cpu_count() or 1))
+
+
+def parse_cpu_list(value: str) -> Set[int]:
+    """
+    Parses the kernel CPU list format (I.e: "0-3,8,10-11").
+    :param value:
+    :return:
+    """
+    cpus = set()
+    for part in value.strip().split(','):
+        if '-' in part:
+            start, end = part.split('-')
+            cpus.update(range(int(start), int(end) + 1))
+        elif part:
+            cpus.add(int(part))
+    return cpus
+
+
+def numa_nodes() -> List[Set[int]]:
+    """
+    Allowed CPUs grouped by NUMA node, useful to keep each worker (and its memory) inside a single node.
+    :return: One set of CPU ids per node, a single set with every allowed CPU when the topology is unknown.
+    """
+    allowed = set(allowed_cpus())
+    nodes = []
+    paths = glob.glob('/sys/devices/system/node/node*/cpulist')
+    for path in sorted(paths, key=lambda x: int(x.split('/')[-2][4:])):
+        with open(path) as f:
+            cpus = parse_cpu_list(f.read()) & allowed
+        if cpus:
+            nodes.append(cpus)
+    return nodes or [allowed]
+
+
+def distribute_cpus(cpu_affinity, workers: int) -> list:
+    """
+    Chooses the CPU set of each worker.
+    :param cpu_affinity: True pins each worker to a single allowed CPU (round robin),
+    a list of CPU sets (I.e: numa_nodes()) spreads the workers among them, a false value disables pinning.
+    :param workers: How many workers.
+    :return: A CPU set (or None) for each worker.
+    """
+    if not cpu_affinity:
+        return [None] * workers
+    if not hasattr(os, 'sched_setaffinity'):
+        raise ValueError('CPU affinity is not supported in this platform.')
+    if cpu_affinity is True:
+        groups = [{cpu} for cpu in allowed_cpus()]
+    else:
+        groups = [set(group) for group in cpu_affinity]
+        if not groups or not all(groups):
+            raise ValueError('cpu_affinity must contain at least one non empty CPU set.')
+    return [groups[index % len(groups)] for index in range(0, workers)]
+
+
 def pause() -> None:
     """
     Pauses the process until a signed is received.
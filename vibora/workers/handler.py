@@ -1,32 +1,46 @@
 import asyncio
+import os
 import signal
-from socket import IPPROTO_TCP, TCP_NODELAY, SO_REUSEADDR, SOL_SOCKET, SO_REUSEPORT, socket
-from multiprocessing import Process
+from multiprocessing import Process, Event, Value
 from functools import partial
-from .reaper import Reaper
+from .housekeeper import Housekeeper
+from .sockets import create_listener, ListenMode, ExclusiveAcceptor, LISTEN_BACKLOG
 from ..hooks import Events
+from ..protocol import TimerWheel
 from ..utils import asynclib
 
 
 class RequestHandler(Process):
 
-    def __init__(self, app, bind: str, port: int, sock=None):
+    def __init__(self, app, bind: str, port: int, sock=None, cpus: set=None):
         super().__init__()
         self.app = app
         self.bind = bind
         self.port = port
         self.daemon = True
         self.socket = sock
+        self.cpus = cpus
+        # Set once the worker is accepting connections, rolling reloads wait for it.
+        self.ready = Event()
+        # Last time (monotonic clock) the event loop of this worker was responsive, the master watches it.
+        self.heartbeat = Value('d', 0.0, lock=False)
 
     def run(self):
 
+        # Pinning the worker so the kernel doesn't migrate it (and its caches) between CPUs.
+        if self.cpus:
+            os.sched_setaffinity(0, self.cpus)
+
+        # Sockets of the other workers were inherited from the master, holding them
+        # would keep them in the reuseport group after their worker dies.
+        for sock in self.app.listeners:
+            if sock is not self.socket:
+                sock.close()
+        self.app.listeners = []
+
         # Re-using address and ports. Kernel is our load balancer.
         if not self.socket:
-            self.socket = socket()
-            self.socket.setsockopt(SOL_SOCKET, SO_REUSEPORT, 1)
-            self.socket.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
-            self.socket.setsockopt(IPPROTO_TCP, TCP_NODELAY, 1)
-            self.socket.bind((self.bind, self.port))
+            self.socket = create_listener(self.bind, self.port)
 
         # Creating a new event loop using a faster loop.
         loop = asynclib.new_event_loop()
@@ -35,9 +49,12 @@ class RequestHandler(Process):
         self.app.components.add(loop)
         asyncio.set_event_loop(loop)
 
-        # Starting the connection reaper.
-        self.app.reaper = Reaper(app=self.app)
-        self.app.reaper.start()
+        # Keep-alive and request deadlines of every connection in this worker.
+        self.app.timers = TimerWheel(loop)
+
+        # Clocks, deadlines and the heartbeat are updated by the event loop itself.
+        self.app.housekeeper = Housekeeper(self.app, loop, self.heartbeat)
+        self.app.housekeeper.start()
 
         # Registering routes, blueprints, handlers, callbacks, everything is delayed until now.
         self.app.initialize()
@@ -45,47 +62,75 @@ class RequestHandler(Process):
         # Calling before server start hooks (sync/async)
         loop.run_until_complete(self.app.call_hooks(Events.BEFORE_SERVER_START, components=self.app.components))
 
-        # Creating the server.
-        handler = partial(self.app.handler, app=self.app, loop=loop, worker=self)
-        ss = loop.create_server(handler, sock=self.socket, reuse_port=True, backlog=1000)
-
-        # Calling after server hooks (sync/async)
-        loop.run_until_complete(ss)
-        loop.run_until_complete(self.app.call_hooks(Events.AFTER_SERVER_START, components=self.app.components))
+        server = None
+        stopping = False
 
         async def stop_server(timeout=30):
 
-            # Stop the reaper.
-            self.app.reaper.has_to_work = False
-
             # Calling the before server stop hook.
             await self.app.call_hooks(Events.BEFORE_SERVER_STOP, components=self.app.components)
 
+            # Each connection closing checks whether it was the last one,
+            # so we stop as soon as all of them are done instead of polling.
+            self.app.connections_drained = asyncio.Event()
+
             # Ask all connections to finish as soon as possible.
             for connection in self.app.connections.copy():
                 connection.stop()
 
             # Waiting all connections finish their tasks, after the given timeout
             # the connection will be closed abruptly.
-            while timeout:
-                all_closed = True
-                for connection in self.app.connections:
-                    if not connection.is_closed():
-                        all_closed = False
-                        break
-                if all_closed:
-                    break
-                timeout -= 1
-                await asyncio.sleep(1)
+            if self.app.connections:
+                try:
+                    await asyncio.wait_for(self.app.connections_drained.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
 
             loop.stop()
 
         def handle_kill_signal():
-            self.socket.close()  # Stop receiving new connections.
+            nonlocal stopping
+            if stopping:
+                return
+            stopping = True
+            # Still starting up, the server is stopped once the start up hooks are done.
+            if server is None:
+                return
+            # Stop receiving new connections. The listening socket may be shared with other workers
+            # (or the one replacing this worker) so it must leave the event loop before being closed.
+            server.close()
             loop.create_task(stop_server(10))
 
+        # Installed before accepting connections, otherwise a SIGTERM could kill the worker
+        # with requests in flight.
         try:
             loop.add_signal_handler(signal.SIGTERM, handle_kill_signal)
+        except (ValueError, RuntimeError):
+            # uvloop refuses when the master forked us from a thread other than its main one
+            # (I.e: reload() called from a thread). The handler then runs on the next loop iteration.
+            signal.signal(signal.SIGTERM, lambda *_: loop.call_soon_threadsafe(handle_kill_signal))
+
+        # Creating the server.
+        handler = partial(self.app.handler, app=self.app, loop=loop, worker=self)
+        if self.app.listen_mode == ListenMode.SHARED:
+            created_server = ExclusiveAcceptor(loop, self.socket, handler)
+            created_server.start()
+        else:
+            ss = loop.create_server(handler, sock=self.socket, reuse_port=True, backlog=LISTEN_BACKLOG)
+            created_server = loop.run_until_complete(ss)
+
+        # Calling after server hooks (sync/async)
+        # The server is online while the hooks run, set from inside the running loop because
+        # signal handlers only take effect once it runs (I.e: uvloop).
+        loop.call_soon(self.ready.set)
+        loop.run_until_complete(self.app.call_hooks(Events.AFTER_SERVER_START, components=self.app.components))
+        server = created_server
+
+        if stopping:
+            stopping = False
+            handle_kill_signal()
+
+        try:
             loop.run_forever()
         except (SystemExit, KeyboardInterrupt):
             loop.stop()
@@ -0,0 +1,61 @@
+import time
+from datetime import datetime, timezone
+from email.utils import formatdate
+from ..responses import update_current_time
+from ..protocol import update_current_time as update_time_protocol
+
+
+class Housekeeper:
+    """
+    Chores of a worker that run once a second: the cached clocks, connection deadlines and the heartbeat.
+    They run in the worker event loop so they never race with the connections it is handling.
+    """
+
+    def __init__(self, app, loop, heartbeat):
+        """
+
+        :param app:
+        :param loop:
+        :param heartbeat: Shared with the master process (multiprocessing.Value),
+        a heartbeat that stops moving means the event loop is blocked.
+        """
+        self.app = app
+        self.loop = loop
+        self.heartbeat = heartbeat
+        self.handle = None
+
+    def start(self):
+        """
+
+        :return:
+        """
+        self.tick()
+
+    def stop(self):
+        """
+
+        :return:
+        """
+        if self.handle:
+            self.handle.cancel()
+            self.handle = None
+
+    def tick(self):
+        """
+
+        :return:
+        """
+        # Removing the microseconds because this time is cached and it could trick the user into believing
+        # that two requests were processed at exactly the same time because of the cached time.
+        now = datetime.now(timezone.utc).replace(microsecond=0).astimezone()
+        self.app.current_time = now.isoformat()
+        update_current_time(formatdate(timeval=now.timestamp(), localtime=False, usegmt=True))
+        update_time_protocol()
+
+        # Expiring idle connections and slow requests.
+        self.app.timers.tick()
+
+        self.heartbeat.value = time.monotonic()
+
+        # Waking up right after the second changes keeps the cached date accurate.
+        self.handle = self.loop.call_later(1 - time.time() % 1, self.tick)
@@ -15,12 +15,13 @@ class Necromancer(threading.Thread):
     def run(self):
         while self.must_work:
             time.sleep(self.interval)
-            workers_alive = []
-            for worker in self.app.workers:
-                if not worker.is_alive():
-                    worker = self.spawn_function()
-                    worker.start()
-                    workers_alive.append(worker)
-                else:
-                    workers_alive.append(worker)
-            self.app.workers = workers_alive
+            with self.app.workers_lock:
+                workers_alive = []
+                for worker in self.app.workers:
+                    if not worker.is_alive():
+                        worker = self.spawn_function(sock=worker.socket, cpus=worker.cpus)
+                        worker.start()
+                        workers_alive.append(worker)
+                    else:
+                        workers_alive.append(worker)
+                self.app.workers[:] = workers_alive
@@ -0,0 +1,230 @@
+import ctypes
+import errno
+import select
+import socket
+import struct
+from socket import IPPROTO_TCP, TCP_NODELAY, SO_REUSEADDR, SOL_SOCKET
+from typing import List, Dict
+from ..utils import distribute_cpus
+
+SO_REUSEPORT = getattr(socket, 'SO_REUSEPORT', None)
+
+# Linux only, the value is the same in every architecture.
+SO_ATTACH_REUSEPORT_CBPF = getattr(socket, 'SO_ATTACH_REUSEPORT_CBPF', 51)
+
+# Classic BPF pieces (linux/filter.h).
+BPF_LD_W_ABS = 0x20
+BPF_ALU_MOD_K = 0x94
+BPF_JMP_JEQ_K = 0x15
+BPF_RET_K = 0x06
+BPF_RET_A = 0x16
+SKF_AD_CPU = 0xfffff000 + 36
+BPF_INSTRUCTION = struct.Struct('HBBI')
+
+LISTEN_BACKLOG = 1000
+
+# Linux 4.5+, only one of the epoll instances waiting on the socket is woken up by each connection.
+EPOLLEXCLUSIVE = getattr(select, 'EPOLLEXCLUSIVE', None)
+
+# Connections accepted in a row before giving the event loop back.
+ACCEPT_BATCH = 64
+ACCEPT_RETRY_DELAY = 1
+
+
+class ListenMode:
+    # Each worker has its own SO_REUSEPORT socket, the kernel hashes connections (4-tuple) among them.
+    REUSEPORT = 1
+    # The master binds one SO_REUSEPORT socket per worker and attaches a CBPF program
+    # that hands each connection to the socket of the worker pinned to the CPU that received it.
+    REUSEPORT_CPU = 2
+    # The master binds a single socket and every worker accepts from it,
+    # the kernel wakes up a single worker for each connection (EPOLLEXCLUSIVE).
+    SHARED = 3
+
+
+def create_listener(host: str, port: int, reuse_port: bool = True) -> socket.socket:
+    """
+
+    :param host:
+    :param port:
+    :param reuse_port:
+    :return:
+    """
+    sock = socket.socket()
+    if reuse_port:
+        if SO_REUSEPORT is None:
+            raise ValueError('SO_REUSEPORT is not supported in this platform.')
+        sock.setsockopt(SOL_SOCKET, SO_REUSEPORT, 1)
+    sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+    sock.setsockopt(IPPROTO_TCP, TCP_NODELAY, 1)
+    sock.bind((host, port))
+    return sock
+
+
+def cpu_steering_map(cpu_sets: list) -> Dict[int, int]:
+    """
+    Maps each CPU to the socket of the worker pinned to it.
+
+    :param cpu_sets: CPU set of each worker (I.e: vibora.utils.distribute_cpus()), in socket order.
+    :return: {cpu: socket index}
+    """
+    if not cpu_sets or not all(cpu_sets):
+        raise ValueError('ListenMode.REUSEPORT_CPU requires the workers to be pinned to CPUs (cpu_affinity).')
+    mapping = {}
+    for index, cpus in enumerate(cpu_sets):
+        for cpu in cpus:
+            mapping.setdefault(cpu, index)
+    idle = sorted(set(range(0, len(cpu_sets))) - set(mapping.values()))
+    if idle:
+        raise ValueError(f'ListenMode.REUSEPORT_CPU hands the connections of a CPU to a single worker, '
+                         f'workers {idle} share their CPUs with others and would never get a connection.')
+    return mapping
+
+
+def attach_cpu_steering(sock: socket.socket, cpu_map: Dict[int, int], sockets: int) -> None:
+    """
+    Attaches "return cpu_map[cpu]" to the reuseport group of the given socket,
+    the returned value is the index of the socket (in listen order) that receives the connection.
+    CPUs missing from the map (no worker pinned to them) fall back to "cpu % sockets".
+
+    :param sock: Any socket of the group.
+    :param cpu_map: {cpu: socket index}
+    :param sockets: How many sockets are in the group.
+    :return:
+    """
+    program = BPF_INSTRUCTION.pack(BPF_LD_W_ABS, 0, 0, SKF_AD_CPU)
+    for cpu, index in sorted(cpu_map.items()):
+        # if (cpu == k) return index; else skip the return.
+        program += BPF_INSTRUCTION.pack(BPF_JMP_JEQ_K, 0, 1, cpu) + BPF_INSTRUCTION.pack(BPF_RET_K, 0, 0, index)
+    program += BPF_INSTRUCTION.pack(BPF_ALU_MOD_K, 0, 0, sockets) + BPF_INSTRUCTION.pack(BPF_RET_A, 0, 0, 0)
+    buffer = ctypes.create_string_buffer(program, len(program))
+    # struct sock_fprog {unsigned short len; struct sock_filter *filter;}
+    sock.setsockopt(SOL_SOCKET, SO_ATTACH_REUSEPORT_CBPF,
+                    struct.pack('HP', len(program) // BPF_INSTRUCTION.size, ctypes.addressof(buffer)))
+
+
+def create_listeners(mode: int, host: str, port: int, workers: int, cpu_sets: list = None) -> List[socket.socket]:
+    """
+    Sockets created by the master, before the workers are forked.
+
+    :param mode: ListenMode
+    :param host:
+    :param port:
+    :param workers:
+    :param cpu_sets: CPU set of each worker, ListenMode.REUSEPORT_CPU steers connections accordingly
+    (each worker pinned to a single allowed CPU by default).
+    :return: One socket per worker.
+    """
+    # Sockets are owned by the master so a replacement worker (rolling reloads, dead workers)
+    # takes over the same socket, without dropping the connections waiting to be accepted.
+    if mode == ListenMode.SHARED:
+        if EPOLLEXCLUSIVE is None:
+            raise ValueError('EPOLLEXCLUSIVE is not supported in this platform.')
+        sock = create_listener(host, port, reuse_port=False)
+        sock.listen(LISTEN_BACKLOG)
+        return [sock] * workers
+    elif mode in (ListenMode.REUSEPORT, ListenMode.REUSEPORT_CPU):
+        if mode == ListenMode.REUSEPORT_CPU:
+            cpu_map = cpu_steering_map(cpu_sets or distribute_cpus(True, workers))
+        sockets = []
+        # Sockets join the reuseport group when they start listening,
+        # listening here keeps the group order (the index used by the CPU program) predictable.
+        for _ in range(0, workers):
+            sock = create_listener(host, port)
+            sock.listen(LISTEN_BACKLOG)
+            sockets.append(sock)
+        if mode == ListenMode.REUSEPORT_CPU:
+            attach_cpu_steering(sockets[0], cpu_map, workers)
+        return sockets
+    raise ValueError(f'Unknown listen mode: {mode}')
+
+
+def remove_listener(listeners: List[socket.socket], sock: socket.socket) -> None:
+    """
+    Closes a listening socket nobody accepts from anymore, otherwise the kernel keeps handing it
+    a share of the new connections. Connections waiting in its backlog are reset.
+    The kernel fills the hole left in the reuseport group with its last socket,
+    listeners is reordered the same way so it keeps matching the group order.
+
+    :param listeners: Listening sockets in group order, updated in place.
+    :param sock:
+    :return:
+    """
+    index = listeners.index(sock)
+    last = listeners.pop()
+    if last is not sock:
+        listeners[index] = last
+    sock.close()
+
+
+class ExclusiveAcceptor:
+    """
+    Accepts connections from a listening socket shared by every worker (ListenMode.SHARED).
+
+    The socket is watched through a private epoll instance registered with EPOLLEXCLUSIVE,
+    the event loop only watches that instance. A plain shared socket in every event loop wakes up
+    all the idle workers for each connection (thundering herd), here the kernel wakes up one of them.
+    """
+
+    def __init__(self, loop, sock: socket.socket, protocol_factory):
+        """
+
+        :param loop:
+        :param sock: Listening socket.
+        :param protocol_factory: Same as loop.create_server() one.
+        """
+        self.loop = loop
+        self.sock = sock
+        self.protocol_factory = protocol_factory
+        self.epoll = None
+
+    def start(self):
+        """
+
+        :return:
+        """
+        self.sock.setblocking(False)
+        self.epoll = select.epoll()
+        self.epoll.register(self.sock.fileno(), select.EPOLLIN | EPOLLEXCLUSIVE)
+        self.loop.add_reader(self.epoll.fileno(), self.accept)
+
+    def accept(self):
+        """
+
+        :return:
+        """
+        # Level triggered, connections left behind wake us up again on the next loop iteration.
+        self.epoll.poll(0)
+        for _ in range(0, ACCEPT_BATCH):
+            try:
+                connection, _ = self.sock.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except ConnectionAbortedError:
+                continue
+            except OSError as error:
+                if error.errno in (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM):
+                    # Out of resources, the other workers take the connections meanwhile (same as asyncio).
+                    self.loop.remove_reader(self.epoll.fileno())
+                    self.loop.call_later(ACCEPT_RETRY_DELAY, self.resume)
+                    return
+                raise
+            self.loop.create_task(self.loop.connect_accepted_socket(self.protocol_factory, connection))
+
+    def resume(self):
+        """
+
+        :return:
+        """
+        if self.epoll is not None:
+            self.loop.add_reader(self.epoll.fileno(), self.accept)
+
+    def close(self):
+        """
+        Stops accepting new connections, the socket itself is left open for the other workers.
+        :return:
+        """
+        if self.epoll is not None:
+            self.loop.remove_reader(self.epoll.fileno())
+            self.epoll.close()
+            self.epoll = None
@@ -0,0 +1,54 @@
+import os
+import signal
+import threading
+import time
+from multiprocessing.connection import wait
+
+
+class Watchdog(threading.Thread):
+
+    def __init__(self, app, timeout: int, interval: int=1, reap: bool=False):
+        """
+        Runs in the master process and kills workers whose event loop is stuck
+        (sync calls, expensive CPU ops), a blocked loop can't notice it by itself.
+
+        :param app:
+        :param timeout: Seconds a worker may go without a heartbeat.
+        :param interval:
+        :param reap: Forget dead workers (and close their listening sockets) as soon as they die,
+        only when there isn't a necromancer to replace them.
+        """
+        super().__init__(daemon=True)
+        self.app = app
+        self.timeout = timeout
+        self.interval = interval
+        self.reap = reap
+        self.wake_up = threading.Event()
+
+    def stop(self):
+        """
+
+        :return:
+        """
+        self.wake_up.set()
+
+    def run(self):
+        while not self.wake_up.is_set():
+            with self.app.workers_lock:
+                workers = list(self.app.workers)
+            if self.reap:
+                # Returns as soon as a worker dies, its socket shouldn't get new connections for long.
+                wait([worker.sentinel for worker in workers], self.interval)
+            else:
+                self.wake_up.wait(self.interval)
+            if self.wake_up.is_set():
+                break
+            if self.reap:
+                self.app.reap_workers()
+            now = time.monotonic()
+            for worker in workers:
+                last_beat = worker.heartbeat.value
+                # Workers still starting up didn't beat yet.
+                if last_beat and now - last_beat >= self.timeout and worker.is_alive():
+                    # The necromancer (if enabled) brings a new worker to life, otherwise it is reaped.
+                    os.kill(worker.pid, signal.SIGKILL)